@@ -2,18 +2,27 @@ from datetime import datetime, timedelta
 from typing import Optional
 from jose import JWTError, jwt
 from passlib.context import CryptContext
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, Header, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
-from sqlalchemy.orm import Session
+from sqlalchemy import case, func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
 from . import models, database
+from .services.user_cache import CachedUser, get_user_cache
+from .services.password_hasher import get_hasher
+import hmac
 import os
 
 # Configuración de seguridad
 SECRET_KEY = os.getenv("SECRET_KEY", "supersecretkey123") # Cambiar en producción
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 60 * 24 # 24 horas
+# Token para los endpoints /admin (cabecera X-Admin-Token); vacío = deshabilitados
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "")
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Coste de bcrypt (2^rounds iteraciones); los hashes con otro coste se rehacen al iniciar sesión
+BCRYPT_ROUNDS = int(os.getenv("AUTH_BCRYPT_ROUNDS", "12"))
+
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=BCRYPT_ROUNDS)
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
 def verify_password(plain_password, hashed_password):
@@ -22,6 +31,22 @@ def verify_password(plain_password, hashed_password):
 def get_password_hash(password):
     return pwd_context.hash(password)
 
+def verify_and_rehash(plain_password, hashed_password):
+    """(válida, hash nuevo o None): si el hash usa otro coste (needs_update), se recalcula con el actual."""
+    if not pwd_context.verify(plain_password, hashed_password):
+        return False, None
+    if pwd_context.needs_update(hashed_password):
+        return True, pwd_context.hash(plain_password)
+    return True, None
+
+# bcrypt tarda decenas de ms: se ejecuta en el pool de hilos propio (HasherOverloaded si está lleno)
+
+async def hash_password(password: str) -> str:
+    return await get_hasher().run(get_password_hash, password)
+
+async def check_password(plain_password: str, hashed_password: str):
+    return await get_hasher().run(verify_and_rehash, plain_password, hashed_password)
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
     if expires_delta:
@@ -32,7 +57,13 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
-async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(database.get_db)):
+async def get_current_user(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(database.get_async_db)) -> CachedUser:
+    # Token ya verificado hace poco: ni decodificar el JWT ni consultar la base
+    cache = get_user_cache()
+    cached = cache.get(token)
+    if cached is not None:
+        return cached
+
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="No se pudieron validar las credenciales",
@@ -46,7 +77,70 @@ async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = De
     except JWTError:
         raise credentials_exception
     
-    user = db.query(models.User).filter(models.User.email == email).first()
+    generation = cache.generation
+    # Los tokens nuevos llevan el id ("uid"): búsqueda por clave primaria; los antiguos, por email
+    user_id = payload.get("uid")
+    if user_id is not None:
+        user = await db.get(models.User, user_id)
+        if user is not None and user.email != email:
+            user = None
+    else:
+        user = await db.scalar(select(models.User).where(models.User.email == email))
     if user is None:
         raise credentials_exception
-    return user
+    identity = CachedUser(user.id, user.email, user.full_name, user.created_at)
+    cache.put(token, identity, token_exp=payload.get("exp"), generation=generation)
+    return identity
+
+# Bloqueo de cuenta tras intentos fallidos seguidos
+MAX_FAILED_LOGINS = 3
+LOCKOUT_MINUTES = 15
+
+async def record_failed_login(db: AsyncSession, user_id: int):
+    """
+    Suma un intento fallido con un único UPDATE atómico (sin leer-modificar-escribir,
+    así los intentos concurrentes no se pierden) y bloquea la cuenta al llegar a
+    MAX_FAILED_LOGINS. Devuelve (intentos, bloqueada_hasta) tras el cambio.
+    """
+    attempts = func.coalesce(models.User.failed_login_attempts, 0) + 1
+    lock_until = datetime.utcnow() + timedelta(minutes=LOCKOUT_MINUTES)
+    stmt = (
+        update(models.User)
+        .where(models.User.id == user_id)
+        # MySQL evalúa el SET de izquierda a derecha con los valores ya asignados:
+        # locked_until va primero para que en todos los motores vea el contador anterior
+        .ordered_values(
+            (models.User.locked_until, case((attempts >= MAX_FAILED_LOGINS, lock_until), else_=models.User.locked_until)),
+            (models.User.failed_login_attempts, attempts),
+        )
+        .execution_options(synchronize_session=False)
+    )
+    conn = await db.connection()
+    if conn.dialect.update_returning:
+        row = (await db.execute(stmt.returning(models.User.failed_login_attempts, models.User.locked_until))).one()
+    else:
+        # Sin RETURNING (MySQL): el UPDATE retiene el bloqueo de la fila hasta el commit,
+        # así que esta lectura ve exactamente el valor que acaba de escribir
+        await db.execute(stmt)
+        row = (await db.execute(
+            select(models.User.failed_login_attempts, models.User.locked_until).where(models.User.id == user_id)
+        )).one()
+    await db.commit()
+    return row[0], row[1]
+
+async def reset_login_state(db: AsyncSession, user_id: int, new_hash: Optional[str] = None) -> None:
+    """Login correcto: pone a cero intentos y bloqueo (y guarda el hash recalculado) en un solo UPDATE."""
+    values = {"failed_login_attempts": 0, "locked_until": None}
+    if new_hash:
+        values["password_hash"] = new_hash
+    await db.execute(
+        update(models.User).where(models.User.id == user_id).values(**values)
+        .execution_options(synchronize_session=False)
+    )
+    await db.commit()
+
+def require_admin(x_admin_token: Optional[str] = Header(default=None)):
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Administración deshabilitada")
+    if x_admin_token is None or not hmac.compare_digest(x_admin_token, ADMIN_TOKEN):
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Token de administración inválido")
@@ -1,9 +1,15 @@
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, event, text
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool, StaticPool
+import asyncio
 import os
 from dotenv import load_dotenv
 
+from .services.pool_metrics import get_monitor
+
 load_dotenv()
 
 # Configuración por defecto para XAMPP/phpMyAdmin local
@@ -14,11 +20,96 @@ DB_HOST = os.getenv("DB_HOST", "localhost")
 DB_PORT = os.getenv("DB_PORT", "3306")
 DB_NAME = os.getenv("DB_NAME", "usabilidad-proyecto")
 
-SQLALCHEMY_DATABASE_URL = f"mysql+pymysql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
+# DATABASE_URL permite usar otra base (p. ej. sqlite:///./dev.db en tests y benchmarks)
+SQLALCHEMY_DATABASE_URL = os.getenv("DATABASE_URL") or f"mysql+pymysql://{DB_USER}:{DB_PASSWORD}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
+
+# Driver asíncrono equivalente a cada driver síncrono
+ASYNC_DRIVERS = {
+    "mysql": "mysql+aiomysql",
+    "mysql+pymysql": "mysql+aiomysql",
+    "sqlite": "sqlite+aiosqlite",
+    "sqlite+pysqlite": "sqlite+aiosqlite",
+    "postgresql": "postgresql+asyncpg",
+    "postgresql+psycopg2": "postgresql+asyncpg",
+}
+
+
+def async_url(url: str) -> str:
+    """URL con el driver asíncrono correspondiente (si ya es asíncrona, se deja igual)."""
+    parsed = make_url(url)
+    driver = ASYNC_DRIVERS.get(parsed.drivername, parsed.drivername)
+    return parsed.set(drivername=driver).render_as_string(hide_password=False)
+
+
+# ASYNC_DATABASE_URL fuerza un driver concreto (p. ej. sqlite+aiosqlite:///./dev.db)
+ASYNC_DATABASE_URL = os.getenv("ASYNC_DATABASE_URL") or async_url(SQLALCHEMY_DATABASE_URL)
+
+# Pool de conexiones (por engine y por worker)
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+# Segundos esperando una conexión libre antes de fallar ("QueuePool limit")
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "10"))
+# Las conexiones más viejas se reabren (por debajo del wait_timeout de MySQL); -1 = nunca
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))
+# Comprueba cada conexión al sacarla del pool (descarta las cortadas por el servidor)
+DB_POOL_PRE_PING = os.getenv("DB_POOL_PRE_PING", "1") == "1"
+# SQLite local: journal WAL (lectores concurrentes con un escritor)
+DB_SQLITE_WAL = os.getenv("DB_SQLITE_WAL", "1") == "1"
+DB_HEALTH_TIMEOUT_S = float(os.getenv("DB_HEALTH_TIMEOUT_S", "2"))
+
+
+def _sqlite_pragmas(dbapi_connection, _record):
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute("PRAGMA busy_timeout=5000")
+    cursor.close()
 
-engine = create_engine(SQLALCHEMY_DATABASE_URL)
+
+def make_engine(url: str, asynchronous: bool = False, name: str = "default",
+                pool_size: int = DB_POOL_SIZE, max_overflow: int = DB_MAX_OVERFLOW,
+                pool_timeout: float = DB_POOL_TIMEOUT, pool_recycle: int = DB_POOL_RECYCLE,
+                pre_ping: bool = DB_POOL_PRE_PING, sqlite_wal: bool = DB_SQLITE_WAL):
+    """
+    Crea un Engine (o AsyncEngine) con el pool configurado e instrumentado:
+    sus contadores se publican en /metrics y /health con el nombre `name`.
+    SQLite en memoria usa un StaticPool (una sola conexión compartida).
+    """
+    parsed = make_url(url)
+    is_sqlite = parsed.get_backend_name() == "sqlite"
+    in_memory = is_sqlite and parsed.database in (None, "", ":memory:")
+    monitor = get_monitor(name)
+    kwargs = {"pool_pre_ping": pre_ping}
+    if is_sqlite:
+        kwargs["connect_args"] = {"check_same_thread": False}
+    if in_memory:
+        kwargs["poolclass"] = StaticPool
+    else:
+        kwargs.update(
+            poolclass=monitor.pool_class(AsyncAdaptedQueuePool if asynchronous else QueuePool),
+            pool_size=pool_size,
+            max_overflow=max_overflow,
+            pool_timeout=pool_timeout,
+            pool_recycle=pool_recycle,
+        )
+    new_engine = (create_async_engine if asynchronous else create_engine)(url, **kwargs)
+    sync_engine = new_engine.sync_engine if asynchronous else new_engine
+    monitor.attach(sync_engine)
+    if is_sqlite and sqlite_wal and not in_memory:
+        event.listen(sync_engine, "connect", _sqlite_pragmas)
+    return new_engine
+
+
+# Motor síncrono: scripts (check_db_connection) y herramientas fuera del servidor
+engine = make_engine(SQLALCHEMY_DATABASE_URL, name="sync")
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# Motor asíncrono: lo usan todas las rutas de la API
+async_engine = make_engine(ASYNC_DATABASE_URL, asynchronous=True, name="async")
+# expire_on_commit=False: tras el commit los objetos se siguen leyendo sin
+# volver a consultar (en una sesión asíncrona no hay carga perezosa implícita)
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
 Base = declarative_base()
 
 def get_db():
@@ -27,3 +118,20 @@ def get_db():
         yield db
     finally:
         db.close()
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+async def ping() -> None:
+    """SELECT 1 contra la base (para /health); lanza la excepción si falla o tarda demasiado."""
+    async def _select_one():
+        async with async_engine.connect() as conn:
+            await conn.execute(text("SELECT 1"))
+
+    await asyncio.wait_for(_select_one(), DB_HEALTH_TIMEOUT_S)
+
+async def create_tables():
+    """Crea las tablas si no existen (útil para dev, en prod usar migraciones)."""
+    async with async_engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
@@ -1,21 +1,67 @@
-from fastapi import FastAPI, Depends, HTTPException, status
+from fastapi import FastAPI, Depends, HTTPException, Query, Request, status
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 from fastapi.security import OAuth2PasswordRequestForm
-from sqlalchemy.orm import Session
+from sqlalchemy import delete, insert, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from pydantic import ValidationError
+from starlette.concurrency import run_in_threadpool
+from contextlib import asynccontextmanager
 from datetime import datetime, timedelta
-import json
+from typing import Literal, Optional
+import os
 
-from .database import engine, Base, get_db
+from .database import async_engine, create_tables, get_async_db, ping as ping_db
 from . import models, auth, schemas
-from .services.ai_stub import suggest_diagnoses
+from .services.ai_stub import analyze, warm_up, cache_stats, get_index, reload_index
+from .services import coalescer, inference
+from .services.diagnosis_session import SessionNotFound, get_store as get_session_store
+from .services import question_tree
+from .services.kb_artifacts import KB_SOURCE, KB_WATCH_SECONDS, SourceWatcher, touch_source
+from .services import memory_report
+from .services.pool_metrics import pool_stats
+from .services.user_cache import CachedUser, get_user_cache
+from .services import analytics, history_archive, history_db, history_writer
+from .services.password_hasher import HasherOverloaded, get_hasher, shutdown_hasher
 
-# Crear tablas si no existen (útil para dev, en prod usar migraciones)
-models.Base.metadata.create_all(bind=engine)
+DISCLAIMER = "Esto no sustituye una consulta médica; es orientación preliminar."
+# Máximo de elementos aceptados por /diagnose/batch
+BATCH_MAX_ITEMS = int(os.getenv("DIAGNOSE_BATCH_MAX_ITEMS", "500"))
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Crear tablas si no existen (útil para dev, en prod usar migraciones)
+    await create_tables()
+    history_writer.start_writer()
+    # Archivado periódico de lo anterior a HISTORY_RETENTION_MONTHS (si HISTORY_ARCHIVE_INTERVAL_S > 0)
+    history_archive.start_job()
+    # Construir el índice TF-IDF y la KB compilada al arrancar, no en la primera petición
+    memory_report.snapshot("before_kb")
+    warm_up()
+    question_tree.get_question_tree()
+    memory_report.snapshot("after_kb")
+    coalescer.get_coalescer()
+    inference.get_engine()
+    get_hasher()
+    # Recarga en caliente si cambia el fichero de la KB (KB_WATCH_SECONDS > 0)
+    watcher = SourceWatcher(KB_SOURCE, reload_index)
+    watcher.start()
+    yield
+    watcher.stop()
+    inference.shutdown_engine()
+    shutdown_hasher()
+    await history_archive.shutdown_job()
+    # Escribir el historial pendiente antes de cerrar las conexiones
+    await history_writer.shutdown_writer()
+    # Cerrar las conexiones del pool (con aiosqlite, sus hilos impiden terminar el proceso)
+    await async_engine.dispose()
+    coalescer.shutdown_coalescer()
 
 app = FastAPI(
     title="Diagnóstico Preliminar API",
     description="API con autenticación y base de datos MySQL local.",
     version="0.2.0",
+    lifespan=lifespan,
 )
 
 # CORS
@@ -29,66 +75,73 @@ app.add_middleware(
 
 # --- AUTH ROUTES ---
 
+# bcrypt tarda decenas de ms: va a su propio pool de hilos (auth.hash_password /
+# auth.check_password), nunca al event loop ni al threadpool de las demás rutas
+
+@app.exception_handler(HasherOverloaded)
+async def hasher_overloaded_handler(request: Request, exc: HasherOverloaded):
+    return JSONResponse(status_code=503, content={"detail": str(exc)}, headers={"Retry-After": "1"})
+
 @app.post("/register")
-def register(user: schemas.UserCreate, db: Session = Depends(get_db)):
-    db_user = db.query(models.User).filter(models.User.email == user.email).first()
+async def register(user: schemas.UserCreate, db: AsyncSession = Depends(get_async_db)):
+    db_user = await db.scalar(select(models.User).where(models.User.email == user.email))
     if db_user:
         raise HTTPException(status_code=400, detail="El email ya está registrado")
     
-    hashed_password = auth.get_password_hash(user.password)
+    hashed_password = await auth.hash_password(user.password)
     new_user = models.User(email=user.email, password_hash=hashed_password, full_name=user.full_name)
     db.add(new_user)
-    db.commit()
-    db.refresh(new_user)
+    await db.commit()
     return {"message": "Usuario creado exitosamente"}
 
 @app.post("/reset-password")
-def reset_password(reset_data: schemas.PasswordReset, db: Session = Depends(get_db)):
-    user = db.query(models.User).filter(models.User.email == reset_data.email).first()
+async def reset_password(reset_data: schemas.PasswordReset, db: AsyncSession = Depends(get_async_db)):
+    user = await db.scalar(select(models.User).where(models.User.email == reset_data.email))
     if not user:
         raise HTTPException(status_code=404, detail="Usuario no encontrado")
     
-    hashed_password = auth.get_password_hash(reset_data.new_password)
+    hashed_password = await auth.hash_password(reset_data.new_password)
     user.password_hash = hashed_password
-    db.commit()
+    await db.commit()
+    get_user_cache().invalidate_user(user.id)
     return {"message": "Contraseña actualizada exitosamente"}
 
 @app.post("/token")
-def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
-    user = db.query(models.User).filter(models.User.email == form_data.username).first()
+async def login(form_data: OAuth2PasswordRequestForm = Depends(), db: AsyncSession = Depends(get_async_db)):
+    user = await db.scalar(select(models.User).where(models.User.email == form_data.username))
     
     # Verificar bloqueo
     if user and user.locked_until and user.locked_until > datetime.utcnow():
         raise HTTPException(status_code=400, detail="Cuenta bloqueada temporalmente. Intente más tarde.")
 
-    if not user or not auth.verify_password(form_data.password, user.password_hash):
+    valid, new_hash = await auth.check_password(form_data.password, user.password_hash) if user else (False, None)
+    if not valid:
         if user:
-            user.failed_login_attempts += 1
-            if user.failed_login_attempts >= 3:
-                user.locked_until = datetime.utcnow() + timedelta(minutes=15) # Bloqueo de 15 min
-                db.commit()
-                raise HTTPException(status_code=400, detail="Cuenta bloqueada por 15 minutos debido a múltiples intentos fallidos.")
-            db.commit()
+            # Un solo UPDATE atómico por intento fallido (cuenta bien los intentos concurrentes)
+            attempts, _ = await auth.record_failed_login(db, user.id)
+            if attempts >= auth.MAX_FAILED_LOGINS:
+                get_user_cache().invalidate_user(user.id)
+                raise HTTPException(status_code=400, detail=f"Cuenta bloqueada por {auth.LOCKOUT_MINUTES} minutos debido a múltiples intentos fallidos.")
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Email o contraseña incorrectos",
             headers={"WWW-Authenticate": "Bearer"},
         )
     
-    # Resetear intentos fallidos si login exitoso
-    if user.failed_login_attempts > 0:
-        user.failed_login_attempts = 0
-        user.locked_until = None
-        db.commit()
+    # Login correcto: solo se escribe si hay intentos que resetear o el hash usa otro
+    # coste de bcrypt (AUTH_BCRYPT_ROUNDS cambió)
+    if user.failed_login_attempts or user.locked_until or new_hash:
+        await auth.reset_login_state(db, user.id, new_hash)
+        get_user_cache().invalidate_user(user.id)
 
     access_token_expires = timedelta(minutes=auth.ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = auth.create_access_token(
-        data={"sub": user.email}, expires_delta=access_token_expires
+        data={"sub": user.email, "uid": user.id}, expires_delta=access_token_expires
     )
     return {"access_token": access_token, "token_type": "bearer", "user_name": user.full_name}
 
 @app.get("/users/me", response_model=schemas.UserResponse)
-def read_users_me(current_user: models.User = Depends(auth.get_current_user)):
+async def read_users_me(current_user: CachedUser = Depends(auth.get_current_user)):
     return schemas.UserResponse(
         id=current_user.id,
         email=current_user.email,
@@ -97,70 +150,317 @@ def read_users_me(current_user: models.User = Depends(auth.get_current_user)):
     )
 
 @app.put("/users/me")
-def update_user_me(data: schemas.UserUpdate, current_user: models.User = Depends(auth.get_current_user), db: Session = Depends(get_db)):
+async def update_user_me(data: schemas.UserUpdate, current_user: CachedUser = Depends(auth.get_current_user), db: AsyncSession = Depends(get_async_db)):
+    # current_user es la identidad cacheada: el usuario a modificar se carga por clave primaria
+    user = await db.get(models.User, current_user.id)
+    if user is None:
+        raise HTTPException(status_code=404, detail="Usuario no encontrado")
     if data.full_name:
-        current_user.full_name = data.full_name
+        user.full_name = data.full_name
     if data.password:
-        current_user.password_hash = auth.get_password_hash(data.password)
+        user.password_hash = await auth.hash_password(data.password)
     
-    db.commit()
-    db.refresh(current_user)
+    await db.commit()
+    get_user_cache().invalidate_user(user.id)
     return {"message": "Perfil actualizado"}
 
 # --- DIAGNOSIS ROUTES ---
 
+async def _run_engine(symptom_lists):
+    """
+    Diagnóstico en el motor de inferencia (ai_stub.DiagnosisResult por lista),
+    traduciendo saturación y timeout a HTTP.
+    """
+    try:
+        return await inference.get_engine().analyze_batch(symptom_lists)
+    except inference.EngineOverloaded as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
+    except inference.EngineTimeout as e:
+        raise HTTPException(status_code=504, detail=str(e))
+
+async def _save_history(db: AsyncSession, user_id: int, symptoms, suggestions, detected):
+    await _insert_history_rows(db, [history_db.history_row(user_id, symptoms, suggestions, detected)])
+
 @app.post("/diagnose", response_model=schemas.DiagnoseResponse)
-def diagnose(payload: schemas.SymptomInput, current_user: models.User = Depends(auth.get_current_user), db: Session = Depends(get_db)):
-    # 1. IA Stub
-    suggestions = suggest_diagnoses(payload.symptoms)
-    
-    # 2. Guardar en Historial MySQL
-    diagnosis_json = json.dumps([d.dict() for d in suggestions])
-    symptoms_str = ", ".join(payload.symptoms)
-    
-    history_entry = models.History(
-        user_id=current_user.id,
-        symptoms=symptoms_str,
-        diagnosis_result=diagnosis_json
-    )
-    db.add(history_entry)
-    db.commit()
+async def diagnose(payload: schemas.SymptomInput, current_user: CachedUser = Depends(auth.get_current_user), db: AsyncSession = Depends(get_async_db)):
+    # 1. IA Stub en el motor de inferencia (hilos o pool de procesos, ver DIAGNOSE_ENGINE)
+    result = (await _run_engine([payload.symptoms]))[0]
+
+    # 2. Guardar en Historial MySQL (sesión asíncrona: no bloquea el event loop)
+    await _save_history(db, current_user.id, payload.symptoms, result.diagnoses, result.detected)
 
     return schemas.DiagnoseResponse(
-        disclaimer="Esto no sustituye una consulta médica; es orientación preliminar.",
-        diagnoses=suggestions
+        disclaimer=DISCLAIMER,
+        diagnoses=result.diagnoses
     )
 
-@app.get("/history")
-def get_history(current_user: models.User = Depends(auth.get_current_user), db: Session = Depends(get_db)):
-    records = db.query(models.History).filter(models.History.user_id == current_user.id).order_by(models.History.created_at.desc()).all()
-    
-    # Formatear respuesta
-    result = []
-    for r in records:
+@app.post("/diagnose/batch", response_model=schemas.BatchDiagnoseResponse)
+async def diagnose_batch(payload: schemas.BatchSymptomInput, current_user: CachedUser = Depends(auth.get_current_user), db: AsyncSession = Depends(get_async_db)):
+    if len(payload.items) > BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=413, detail=f"El lote supera el máximo de {BATCH_MAX_ITEMS} elementos")
+
+    results = [schemas.BatchDiagnoseItem(index=i) for i in range(len(payload.items))]
+
+    # 1. Validar cada elemento por separado (un error no invalida el lote)
+    valid = []
+    for i, raw in enumerate(payload.items):
         try:
-            dx = json.loads(r.diagnosis_result)
-        except:
-            dx = []
-        result.append({
-            "id": r.id,
-            "date": r.created_at.isoformat(),
-            "symptoms": r.symptoms.split(", "),
-            "diagnoses": dx
-        })
-    return result
+            item = schemas.SymptomInput.model_validate(raw)
+        except ValidationError as e:
+            results[i].error = f"Entrada inválida: {e.errors()[0]['msg']}"
+            continue
+        if not any(s and s.strip() for s in item.symptoms):
+            results[i].error = "No se indicaron síntomas"
+            continue
+        valid.append((i, item.symptoms))
+
+    # 2. IA Stub: una sola pasada vectorizada para todo el lote
+    symptom_lists = [symptoms for _, symptoms in valid]
+    try:
+        suggestions = await _run_engine(symptom_lists) if symptom_lists else []
+    except HTTPException:
+        raise
+    except Exception:
+        # Si la pasada conjunta falla, aislamos el elemento problemático
+        suggestions = []
+        for symptoms in symptom_lists:
+            try:
+                suggestions.append(await run_in_threadpool(analyze, symptoms))
+            except Exception:
+                suggestions.append(None)
+
+    # 3. Guardar en Historial MySQL con un único INSERT multi-fila
+    history_rows = []
+    for (i, symptoms), result in zip(valid, suggestions):
+        if result is None:
+            results[i].error = "No se pudo procesar este elemento"
+            continue
+        results[i].diagnoses = result.diagnoses
+        history_rows.append(history_db.history_row(current_user.id, symptoms, result.diagnoses, result.detected))
+    if history_rows:
+        await _insert_history_rows(db, history_rows)
+
+    return schemas.BatchDiagnoseResponse(disclaimer=DISCLAIMER, results=results)
+
+async def _insert_history_rows(db: AsyncSession, history_rows):
+    # HISTORY_WRITE_BEHIND=1: se encola y el writer lo escribe por lotes (sin esperar al commit)
+    writer = history_writer.get_writer()
+    if writer is not None:
+        try:
+            await writer.enqueue(history_rows)
+        except history_writer.HistoryQueueFull as e:
+            raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
+        return
+    await db.execute(insert(models.History), history_rows)
+    # Contadores de /analytics en la misma transacción que las filas
+    await analytics.record(db, history_rows)
+    await db.commit()
+
+async def _wait_for_history_writes(user_id: int):
+    """Lectura de lo propio escrito: las filas aún en la cola del writer se confirman antes de leer."""
+    writer = history_writer.get_writer()
+    if writer is not None:
+        await writer.wait_for_user(user_id)
+
+@app.post("/diagnose/next-question", response_model=schemas.NextQuestionResponse)
+def diagnose_next_question(payload: schemas.NextQuestionInput, current_user: CachedUser = Depends(auth.get_current_user)):
+    # Recorre el árbol de preguntas precalculado de la KB activa (O(profundidad))
+    try:
+        result = question_tree.next_question(payload.yes, payload.no)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return schemas.NextQuestionResponse(
+        symptom=result.symptom,
+        information_gain=round(result.information_gain, 4),
+        candidates=[schemas.ConditionProbability(condition=c, probability=p) for c, p in result.candidates],
+    )
+
+# --- SESIONES DE DIAGNÓSTICO (cuestionario guiado) ---
+
+def _get_session(session_id: str, user_id: int):
+    try:
+        return get_session_store().get(session_id, user_id)
+    except SessionNotFound:
+        raise HTTPException(status_code=404, detail="Sesión no encontrada o expirada")
+
+def _session_response(session) -> schemas.DiagnosisSessionResponse:
+    return schemas.DiagnosisSessionResponse(
+        session_id=session.id,
+        symptoms=list(session.inputs),
+        detected=session.symptoms,
+        diagnoses=session.diagnoses(),
+    )
+
+def _apply_session_delta(session, symptom: str, add: bool) -> schemas.DiagnosisSessionResponse:
+    with session.lock:
+        if add:
+            session.add(symptom)
+        else:
+            session.remove(symptom)
+        return _session_response(session)
+
+@app.post("/diagnose/sessions", response_model=schemas.DiagnosisSessionResponse)
+def create_diagnosis_session(current_user: CachedUser = Depends(auth.get_current_user)):
+    session = get_session_store().create(current_user.id)
+    return _session_response(session)
+
+@app.post("/diagnose/sessions/{session_id}/symptoms", response_model=schemas.DiagnosisSessionResponse)
+async def add_session_symptom(session_id: str, payload: schemas.SessionSymptomInput, current_user: CachedUser = Depends(auth.get_current_user)):
+    session = _get_session(session_id, current_user.id)
+    # Solo se empareja la entrada nueva y se recalculan las condiciones que la contienen
+    return await run_in_threadpool(_apply_session_delta, session, payload.symptom, True)
+
+@app.delete("/diagnose/sessions/{session_id}/symptoms/{symptom}", response_model=schemas.DiagnosisSessionResponse)
+async def remove_session_symptom(session_id: str, symptom: str, current_user: CachedUser = Depends(auth.get_current_user)):
+    session = _get_session(session_id, current_user.id)
+    return await run_in_threadpool(_apply_session_delta, session, symptom, False)
+
+@app.post("/diagnose/sessions/{session_id}/finalize", response_model=schemas.DiagnoseResponse)
+async def finalize_diagnosis_session(session_id: str, current_user: CachedUser = Depends(auth.get_current_user), db: AsyncSession = Depends(get_async_db)):
+    session = _get_session(session_id, current_user.id)
+    with session.lock:
+        if not session.inputs:
+            raise HTTPException(status_code=400, detail="No se indicaron síntomas")
+        symptoms = list(session.inputs)
+        detected = list(session.symptoms)
+        suggestions = session.diagnoses()
+    try:
+        get_session_store().pop(session_id, current_user.id)
+    except SessionNotFound:
+        # Otra petición finalizó la misma sesión a la vez: solo se guarda una vez
+        raise HTTPException(status_code=404, detail="Sesión no encontrada o expirada")
+
+    # Solo el resultado final llega al historial
+    await _save_history(db, current_user.id, symptoms, suggestions, detected)
+    return schemas.DiagnoseResponse(disclaimer=DISCLAIMER, diagnoses=suggestions)
+
+@app.get("/history")
+async def get_history(limit: int = Query(history_db.HISTORY_PAGE_SIZE, ge=1, le=history_db.HISTORY_PAGE_MAX),
+                      before: Optional[str] = None,
+                      current_user: CachedUser = Depends(auth.get_current_user), db: AsyncSession = Depends(get_async_db)):
+    # Paginación por cursor: `before` es el next_cursor de la página anterior;
+    # pasada la tabla caliente, el mismo cursor sigue en el archivo
+    await _wait_for_history_writes(current_user.id)
+    try:
+        rows, next_cursor = await history_archive.fetch_page(db, current_user.id, limit, before)
+    except history_db.InvalidCursor:
+        raise HTTPException(status_code=400, detail="Cursor de historial inválido")
+    # El JSON guardado de cada fila va directo al cuerpo, sin parsear ni re-codificar
+    return Response(content=history_db.page_json(rows, next_cursor), media_type="application/json")
+
+@app.get("/history/export")
+async def export_history(request: Request, format: Literal["ndjson", "csv"] = "ndjson",
+                         current_user: CachedUser = Depends(auth.get_current_user)):
+    # Respuesta por bloques (chunked): la memoria no crece con el tamaño del historial
+    await _wait_for_history_writes(current_user.id)
+    chunks = history_archive.export_rows(current_user.id, format)
+    media_type = "application/x-ndjson" if format == "ndjson" else "text/csv; charset=utf-8"
+    headers = {"Content-Disposition": f'attachment; filename="historial.{format}"'}
+    if "gzip" in request.headers.get("accept-encoding", ""):
+        chunks = history_db.gzip_chunks(chunks)
+        headers["Content-Encoding"] = "gzip"
+        headers["Vary"] = "Accept-Encoding"
+    return StreamingResponse(chunks, media_type=media_type, headers=headers)
+
+# --- ANALYTICS ROUTES ---
+
+_analytics_days = Query(7, ge=1, le=analytics.ANALYTICS_MAX_DAYS)
+_analytics_top = Query(10, ge=1, le=100)
+
+@app.get("/analytics/conditions", dependencies=[Depends(auth.require_admin)])
+async def analytics_conditions(days: int = _analytics_days, top: int = _analytics_top,
+                               db: AsyncSession = Depends(get_async_db)):
+    # Lee solo los contadores de los días pedidos, nunca el historial
+    return await analytics.top_per_day(db, "condition", days, top)
+
+@app.get("/analytics/symptoms", dependencies=[Depends(auth.require_admin)])
+async def analytics_symptoms(days: int = _analytics_days, top: int = _analytics_top,
+                             db: AsyncSession = Depends(get_async_db)):
+    return await analytics.top_per_day(db, "symptom", days, top)
+
+@app.get("/analytics/users/{user_id}/conditions", dependencies=[Depends(auth.require_admin)])
+async def analytics_user_conditions(user_id: int, days: int = Query(30, ge=1, le=analytics.ANALYTICS_MAX_DAYS),
+                                    db: AsyncSession = Depends(get_async_db)):
+    return await analytics.user_trend(db, user_id, days)
+
+@app.get("/analytics/me/conditions")
+async def analytics_my_conditions(days: int = Query(30, ge=1, le=analytics.ANALYTICS_MAX_DAYS),
+                                  current_user: CachedUser = Depends(auth.get_current_user),
+                                  db: AsyncSession = Depends(get_async_db)):
+    await _wait_for_history_writes(current_user.id)
+    return await analytics.user_trend(db, current_user.id, days)
 
 @app.get("/health")
-def health():
-    return {"status": "ok", "db": "mysql"}
+async def health():
+    # SELECT 1 real contra la base más el estado del pool: 503 si la base no responde
+    body = {"status": "ok", "db": async_engine.dialect.name}
+    try:
+        await ping_db()
+    except Exception as e:
+        body.update(status="error", error=type(e).__name__, pool=pool_stats().get("async"))
+        return JSONResponse(status_code=503, content=body)
+    body["pool"] = pool_stats().get("async")
+    return body
+
+@app.get("/metrics")
+def metrics():
+    # En modo "process" el coalescer activo es el del motor (delante del pool)
+    active_coalescer = inference.get_engine().coalescer or coalescer.get_coalescer()
+    writer = history_writer.get_writer()
+    retention = history_archive.get_job()
+    return {
+        "coalescer": active_coalescer.stats() if active_coalescer else {"enabled": False},
+        "engine": inference.get_engine().stats(),
+        "db_pool": pool_stats(),
+        "history_writer": writer.stats() if writer else {"enabled": False},
+        "history_retention": retention.stats() if retention else {"enabled": False},
+        "auth_cache": get_user_cache().stats(),
+        "password_hasher": get_hasher().stats(),
+        "sessions": get_session_store().stats(),
+        "cache": cache_stats(),
+        "kb": get_index().info(),
+        "questions": question_tree.get_question_tree().stats(),
+        "memory": memory_report.memory_stats(),
+    }
+
+# --- ADMIN ROUTES ---
+
+@app.post("/admin/kb/reload", dependencies=[Depends(auth.require_admin)])
+def admin_reload_kb():
+    previous = get_index().version
+    try:
+        index = reload_index()
+    except (OSError, ValueError) as e:
+        raise HTTPException(status_code=400, detail=f"No se pudo cargar la KB: {e}")
+    # Solo este worker ha recargado: tocar el fichero hace que el watcher de los demás lo haga
+    # en como mucho KB_WATCH_SECONDS (en este la segunda recarga no cambia nada)
+    notified = KB_WATCH_SECONDS > 0 and touch_source()
+    return {
+        "previous_version": previous,
+        "reloaded": index.version != previous,
+        "workers_notified": notified,
+        "watch_seconds": KB_WATCH_SECONDS,
+        **index.info(),
+    }
 
 @app.delete("/history/{item_id}")
-def delete_history(item_id: int, current_user: models.User = Depends(auth.get_current_user), db: Session = Depends(get_db)):
-    record = db.query(models.History).filter(models.History.id == item_id, models.History.user_id == current_user.id).first()
-    if not record:
-        raise HTTPException(status_code=404, detail="Registro no encontrado")
-    
-    db.delete(record)
-    db.commit()
+async def delete_history(item_id: int, current_user: CachedUser = Depends(auth.get_current_user), db: AsyncSession = Depends(get_async_db)):
+    owned = (models.History.id == item_id, models.History.user_id == current_user.id)
+    row = (await db.execute(
+        select(models.History.user_id, models.History.created_at, models.History.symptoms,
+               models.History.diagnosis_result, models.History.detected).where(*owned)
+    )).first()
+    result = await db.execute(delete(models.History).where(*owned)) if row else None
+    if result and result.rowcount:
+        deleted = dict(row._mapping)
+    else:
+        # No está en la tabla: puede estar archivado (/history también lo muestra)
+        archived = await run_in_threadpool(history_archive.get_archive().delete, current_user.id, item_id)
+        if archived is None:
+            raise HTTPException(status_code=404, detail="Registro no encontrado")
+        deleted = {"user_id": current_user.id, **archived._asdict()}
+    # Los contadores de /analytics dejan de contar el registro en la misma transacción
+    await analytics.forget(db, [deleted])
+    await db.commit()
     return {"status": "deleted"}
 
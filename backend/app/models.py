@@ -1,8 +1,17 @@
-from sqlalchemy import Column, Integer, String, DateTime, Text, ForeignKey
+from sqlalchemy import Column, Integer, String, Date, DateTime, Text, ForeignKey, Index
+from sqlalchemy.ext.compiler import compiles
 from sqlalchemy.orm import relationship
 from .database import Base
 from datetime import datetime
 
+class JSONText(Text):
+    """JSON ya serializado que se lee y escribe como texto; en MySQL la columna es JSON (database.sql)."""
+    cache_ok = True
+
+@compiles(JSONText, "mysql")
+def _json_text_mysql(type_, compiler, **kw):
+    return "JSON"
+
 class User(Base):
     __tablename__ = "users"
 
@@ -21,8 +30,39 @@ class History(Base):
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"))
-    symptoms = Column(Text, nullable=False)
-    diagnosis_result = Column(Text)
+    symptoms = Column(JSONText, nullable=False)
+    diagnosis_result = Column(JSONText)
+    # Síntomas de la KB detectados al diagnosticar (los que cuenta /analytics); NULL en filas antiguas
+    detected = Column(JSONText)
     created_at = Column(DateTime, default=datetime.utcnow)
 
     owner = relationship("User", back_populates="history")
+
+    __table_args__ = (
+        # /history pagina por (created_at, id) dentro de cada usuario: cada página es un rango del índice
+        Index("ix_history_user_created", "user_id", created_at.desc(), id.desc()),
+    )
+
+# --- Analítica: contadores por día mantenidos al guardar cada diagnóstico ---
+
+class ConditionDaily(Base):
+    __tablename__ = "analytics_condition_daily"
+
+    day = Column(Date, primary_key=True)
+    condition = Column(String(255), primary_key=True)
+    total = Column(Integer, nullable=False, default=0)
+
+class SymptomDaily(Base):
+    __tablename__ = "analytics_symptom_daily"
+
+    day = Column(Date, primary_key=True)
+    symptom = Column(String(255), primary_key=True)
+    total = Column(Integer, nullable=False, default=0)
+
+class UserConditionDaily(Base):
+    __tablename__ = "analytics_user_condition_daily"
+
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    day = Column(Date, primary_key=True)
+    condition = Column(String(255), primary_key=True)
+    total = Column(Integer, nullable=False, default=0)
@@ -38,8 +38,43 @@ class DiagnoseResponse(BaseModel):
   disclaimer: str
   diagnoses: List[Diagnosis]
 
+class BatchSymptomInput(BaseModel):
+  # Se validan elemento a elemento para reportar errores sin rechazar todo el lote
+  items: List[Any] = Field(..., description="Lista de objetos con el formato de SymptomInput")
+
+class BatchDiagnoseItem(BaseModel):
+  index: int
+  diagnoses: Optional[List[Diagnosis]] = None
+  error: Optional[str] = None
+
+class BatchDiagnoseResponse(BaseModel):
+  disclaimer: str
+  results: List[BatchDiagnoseItem]
+
 class HistoryItem(BaseModel):
     id: int
     date: str
     symptoms: List[str]
     diagnoses: List[Diagnosis]
+
+class SessionSymptomInput(BaseModel):
+  symptom: str = Field(..., description="Síntoma en texto libre (una respuesta del cuestionario)")
+
+class DiagnosisSessionResponse(BaseModel):
+  session_id: str
+  symptoms: List[str]
+  detected: List[str]
+  diagnoses: List[Diagnosis]
+
+class NextQuestionInput(BaseModel):
+  yes: List[str] = Field(default_factory=list, description="Síntomas de la KB confirmados")
+  no: List[str] = Field(default_factory=list, description="Síntomas de la KB descartados")
+
+class ConditionProbability(BaseModel):
+  condition: str
+  probability: float
+
+class NextQuestionResponse(BaseModel):
+  symptom: Optional[str]
+  information_gain: float
+  candidates: List[ConditionProbability]
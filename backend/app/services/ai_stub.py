@@ -1,362 +1,427 @@
-from typing import Dict, List, Tuple
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Set, Tuple
 import numpy as np
-import re
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
+import os
+import threading
+from scipy.sparse import csr_matrix
 from ..schemas import Diagnosis
+from .diagnosis_cache import MISSING, LRUCache
+from .kb_artifacts import (KB_ARTIFACT_DIR, KB_SOURCE, KBSource, csr_from_arrays, csr_to_arrays,
+                           ensure_artifact, kb_fingerprint, load_artifact, load_source)
+from .normalizer import NEGATIONS, Normalizer
+from .spelling import SPELL_MAX_DISTANCE, SpellingIndex
+from .symptom_index import NgramIndex
 
 # --- BASE DE CONOCIMIENTO (KNOWLEDGE BASE) ---
-# Definimos constantes para síntomas comunes para evitar errores de dedo
-S_DOLOR_CABEZA = "dolor de cabeza"
-S_FIEBRE = "fiebre"
-S_TOS = "tos"
-S_DOLOR_ESTOMAGO = "dolor de estomago"
-
-KB: Dict[str, Dict[str, float]] = {
-    # Infecciones respiratorias
-    "Resfriado Común": {
-        S_TOS: 0.30,
-        "congestion nasal": 0.30,
-        "goteo nasal": 0.25,
-        "dolor de garganta": 0.25,
-        "estornudos": 0.20,
-        S_FIEBRE: 0.10, # Poco común
-        "malestar general": 0.20,
-    },
-    "Gripe Estacional": {
-        S_FIEBRE: 0.40,
-        "escalofrios": 0.25,
-        "dolor muscular": 0.30,
-        S_TOS: 0.25,
-        "fatiga extrema": 0.30,
-        S_DOLOR_CABEZA: 0.25,
-    },
-    "COVID-19": {
-        S_FIEBRE: 0.35,
-        S_TOS: 0.35,
-        "dificultad para respirar": 0.40,
-        "perdida de olfato": 0.45, # Muy específico
-        "perdida de gusto": 0.45,
-        "dolor de garganta": 0.20,
-        "dolor muscular": 0.20,
-    },
-    # Cefaleas
-    "Migraña": {
-        S_DOLOR_CABEZA: 0.50,
-        "nauseas": 0.30,
-        "sensibilidad a la luz": 0.35, # Fotofobia
-        "sensibilidad al ruido": 0.25, # Fonofobia
-        "vision borrosa o aura": 0.30,
-    },
-    "Cefalea Tensional": {
-        S_DOLOR_CABEZA: 0.45,
-        "estres o ansiedad": 0.30,
-        "tension en el cuello": 0.35,
-        "mala postura": 0.20,
-    },
-    # Gastrointestinal
-    "Gastroenteritis": {
-        "nauseas": 0.35,
-        "vomitos": 0.40,
-        "diarrea": 0.45,
-        "dolor abdominal": 0.35,
-        S_FIEBRE: 0.20,
-    },
-    "Indigestión / Acidez": {
-        "ardor de estomago": 0.40,
-        "gases": 0.30,
-        "sensacion de llenura": 0.30,
-        "eructos": 0.20,
-        "dolor abdominal": 0.20,
-    },
-    # Alergias
-    "Alergia Estacional": {
-        "estornudos": 0.35,
-        "picazon en ojos": 0.30,
-        "ojos llorosos": 0.30,
-        "goteo nasal": 0.25,
-        "congestion nasal": 0.20,
-    },
-    # Salud Mental (Básico)
-    "Ansiedad Generalizada": {
-        "palpitaciones": 0.30,
-        "sensacion de ahogo": 0.30,
-        "miedo irracional": 0.25,
-        "sudoracion excesiva": 0.20,
-        "temblores": 0.20,
-        "insomnio": 0.20,
-    },
-    # Piel
-    "Dermatitis / Eczema": {
-        "picazon en piel": 0.40,
-        "enrojecimiento": 0.30,
-        "piel seca": 0.30,
-        "erupcion cutanea": 0.30,
-    },
-    "Conjuntivitis": {
-        "ojo rojo": 0.40,
-        "picazon en ojos": 0.30,
-        "lagañas": 0.30,
-        "sensibilidad a la luz": 0.20,
-    },
-    # Oído, Nariz y Garganta (ORL)
-    "Sinusitis": {
-        "dolor facial": 0.40,
-        "congestion nasal": 0.30,
-        "moco verde": 0.30,
-        S_DOLOR_CABEZA: 0.20,
-        S_FIEBRE: 0.15,
-    },
-    "Faringitis / Amigdalitis": {
-        "dolor de garganta": 0.50,
-        "dificultad para tragar": 0.40,
-        S_FIEBRE: 0.30,
-        "placas en garganta": 0.30,
-        "ganglios inflamados": 0.20,
-    },
-    "Otitis": {
-        "dolor de oido": 0.50,
-        S_FIEBRE: 0.25,
-        "mareo": 0.20,
-        "secrecion oido": 0.30,
-    },
-    # Muscular / Esquelético
-    "Contractura / Lumbalgia": {
-        "dolor de espalda": 0.45,
-        "rigidez muscular": 0.35,
-        "dolor al moverse": 0.30,
-        "dolor lumbar": 0.40,
-    },
-    # Otros
-    "Deshidratación": {
-        "sed excesiva": 0.45,
-        "boca seca": 0.40,
-        "orina oscura": 0.35,
-        "mareo": 0.30,
-        "fatiga extrema": 0.25,
-    },
-    "Anemia": {
-        "palidez": 0.40,
-        "fatiga extrema": 0.40,
-        "mareo": 0.30,
-        "frio": 0.25,
-        "debilidad": 0.30,
-    },
-    # Sueño
-    "Insomnio": {
-        "dificultad para dormir": 0.50,
-        "despertar nocturno": 0.30,
-        "cansancio diurno": 0.20,
-        "irritabilidad": 0.20,
-    }
-}
-
-RECS: Dict[str, str] = {
-    "Resfriado Común": "Hidratación constante, descanso y analgésicos de venta libre si es necesario.",
-    "Gripe Estacional": "Reposo absoluto, mucha hidratación. Consulte al médico si la fiebre es muy alta.",
-    "COVID-19": "Aislamiento preventivo, uso de mascarilla y monitoreo de oxígeno. Busque ayuda si falta el aire.",
-    "Migraña": "Descanso en habitación oscura y silenciosa. Tome su medicación prescrita si la tiene.",
-    "Cefalea Tensional": "Realice estiramientos de cuello, mejore su postura y tome pausas activas.",
-    "Gastroenteritis": "Dieta blanda y suero oral para evitar deshidratación. Evite lácteos.",
-    "Indigestión / Acidez": "Evite comidas pesadas, picantes o grasas. No se acueste inmediatamente después de comer.",
-    "Alergia Estacional": "Evite alérgenos conocidos. Consulte sobre antihistamínicos si los síntomas persisten.",
-    "Ansiedad Generalizada": "Pruebe técnicas de respiración profunda. Si interfiere con su vida diaria, busque apoyo psicológico.",
-    "Dermatitis / Eczema": "Mantenga la piel hidratada con cremas neutras. Evite rascarse y el uso de jabones agresivos.",
-    "Conjuntivitis": "Lave sus ojos con suero fisiológico. No comparta toallas y evite tocarse los ojos.",
-    "Sinusitis": "Lavados nasales con agua salina, inhalaciones de vapor y mucha hidratación.",
-    "Faringitis / Amigdalitis": "Gárgaras con agua tibia y sal, miel con limón y analgésicos si hay dolor.",
-    "Otitis": "Evite mojar el oído. Aplique calor seco local. Consulte al médico si hay supuración.",
-    "Contractura / Lumbalgia": "Calor local, estiramientos suaves y evitar levantar peso. Mejore su postura.",
-    "Deshidratación": "Beba agua o suero oral en pequeños sorbos constantes. Evite el sol directo.",
-    "Anemia": "Consuma alimentos ricos en hierro (carnes rojas, espinacas, lentejas). Consulte a un médico para análisis.",
-    "Insomnio": "Mantenga una rutina de sueño regular. Evite pantallas y cafeína antes de dormir.",
-}
+# La KB, las recomendaciones, los sinónimos (lenguaje coloquial) y las
+# stopwords viven en un fichero versionado (KB_SOURCE, JSON o YAML). Estos
+# nombres reflejan la versión cargada y se actualizan con reload_index().
+_SOURCE = load_source(KB_SOURCE)
+KB: Dict[str, Dict[str, float]] = _SOURCE.kb
+RECS: Dict[str, str] = _SOURCE.recs
+SYNONYMS: Dict[str, str] = _SOURCE.synonyms
+STOPWORDS: Set[str] = set(_SOURCE.stopwords)
 
 # --- LÓGICA DE IA (NLP) ---
 
-# Diccionario de sinónimos para normalizar lenguaje coloquial
-SYNONYMS = {
-    # Cabeza
-    "jaqueca": S_DOLOR_CABEZA, "cefalea": S_DOLOR_CABEZA, "coco": S_DOLOR_CABEZA,
-    # Estomago
-    "panza": "dolor abdominal", "barriga": "dolor abdominal", "tripa": "dolor abdominal", "estomago": "dolor abdominal",
-    "ardor": "ardor de estomago", "acidez": "ardor de estomago", "reflujo": "ardor de estomago",
-    # Vomito
-    "devolver": "vomitos", "guacara": "vomitos", "arqueada": "vomitos", "vomito": "vomitos",
-    # Fiebre
-    "calentura": S_FIEBRE, "temperatura": S_FIEBRE, "ardiendo": S_FIEBRE, "febrícula": S_FIEBRE,
-    # Cansancio
-    "fatiga": "fatiga extrema", "agotamiento": "fatiga extrema", "sueño": "fatiga extrema", "debilidad": "fatiga extrema", "cansado": "fatiga extrema",
-    "debil": "fatiga extrema", "devil": "fatiga extrema", "sin fuerzas": "fatiga extrema", "bajon": "fatiga extrema",
-    # Respirar
-    "aire": "dificultad para respirar", "ahogo": "dificultad para respirar", "asfixia": "dificultad para respirar", "disnea": "dificultad para respirar",
-    # Piel
-    "ronchas": "erupcion cutanea", "granos": "erupcion cutanea", "sarpullido": "erupcion cutanea", "pica": "picazon en piel", "comezon": "picazon en piel",
-    # Ojos
-    "lagaña": "lagañas", "rojo": "ojo rojo",
-    # ORL
-    "tragar": "dificultad para tragar", "pasar": "dificultad para tragar", "garganta": "dolor de garganta",
-    "oido": "dolor de oido", "oreja": "dolor de oido", "zumbido": "dolor de oido",
-    "moco": "congestion nasal", "tupido": "congestion nasal", "constipado": "congestion nasal",
-    # Muscular
-    "espalda": "dolor de espalda", "cintura": "dolor lumbar", "lumbago": "dolor lumbar", "riñones": "dolor lumbar",
-    "tieso": "rigidez muscular", "duro": "rigidez muscular",
-    # General
-    "sed": "sed excesiva", "seca": "boca seca", "seco": "boca seca",
-    "palido": "palidez", "blanco": "palidez", "amarillo": "palidez",
-    "frio": "frio", "helado": "frio",
-    # Sueño
-    "dormir": "dificultad para dormir", "despierto": "despertar nocturno", "desvelo": "dificultad para dormir"
-}
-
-# Palabras vacías en español para filtrar ruido
-STOPWORDS = {
-    "el", "la", "los", "las", "un", "una", "unos", "unas", "y", "o", "pero", "si", "no", "en", "de", "del", "al", "a", "con", "sin", "por", "para",
-    "mi", "mis", "tu", "tus", "su", "sus", "me", "te", "se", "nos", "le", "les", "lo", "la", "que", "cual", "quien", "donde", "cuando", "como",
-    "tengo", "siento", "mucho", "mucha", "poco", "poca", "muy", "mas", "menos", "bastante", "demasiado", "todo", "nada", "algo", "es", "son", "esta", "estan"
-}
-
 def _get_all_known_symptoms() -> List[str]:
     """Extrae una lista única de todos los síntomas que el sistema conoce."""
-    symptoms = set()
-    for condition_data in KB.values():
-        symptoms.update(condition_data.keys())
+    return _known_symptoms_of(KB)
+
+def _known_symptoms_of(kb: Dict[str, Dict[str, float]]) -> List[str]:
+    # dict.fromkeys conserva el orden de aparición en KB (orden estable entre procesos)
+    symptoms: Dict[str, None] = {}
+    for condition_data in kb.values():
+        symptoms.update(dict.fromkeys(condition_data.keys()))
     return list(symptoms)
 
-def _split_sentences(text_list: List[str]) -> List[str]:
-    """Divide oraciones largas en fragmentos más pequeños basados en conectores comunes."""
-    split_list = []
-    separators = r'[,.;y\n]|\by\b|\bo\b|\bademas\b' # Coma, punto, 'y', 'o', 'ademas'
-    
-    for text in text_list:
-        # Dividir por separadores
-        parts = re.split(separators, text)
-        # Limpiar espacios y filtrar vacíos
-        clean_parts = [p.strip() for p in parts if p.strip()]
-        split_list.extend(clean_parts)
-        
-    return split_list
-
-def _normalize_text(text: str) -> str:
-    """Aplica sinónimos y elimina stopwords."""
-    words = text.lower().split()
-    normalized_words = []
-    
-    for word in words:
-        # 1. Reemplazo de sinónimos
-        word = SYNONYMS.get(word, word)
-        # 2. Filtrado de stopwords (solo si no es una palabra clave médica que coincida con stopword, raro pero posible)
-        if word not in STOPWORDS:
-            normalized_words.append(word)
-            
-    return " ".join(normalized_words)
-
-def _is_negated(text: str) -> bool:
-    """Detecta negaciones simples como 'no tengo', 'sin', etc."""
-    negations = ["no ", "sin ", "nunca ", "jamás "]
-    return any(text.startswith(neg) for neg in negations)
-
-def _match_symptoms_with_ai(user_inputs: List[str], threshold: float = 0.15) -> List[str]:
+# Parámetros por defecto del matching (similitud mínima y síntomas por fragmento)
+MATCH_THRESHOLD = 0.15
+MATCH_TOP_K = 2
+
+class SymptomMatcher:
+    """
+    Matching de texto libre contra los síntomas conocidos.
+
+    El índice de n-gramas (TF-IDF + listas invertidas) se construye una sola
+    vez; en cada petición solo se transforma el texto del usuario y se
+    puntúan los síntomas que comparten n-gramas con él.
+
+    Los fragmentos que coinciden exactamente con un síntoma conocido (o con
+    una frase precalculada, p. ej. el destino de un sinónimo) tienen su
+    resultado guardado en `exact` y no pasan por el TF-IDF.
+    """
+
+    def __init__(self, known_symptoms: Iterable[str], ngram_range: Tuple[int, int] = (2, 4)):
+        self.known_symptoms: List[str] = list(known_symptoms)
+        # Usamos char_wb (n-gramas de caracteres) para ser robustos ante errores ortográficos leves
+        self.index = NgramIndex(self.known_symptoms, ngram_range=ngram_range)
+        self.exact: Dict[str, List[str]] = {}
+        self.precompute(self.known_symptoms)
+
+    @classmethod
+    def from_index(cls, index: NgramIndex, arrays: Optional[Dict[str, np.ndarray]] = None) -> "SymptomMatcher":
+        """
+        Matcher sobre un índice ya ajustado (p. ej. cargado de un artefacto).
+        Si `arrays` trae la tabla exacta exportada, no se recalcula.
+        """
+        matcher = cls.__new__(cls)
+        matcher.known_symptoms = list(index.terms)
+        matcher.index = index
+        matcher.exact = {}
+        if arrays is not None and "exact.keys" in arrays:
+            indptr, ids = arrays["exact.indptr"], arrays["exact.ids"].tolist()
+            for i, key in enumerate(arrays["exact.keys"].tolist()):
+                matcher.exact[key] = [matcher.known_symptoms[j] for j in ids[indptr[i]:indptr[i + 1]]]
+        matcher.precompute(matcher.known_symptoms)
+        return matcher
+
+    def exact_to_arrays(self) -> Dict[str, np.ndarray]:
+        """Tabla exacta como arrays (claves + ids de síntoma en formato CSR)."""
+        position = {s: i for i, s in enumerate(self.known_symptoms)}
+        keys = list(self.exact)
+        ids = [position[s] for k in keys for s in self.exact[k]]
+        indptr = np.cumsum([0] + [len(self.exact[k]) for k in keys])
+        return {
+            "exact.keys": np.array(keys, dtype=str),
+            "exact.indptr": np.asarray(indptr, dtype=np.int64),
+            "exact.ids": np.asarray(ids, dtype=np.int64),
+        }
+
+    def precompute(self, fragments: Iterable[str]) -> None:
+        """Guarda el resultado (con los parámetros por defecto) de estos fragmentos."""
+        pending = [f for f in dict.fromkeys(fragments) if f not in self.exact]
+        if not pending or not self.known_symptoms:
+            return
+        hits = self.index.search(pending, top_k=MATCH_TOP_K, threshold=MATCH_THRESHOLD)
+        for fragment, fragment_hits in zip(pending, hits):
+            self.exact[fragment] = [self.known_symptoms[idx] for idx, _ in fragment_hits]
+
+    def similarities(self, fragments: List[str]) -> np.ndarray:
+        """Matriz densa (fragmentos x síntomas conocidos) de similitud de coseno."""
+        return self.index.similarities(fragments)
+
+    def match(self, fragments: List[str], threshold: float = MATCH_THRESHOLD, top_k: int = MATCH_TOP_K) -> List[str]:
+        """Devuelve los síntomas conocidos que superan el umbral (top_k por fragmento)."""
+        return self.match_batch([fragments], threshold=threshold, top_k=top_k)[0]
+
+    def match_batch(self, fragment_groups: List[List[str]], threshold: float = MATCH_THRESHOLD, top_k: int = MATCH_TOP_K) -> List[List[str]]:
+        """
+        Igual que match() para varios grupos de fragmentos a la vez: todos los
+        fragmentos se vectorizan en una sola matriz dispersa.
+        """
+        all_fragments = [f for group in fragment_groups for f in group]
+        per_fragment = self.match_fragments(all_fragments, threshold=threshold, top_k=top_k)
+        results = []
+        offset = 0
+        for group in fragment_groups:
+            results.append(_merge_matches(per_fragment[offset:offset + len(group)]))
+            offset += len(group)
+        return results
+
+    def match_fragments(self, fragments: List[str], threshold: float = MATCH_THRESHOLD, top_k: int = MATCH_TOP_K) -> List[List[str]]:
+        """Síntomas conocidos (top_k sobre el umbral) de cada fragmento por separado."""
+        if not self.known_symptoms or not fragments:
+            return [[] for _ in fragments]
+
+        exact = self.exact if (threshold, top_k) == (MATCH_THRESHOLD, MATCH_TOP_K) else {}
+        results: List[Optional[List[str]]] = [exact.get(f) for f in fragments]
+        misses = [i for i, r in enumerate(results) if r is None]
+        if misses:
+            hits = self.index.search([fragments[i] for i in misses], top_k=top_k, threshold=threshold)
+            for i, fragment_hits in zip(misses, hits):
+                results[i] = [self.known_symptoms[idx] for idx, _ in fragment_hits]
+        return [list(r) for r in results]
+
+
+def _merge_matches(fragment_matches: Iterable[List[str]]) -> List[str]:
+    """Une los síntomas de varios fragmentos sin duplicados (orden de aparición)."""
+    detected: Dict[str, None] = {}
+    for matches in fragment_matches:
+        detected.update(dict.fromkeys(matches))
+    return list(detected)
+
+
+def _preprocess_inputs(user_inputs: List[str], index: Optional["KnowledgeIndex"] = None) -> List[str]:
+    """Divide, descarta fragmentos negados y normaliza el texto del usuario."""
+    return (index or get_index()).normalizer.fragments(user_inputs)
+
+
+def _match_symptoms_with_ai(user_inputs: List[str], threshold: float = MATCH_THRESHOLD) -> List[str]:
     """
     Usa TF-IDF y Similitud de Coseno para encontrar qué síntomas conocidos
     se parecen más a lo que escribió el usuario.
     """
-    known_symptoms = _get_all_known_symptoms()
-    
-    # Pre-procesamiento: Dividir oraciones largas
-    raw_parts = _split_sentences(user_inputs)
-    
-    # Normalizar cada parte (sinónimos + stopwords)
-    processed_inputs = []
-    valid_indices = [] # Para rastrear qué input original corresponde a qué procesado
-    
-    for i, part in enumerate(raw_parts):
-        if _is_negated(part):
-            continue
-        norm = _normalize_text(part)
-        if norm:
-            processed_inputs.append(norm)
-            valid_indices.append(i)
-
-    if not known_symptoms or not processed_inputs:
+    processed_inputs = _preprocess_inputs(user_inputs)
+    if not processed_inputs:
         return []
+    return get_matcher().match(processed_inputs, threshold=threshold)
 
-    # Creamos un "corpus" que incluye los síntomas conocidos
-    # Entrenamos el vectorizador con nuestro vocabulario médico
-    vectorizer = TfidfVectorizer(analyzer='char_wb', ngram_range=(2, 4)) 
-    # Usamos char_wb (n-gramas de caracteres) para ser robustos ante errores ortográficos leves
-    
-    tfidf_matrix = vectorizer.fit_transform(known_symptoms + processed_inputs)
-    
-    # Separamos la matriz: Parte conocida vs Parte del usuario
-    known_vectors = tfidf_matrix[:len(known_symptoms)]
-    user_vectors = tfidf_matrix[len(known_symptoms):]
-
-    detected_symptoms = set()
-
-    # Calculamos similitud de cada entrada del usuario contra todos los síntomas conocidos
-    similarity_matrix = cosine_similarity(user_vectors, known_vectors)
-
-    for i, _ in enumerate(processed_inputs):
-        # Obtenemos las similitudes para esta entrada específica
-        sim_scores = similarity_matrix[i]
-        
-        # Indices ordenados por score descendente
-        top_indices = np.argsort(sim_scores)[::-1][:2] 
-        
-        for idx in top_indices:
-            score = sim_scores[idx]
-            if score >= threshold:
-                matched_symptom = known_symptoms[idx]
-                detected_symptoms.add(matched_symptom)
-
-    return list(detected_symptoms)
-
-def _calculate_diagnosis_score(detected_symptoms: List[str]) -> List[Tuple[str, float, List[str]]]:
-    """Calcula la probabilidad de cada enfermedad basada en los síntomas detectados."""
-    scores = []
-    
-    for condition, weights in KB.items():
-        current_score = 0.0
-        max_possible_score = sum(weights.values()) # Normalización
-        matched_for_condition = []
-
-        for symptom in detected_symptoms:
-            if symptom in weights:
-                current_score += weights[symptom]
-                matched_for_condition.append(symptom)
-        
-        # Calculamos porcentaje de coincidencia
-        if max_possible_score > 0:
-            probability = current_score / max_possible_score
+class ConditionScorer:
+    """
+    KB compilada como matriz dispersa (condiciones x síntomas).
+
+    Guarda el índice síntoma -> columna y la suma de pesos de cada condición
+    (normalizador), de modo que puntuar es un solo producto matriz-vector.
+    """
+
+    def __init__(self, kb: Dict[str, Dict[str, float]]):
+        self.conditions: List[str] = list(kb.keys())
+        self.symptom_index: Dict[str, int] = {}
+        rows, cols, data = [], [], []
+        for row, weights in enumerate(kb.values()):
+            for symptom, weight in weights.items():
+                col = self.symptom_index.setdefault(symptom, len(self.symptom_index))
+                rows.append(row)
+                cols.append(col)
+                data.append(weight)
+
+        shape = (len(self.conditions), len(self.symptom_index))
+        self.weights = csr_matrix((data, (rows, cols)), shape=shape, dtype=np.float64)
+        self.weights.sort_indices()
+        self._weights_t = self.weights.T.tocsr()
+        self._weights_t.sort_indices()
+        row_sums = np.asarray(self.weights.sum(axis=1)).ravel()
+        # Condiciones sin pesos quedan con normalizador 0 -> probabilidad 0
+        self.inv_normalizers = np.divide(1.0, row_sums, out=np.zeros_like(row_sums), where=row_sums > 0)
+
+    @classmethod
+    def from_arrays(cls, kb: Dict[str, Dict[str, float]], arrays: Dict[str, np.ndarray]) -> "ConditionScorer":
+        """Scorer con las matrices ya compiladas (p. ej. mapeadas desde un artefacto)."""
+        scorer = cls.__new__(cls)
+        scorer.conditions = list(kb.keys())
+        scorer.symptom_index = {}
+        for weights in kb.values():
+            for symptom in weights:
+                scorer.symptom_index.setdefault(symptom, len(scorer.symptom_index))
+        scorer.weights = csr_from_arrays(arrays, "scorer.weights")
+        if scorer.weights.shape != (len(scorer.conditions), len(scorer.symptom_index)):
+            raise ValueError("Los arrays no corresponden a esta KB")
+        scorer._weights_t = csr_from_arrays(arrays, "scorer.weights_t")
+        scorer.inv_normalizers = arrays["scorer.inv_normalizers"]
+        return scorer
+
+    def to_arrays(self) -> Dict[str, np.ndarray]:
+        arrays = {"scorer.inv_normalizers": self.inv_normalizers}
+        arrays.update(csr_to_arrays("scorer.weights", self.weights))
+        arrays.update(csr_to_arrays("scorer.weights_t", self._weights_t))
+        return arrays
+
+    def indicator(self, detected_groups: List[List[str]]) -> csr_matrix:
+        """Matriz 0/1 (grupos x columnas de la KB), una fila por grupo de síntomas."""
+        indptr, indices = [0], []
+        for detected_symptoms in detected_groups:
+            cols = {self.symptom_index[s] for s in detected_symptoms if s in self.symptom_index}
+            indices.extend(sorted(cols))
+            indptr.append(len(indices))
+        shape = (len(detected_groups), len(self.symptom_index))
+        return csr_matrix((np.ones(len(indices)), indices, indptr), shape=shape)
+
+    def probabilities(self, indicator: csr_matrix) -> csr_matrix:
+        """
+        Probabilidad de cada condición (suma de pesos coincidentes / suma total).
+        Se devuelve dispersa: solo las condiciones con algún síntoma en común.
+        """
+        probs = (indicator @ self._weights_t).tocsr()
+        probs.data *= self.inv_normalizers[probs.indices]
+        return probs
+
+    def top_k(self, detected_symptoms: List[str], k: int = 3) -> List[Tuple[str, float, List[str]]]:
+        """Las k condiciones más probables (prob > 0) con sus síntomas coincidentes."""
+        return self.top_k_batch([detected_symptoms], k=k)[0]
+
+    def top_k_batch(self, detected_groups: List[List[str]], k: int = 3) -> List[List[Tuple[str, float, List[str]]]]:
+        """top_k() para varios grupos con un único producto matricial."""
+        if not detected_groups:
+            return []
+        probs = self.probabilities(self.indicator(detected_groups))
+        return [
+            self._top_rows(probs.indices[probs.indptr[i]:probs.indptr[i + 1]],
+                           probs.data[probs.indptr[i]:probs.indptr[i + 1]],
+                           detected, k)
+            for i, detected in enumerate(detected_groups)
+        ]
+
+    def _top_rows(self, rows: np.ndarray, probs: np.ndarray, detected_symptoms: List[str], k: int) -> List[Tuple[str, float, List[str]]]:
+        """Selecciona las k mejores condiciones entre las candidatas (rows, probs)."""
+        keep = probs > 0
+        rows, probs = rows[keep], probs[keep]
+        if len(rows) > k:
+            cutoff = probs[np.argpartition(-probs, k - 1)[:k]].min()
+            # Incluimos los empates en el corte para desempatar por orden de la KB
+            keep = probs >= cutoff
+            rows, probs = rows[keep], probs[keep]
+        # Orden: probabilidad descendente y, a igualdad, orden de la KB
+        order = np.lexsort((rows, -probs))[:k]
+
+        results = []
+        indptr, indices = self.weights.indptr, self.weights.indices
+        for row, prob in zip(rows[order], probs[order]):
+            row_cols = set(indices[indptr[row]:indptr[row + 1]].tolist())
+            matches = [s for s in detected_symptoms if self.symptom_index.get(s) in row_cols]
+            results.append((self.conditions[row], float(prob), matches))
+        return results
+
+
+class KnowledgeIndex:
+    """
+    Estructuras derivadas de la KB (matcher TF-IDF + matriz de puntuación).
+
+    `version` es una huella del contenido de la KB; las cachés la usan para
+    invalidarse solas cuando el índice se reconstruye con otra KB.
+
+    Con `arrays` (los de un artefacto compilado, ver from_artifact) no se
+    vuelve a ajustar el TF-IDF ni a construir las matrices: se usan tal
+    cual, normalmente mapeadas en memoria desde disco.
+    """
+
+    def __init__(self, kb: Dict[str, Dict[str, float]], recs: Dict[str, str],
+                 synonyms: Dict[str, str], stopwords: Iterable[str],
+                 label: str = "", arrays: Optional[Dict[str, np.ndarray]] = None):
+        stopwords = set(stopwords)
+        self.version = kb_fingerprint(kb, recs, synonyms, stopwords)
+        self.label = label
+        self.source = KBSource(kb, recs, synonyms, sorted(stopwords), label)
+        self.artifact: Optional[str] = None
+        known_symptoms = _known_symptoms_of(kb)
+        if arrays is not None and int(arrays["spell.max_distance"][0]) == SPELL_MAX_DISTANCE:
+            self.speller = SpellingIndex.from_arrays(arrays, known=stopwords | NEGATIONS)
+        else:
+            self.speller = _build_speller(known_symptoms, synonyms, stopwords)
+        self.normalizer = Normalizer(synonyms, stopwords, speller=self.speller)
+        if arrays is None:
+            self.matcher = SymptomMatcher(known_symptoms)
+            self.scorer = ConditionScorer(kb)
         else:
-            probability = 0.0
-            
-        if probability > 0:
-            scores.append((condition, probability, matched_for_condition))
-            
-    return scores
+            self.matcher = SymptomMatcher.from_index(NgramIndex.from_arrays(known_symptoms, arrays), arrays)
+            self.scorer = ConditionScorer.from_arrays(kb, arrays)
+        # Fragmentos típicos tras normalizar: síntomas de la KB bien escritos
+        # (sin stopwords) y los destinos de los sinónimos
+        self.matcher.precompute(self.normalizer.normalize(s) for s in known_symptoms)
+        self.matcher.precompute(synonyms.values())
 
-def suggest_diagnoses(symptoms: List[str]) -> List[Diagnosis]:
-    # 1. Limpieza básica
-    clean_inputs = [s.strip().lower() for s in symptoms if s and s.strip()]
-    
-    if not clean_inputs:
-        return []
+    @classmethod
+    def from_source(cls, source: KBSource) -> "KnowledgeIndex":
+        return cls(source.kb, source.recs, source.synonyms, source.stopwords, label=source.label)
+
+    @classmethod
+    def from_artifact(cls, path: str) -> "KnowledgeIndex":
+        """Índice sobre un artefacto compilado (arrays mapeados en memoria)."""
+        source, arrays, _ = load_artifact(path)
+        index = cls(source.kb, source.recs, source.synonyms, source.stopwords, label=source.label, arrays=arrays)
+        index.artifact = path
+        return index
+
+    def to_arrays(self) -> Dict[str, np.ndarray]:
+        arrays = self.matcher.index.to_arrays()
+        arrays.update(self.matcher.exact_to_arrays())
+        arrays.update(self.speller.to_arrays())
+        arrays.update(self.scorer.to_arrays())
+        return arrays
+
+    def info(self) -> Dict[str, Any]:
+        return {
+            "version": self.version,
+            "label": self.label,
+            "artifact": self.artifact,
+            "conditions": len(self.scorer.conditions),
+            "symptoms": len(self.matcher.known_symptoms),
+        }
 
-    # 2. IA: Matching de síntomas usando NLP
-    detected_symptoms = _match_symptoms_with_ai(clean_inputs)
 
-    # 3. Sistema Experto: Cálculo de probabilidades
-    scored_conditions = _calculate_diagnosis_score(detected_symptoms)
+def _build_speller(known_symptoms: List[str], synonyms: Dict[str, str], stopwords: Iterable[str]) -> SpellingIndex:
+    """Diccionario del corrector: palabras de los síntomas de la KB y de los sinónimos."""
+    stopwords = set(stopwords)
+    words = [w for phrase in list(known_symptoms) + list(synonyms) for w in phrase.lower().split()
+             if w not in stopwords]
+    return SpellingIndex(words, known=stopwords | NEGATIONS)
 
-    # 4. Ordenar y formatear resultados
-    scored_conditions.sort(key=lambda x: x[1], reverse=True)
-    top_results = scored_conditions[:3]
 
+_INDEX: Optional[KnowledgeIndex] = None
+_INDEX_LOCK = threading.Lock()
+
+
+def _compile_arrays(source: KBSource) -> Dict[str, np.ndarray]:
+    return KnowledgeIndex.from_source(source).to_arrays()
+
+
+def load_index(source: KBSource, artifact_dir: Optional[str] = KB_ARTIFACT_DIR) -> KnowledgeIndex:
+    """
+    Índice para esta versión de la KB: compila el artefacto la primera vez
+    (clave = hash del contenido) y después solo lo mapea desde disco. Sin
+    `artifact_dir` se construye en memoria.
+    """
+    if not artifact_dir:
+        return KnowledgeIndex.from_source(source)
+    return KnowledgeIndex.from_artifact(ensure_artifact(source, _compile_arrays, artifact_dir))
+
+
+def get_index() -> KnowledgeIndex:
+    """Devuelve el índice compartido, cargándolo la primera vez (thread-safe)."""
+    global _INDEX
+    index = _INDEX
+    if index is None:
+        with _INDEX_LOCK:
+            if _INDEX is None:
+                _INDEX = load_index(_SOURCE)
+            index = _INDEX
+    return index
+
+
+def reload_index(source_path: Optional[str] = None, artifact_dir: Optional[str] = KB_ARTIFACT_DIR) -> KnowledgeIndex:
+    """
+    Vuelve a leer la KB del fichero fuente y publica el nuevo índice de forma
+    atómica. Las peticiones en curso terminan con el índice que ya tenían;
+    las cachés se invalidan solas por el cambio de versión.
+    """
+    source = load_source(source_path or KB_SOURCE)
+    current = _INDEX
+    if current is not None and current.version == kb_fingerprint(source.kb, source.recs, source.synonyms, source.stopwords):
+        return current
+    return _publish(load_index(source, artifact_dir))
+
+
+def activate_artifact(path: str) -> KnowledgeIndex:
+    """Publica el índice de un artefacto ya compilado (p. ej. el que usa otro proceso)."""
+    return _publish(KnowledgeIndex.from_artifact(path))
+
+
+def _publish(index: KnowledgeIndex) -> KnowledgeIndex:
+    global _INDEX, _SOURCE, KB, RECS, SYNONYMS, STOPWORDS
+    source = index.source
+    with _INDEX_LOCK:
+        _INDEX = index
+        _SOURCE = source
+        KB, RECS, SYNONYMS, STOPWORDS = source.kb, source.recs, source.synonyms, set(source.stopwords)
+    return index
+
+
+def get_matcher() -> SymptomMatcher:
+    return get_index().matcher
+
+
+def get_scorer() -> ConditionScorer:
+    return get_index().scorer
+
+
+def warm_up() -> None:
+    """Construye los índices compartidos (útil al arrancar el servidor)."""
+    get_index()
+
+
+def _calculate_diagnosis_score(detected_symptoms: List[str], top_k: int = 3) -> List[Tuple[str, float, List[str]]]:
+    """Calcula la probabilidad de cada enfermedad y devuelve las top_k ordenadas."""
+    if not detected_symptoms:
+        return []
+    return get_scorer().top_k(detected_symptoms, k=top_k)
+
+# Condición de la respuesta cuando ningún síntoma coincide con la KB
+NO_DIAGNOSIS = "Sin diagnóstico claro"
+
+def _format_diagnoses(top_results: List[Tuple[str, float, List[str]]], recs: Optional[Dict[str, str]] = None) -> List[Diagnosis]:
+    """Convierte las condiciones puntuadas en la respuesta final con recomendaciones."""
     final_diagnoses = []
     for condition, prob, matches in top_results:
-        base_rec = RECS.get(condition, "Consulte a un médico.")
+        base_rec = (RECS if recs is None else recs).get(condition, "Consulte a un médico.")
         
         # Generamos una explicación clara
         match_str = ", ".join(matches)
@@ -380,10 +445,123 @@ def suggest_diagnoses(symptoms: List[str]) -> List[Diagnosis]:
     if not final_diagnoses:
         return [
             Diagnosis(
-                condition="Sin diagnóstico claro",
+                condition=NO_DIAGNOSIS,
                 confidence=0.0,
                 recommendation="Sus síntomas no coinciden claramente con nuestra base de datos. Por favor acuda a un centro de salud para una evaluación completa."
             )
         ]
 
     return final_diagnoses
+
+class DiagnosisResult(NamedTuple):
+    """Diagnósticos de una lista de síntomas y los síntomas de la KB detectados en ella."""
+    diagnoses: List[Diagnosis]
+    detected: List[str]
+
+def suggest_diagnoses(symptoms: List[str]) -> List[Diagnosis]:
+    return suggest_diagnoses_batch([symptoms])[0]
+
+def analyze(symptoms: List[str]) -> DiagnosisResult:
+    return analyze_batch([symptoms])[0]
+
+# Cachés: fragmento normalizado -> síntomas, y conjunto de síntomas detectados -> condiciones puntuadas
+FRAGMENT_CACHE = LRUCache(int(os.getenv("DIAGNOSE_CACHE_FRAGMENTS", "10000")))
+RESULT_CACHE = LRUCache(int(os.getenv("DIAGNOSE_CACHE_RESULTS", "5000")))
+
+def cache_stats() -> Dict[str, Dict[str, float]]:
+    return {"fragments": FRAGMENT_CACHE.stats(), "results": RESULT_CACHE.stats()}
+
+def _match_fragment_groups(index: KnowledgeIndex, fragment_groups: List[List[str]]) -> List[List[str]]:
+    """
+    Matching por grupos: primero la tabla de coincidencias exactas, luego la
+    caché de fragmentos; los fallos se vectorizan juntos.
+    """
+    known: Dict[str, List[str]] = {}
+    misses: List[str] = []
+    for group in fragment_groups:
+        for fragment in group:
+            if fragment in known:
+                continue
+            if fragment in index.matcher.exact:
+                known[fragment] = index.matcher.exact[fragment]
+                continue
+            cached = FRAGMENT_CACHE.get(fragment, index.version)
+            if cached is MISSING:
+                known[fragment] = []
+                misses.append(fragment)
+            else:
+                known[fragment] = cached
+
+    if misses:
+        for fragment, matches in zip(misses, index.matcher.match_fragments(misses)):
+            known[fragment] = matches
+            FRAGMENT_CACHE.put(fragment, matches, index.version)
+
+    return [_merge_matches(known[f] for f in group) for group in fragment_groups]
+
+def detect_symptoms_batch(symptom_lists: List[List[str]]) -> List[List[str]]:
+    """
+    Síntomas de la KB detectados en cada lista de texto libre (el mismo
+    matching que el diagnóstico, sin puntuar). Para filas de historial
+    antiguas que no guardaron los detectados (backfill de analítica).
+    """
+    index = get_index()
+    cleaned = [[s.strip().lower() for s in symptoms if s and s.strip()] for symptoms in symptom_lists]
+    return _match_fragment_groups(index, [_preprocess_inputs(c, index) if c else [] for c in cleaned])
+
+def suggest_diagnoses_batch(symptom_lists: List[List[str]]) -> List[List[Diagnosis]]:
+    """
+    Diagnostica varias listas de síntomas en una sola pasada: un transform
+    TF-IDF para todos los fragmentos y un producto matricial para puntuar.
+    El resultado conserva el orden de entrada.
+    """
+    return [result.diagnoses for result in analyze_batch(symptom_lists)]
+
+def analyze_batch(symptom_lists: List[List[str]]) -> List[DiagnosisResult]:
+    """
+    Como suggest_diagnoses_batch, pero devuelve también los síntomas de la
+    KB detectados en cada lista (los que se guardan con el historial).
+    """
+    index = get_index()
+
+    # 1. Limpieza básica
+    cleaned = [[s.strip().lower() for s in symptoms if s and s.strip()] for symptoms in symptom_lists]
+    active = [i for i, clean_inputs in enumerate(cleaned) if clean_inputs]
+
+    results = [DiagnosisResult([], []) for _ in symptom_lists]
+    if not active:
+        return results
+
+    # 2. IA: Matching de síntomas usando NLP
+    fragment_groups = [_preprocess_inputs(cleaned[i], index) for i in active]
+    detected_groups = _match_fragment_groups(index, fragment_groups)
+
+    # 3. Sistema Experto: Cálculo de probabilidades (ya ordenadas, top 3),
+    #    solo para los conjuntos de síntomas que no están en caché.
+    #    Clave = conjunto de síntomas: "fiebre y tos" y "tos, fiebre" comparten entrada.
+    #    Se guardan las condiciones puntuadas, no el texto: "Coincidencias detectadas"
+    #    se arma en cada petición con el orden en que se detectaron sus síntomas
+    scored: Dict[frozenset, List[Tuple[str, float, frozenset]]] = {}
+    pending: Dict[frozenset, List[str]] = {}
+    for detected in detected_groups:
+        key = frozenset(detected)
+        if key in scored or key in pending:
+            continue
+        cached = RESULT_CACHE.get(key, index.version)
+        if cached is MISSING:
+            pending[key] = detected
+        else:
+            scored[key] = cached
+
+    if pending:
+        for key, top_results in zip(pending, index.scorer.top_k_batch(list(pending.values()), k=3)):
+            entry = [(condition, prob, frozenset(matches)) for condition, prob, matches in top_results]
+            RESULT_CACHE.put(key, entry, index.version)
+            scored[key] = entry
+
+    # 4. Formatear resultados
+    for i, detected in zip(active, detected_groups):
+        top_results = [(condition, prob, [s for s in detected if s in matches])
+                       for condition, prob, matches in scored[frozenset(detected)]]
+        results[i] = DiagnosisResult(_format_diagnoses(top_results, index.source.recs), detected)
+    return results
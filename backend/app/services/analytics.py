@@ -0,0 +1,282 @@
+import asyncio
+import json
+import os
+import sys
+from collections import Counter
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import and_, delete, func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from .. import database, models
+from . import ai_stub
+
+# 0 desactiva los contadores (el historial se guarda igual)
+ANALYTICS_ENABLED = os.getenv("ANALYTICS_ENABLED", "1") == "1"
+# Máximo de días que se pueden pedir en /analytics/*
+ANALYTICS_MAX_DAYS = int(os.getenv("ANALYTICS_MAX_DAYS", "366"))
+# Filas de History por transacción en el backfill
+ANALYTICS_BACKFILL_CHUNK_ROWS = int(os.getenv("ANALYTICS_BACKFILL_CHUNK_ROWS", "5000"))
+
+_KEY_MAX = 255  # longitud de las columnas condition/symptom
+
+
+class Increments:
+    """Sumas pendientes de aplicar a las tres tablas de contadores."""
+
+    def __init__(self):
+        self.conditions: Counter = Counter()
+        self.symptoms: Counter = Counter()
+        self.user_conditions: Counter = Counter()
+
+    def add(self, user_id: int, day: date, symptoms: Iterable[str], condition: Optional[str]) -> None:
+        for symptom in symptoms:
+            self.symptoms[(day, symptom)] += 1
+        if condition:
+            self.conditions[(day, condition)] += 1
+            self.user_conditions[(user_id, day, condition)] += 1
+
+    def __bool__(self) -> bool:
+        return bool(self.conditions or self.symptoms)
+
+
+def _symptoms(raw: str) -> List[str]:
+    # Síntomas como array JSON; filas antiguas: texto unido con ", "
+    try:
+        values = json.loads(raw) if raw.startswith("[") else None
+    except ValueError:
+        values = None
+    if not isinstance(values, list):
+        values = raw.split(", ")
+    return [str(v) for v in values]
+
+
+def _top_condition(raw: Optional[str]) -> Optional[str]:
+    # Se cuenta la condición más probable del diagnóstico (la lista viene ordenada por confianza)
+    try:
+        diagnoses = json.loads(raw) if raw else []
+    except ValueError:
+        return None
+    if not diagnoses or not isinstance(diagnoses[0], dict):
+        return None
+    condition = diagnoses[0].get("condition")
+    # "Sin diagnóstico claro" no es una condición: no entra en los rankings
+    if not condition or condition == ai_stub.NO_DIAGNOSIS:
+        return None
+    return condition[:_KEY_MAX]
+
+
+def _detected(raw: Optional[str]) -> Optional[List[str]]:
+    # Síntomas de la KB guardados al diagnosticar; None en filas anteriores a la columna
+    if raw is None:
+        return None
+    try:
+        values = json.loads(raw)
+    except ValueError:
+        return None
+    return [str(v) for v in values] if isinstance(values, list) else None
+
+
+def increments_for(rows: Iterable[Dict[str, Any]], rematch: bool = False) -> Increments:
+    """
+    Sumas de un lote de filas de History (como las que genera history_db.history_row).
+
+    Se cuentan los síntomas de la KB que detectó el diagnóstico (columna
+    `detected`), no el texto libre: "Fiebre alta" y "fiebre" suman al mismo
+    síntoma, y al borrar se resta de las mismas claves aunque la KB haya
+    cambiado. Las filas antiguas sin `detected` solo cuentan su condición,
+    salvo con rematch=True (backfill), que vuelve a pasar su texto por el
+    matching de la KB actual.
+    """
+    rows = list(rows)
+    detected = [_detected(row.get("detected")) for row in rows]
+    missing = [i for i, symptoms in enumerate(detected) if symptoms is None]
+    if rematch and missing:
+        matched = ai_stub.detect_symptoms_batch([_symptoms(rows[i]["symptoms"]) for i in missing])
+        for i, symptoms in zip(missing, matched):
+            detected[i] = symptoms
+    inc = Increments()
+    for row, symptoms in zip(rows, detected):
+        created_at = row.get("created_at") or datetime.utcnow()
+        inc.add(row["user_id"], created_at.date(), sorted({s[:_KEY_MAX] for s in symptoms or ()}),
+                _top_condition(row.get("diagnosis_result")))
+    return inc
+
+
+def _upsert(dialect: str, table, keys: Tuple[str, ...], counter: Counter):
+    """INSERT multi-fila que suma `total` si la clave ya existe (MySQL, SQLite o PostgreSQL)."""
+    # Claves ordenadas: dos transacciones concurrentes bloquean las filas en el mismo orden
+    values = [dict(zip(keys, key), total=n) for key, n in sorted(counter.items())]
+    if dialect == "mysql":
+        from sqlalchemy.dialects.mysql import insert as dialect_insert
+        stmt = dialect_insert(table).values(values)
+        return stmt.on_duplicate_key_update(total=table.c.total + stmt.inserted.total)
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+    stmt = dialect_insert(table).values(values)
+    return stmt.on_conflict_do_update(index_elements=list(keys), set_={"total": table.c.total + stmt.excluded.total})
+
+
+async def apply(db: AsyncSession, inc: Increments) -> None:
+    """Suma los incrementos en la transacción de `db` (no hace commit)."""
+    dialect = db.bind.dialect.name
+    for table, keys, counter in (
+        (models.ConditionDaily.__table__, ("day", "condition"), inc.conditions),
+        (models.SymptomDaily.__table__, ("day", "symptom"), inc.symptoms),
+        (models.UserConditionDaily.__table__, ("user_id", "day", "condition"), inc.user_conditions),
+    ):
+        if counter:
+            await db.execute(_upsert(dialect, table, keys, counter))
+
+
+async def record(db: AsyncSession, history_rows: List[Dict[str, Any]]) -> None:
+    """Actualiza los contadores con las filas que se van a insertar, en la misma transacción."""
+    if ANALYTICS_ENABLED:
+        inc = increments_for(history_rows)
+        if inc:
+            await apply(db, inc)
+
+
+async def forget(db: AsyncSession, history_rows: Iterable[Dict[str, Any]]) -> None:
+    """
+    Resta de los contadores las filas de History que se borran, en la misma
+    transacción (no hace commit). Las claves que llegan a 0 desaparecen.
+    """
+    if not ANALYTICS_ENABLED:
+        return
+    inc = increments_for(history_rows)
+    for model, keys, counter in (
+        (models.ConditionDaily, ("day", "condition"), inc.conditions),
+        (models.SymptomDaily, ("day", "symptom"), inc.symptoms),
+        (models.UserConditionDaily, ("user_id", "day", "condition"), inc.user_conditions),
+    ):
+        # Pocas claves por borrado: un UPDATE por clave, en orden (como en _upsert)
+        for key, n in sorted(counter.items()):
+            match = and_(*(getattr(model, k) == v for k, v in zip(keys, key)))
+            await db.execute(update(model).where(match).values(total=model.total - n))
+            await db.execute(delete(model).where(match, model.total <= 0))
+
+
+# --- Consultas: solo leen el rango de días pedido (clave primaria (day, ...)) ---
+
+def _day_range(days: int, today: Optional[date] = None) -> List[date]:
+    last = today or datetime.utcnow().date()
+    return [last - timedelta(days=n) for n in range(days - 1, -1, -1)]
+
+
+def _ranked(counts: Counter, top: int, field: str) -> List[Dict[str, Any]]:
+    return [{field: key, "count": n} for key, n in sorted(counts.items(), key=lambda kv: (-kv[1], kv[0]))[:top]]
+
+
+async def top_per_day(db: AsyncSession, kind: str, days: int, top: int,
+                      today: Optional[date] = None) -> Dict[str, Any]:
+    """
+    Las `top` condiciones (kind="condition") o síntomas (kind="symptom") más
+    frecuentes de cada uno de los últimos `days` días y del periodo completo.
+    """
+    model = models.ConditionDaily if kind == "condition" else models.SymptomDaily
+    key = getattr(model, kind)
+    day_list = _day_range(days, today)
+    result = await db.execute(select(model.day, key, model.total).where(model.day >= day_list[0], model.day <= day_list[-1]))
+    by_day: Dict[date, Counter] = {d: Counter() for d in day_list}
+    totals: Counter = Counter()
+    for day, name, total in result:
+        by_day[day][name] += total
+        totals[name] += total
+    return {
+        "from": day_list[0].isoformat(),
+        "to": day_list[-1].isoformat(),
+        "days": [{"day": d.isoformat(), "total": sum(c.values()), "top": _ranked(c, top, kind)}
+                 for d, c in by_day.items()],
+        "top": _ranked(totals, top, kind),
+    }
+
+
+async def user_trend(db: AsyncSession, user_id: int, days: int, today: Optional[date] = None) -> Dict[str, Any]:
+    """Diagnósticos del usuario por día y condición en los últimos `days` días (días sin datos a 0)."""
+    model = models.UserConditionDaily
+    day_list = _day_range(days, today)
+    result = await db.execute(
+        select(model.day, model.condition, model.total)
+        .where(model.user_id == user_id, model.day >= day_list[0], model.day <= day_list[-1])
+    )
+    by_day: Dict[date, Dict[str, int]] = {d: {} for d in day_list}
+    for day, condition, total in result:
+        by_day[day][condition] = total
+    return {
+        "user_id": user_id,
+        "from": day_list[0].isoformat(),
+        "to": day_list[-1].isoformat(),
+        "days": [{"day": d.isoformat(), "total": sum(c.values()), "conditions": c} for d, c in by_day.items()],
+    }
+
+
+# --- Backfill ---
+
+async def backfill(until: Optional[date] = None, chunk_rows: int = ANALYTICS_BACKFILL_CHUNK_ROWS,
+                   sessions: Optional[async_sessionmaker] = None) -> Dict[str, Any]:
+    """
+    Recalcula desde History los contadores de los días anteriores a `until`
+    (por defecto, hoy en UTC) y posteriores a la fila más antigua que queda
+    en la tabla: los días ya archivados (history_archive) conservan sus
+    contadores.
+
+    Borra los contadores de esos días y recorre History por id en bloques de
+    `chunk_rows` filas, una transacción por bloque: nunca hay más de un
+    bloque en memoria ni una transacción larga. Los días desde `until` no se
+    tocan (los sigue contando la API), así que se puede repetir sin contar
+    dos veces. Mientras corre, los días afectados muestran totales parciales.
+    """
+    until = until or datetime.utcnow().date()
+    cutoff = datetime.combine(until, datetime.min.time())
+    sessions = sessions or database.AsyncSessionLocal
+    h = models.History
+    async with sessions() as db:
+        oldest = await db.scalar(select(func.min(h.created_at)))
+        start = oldest.date() if oldest else until
+        for model in (models.ConditionDaily, models.SymptomDaily, models.UserConditionDaily):
+            await db.execute(delete(model).where(model.day >= start, model.day < until))
+        await db.commit()
+
+    last_id = 0
+    scanned = chunks = 0
+    while True:
+        async with sessions() as db:
+            rows = (await db.execute(
+                select(h.id, h.user_id, h.created_at, h.symptoms, h.diagnosis_result, h.detected)
+                .where(h.id > last_id, h.created_at < cutoff)
+                .order_by(h.id)
+                .limit(chunk_rows)
+            )).all()
+            if not rows:
+                break
+            # Proceso aparte (sin event loop de la API): se puede volver a hacer el matching
+            inc = increments_for((row._mapping for row in rows), rematch=True)
+            if inc:
+                await apply(db, inc)
+            await db.commit()
+        last_id = rows[-1].id
+        scanned += len(rows)
+        chunks += 1
+    return {"until": until.isoformat(), "rows": scanned, "chunks": chunks}
+
+
+def main() -> None:
+    """Backfill de una sola vez: python -m app.services.analytics [YYYY-MM-DD]"""
+    until = date.fromisoformat(sys.argv[1]) if len(sys.argv) > 1 else None
+
+    async def run():
+        await database.create_tables()
+        try:
+            return await backfill(until)
+        finally:
+            await database.async_engine.dispose()
+
+    print(asyncio.run(run()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,225 @@
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, List, Optional
+
+from ..schemas import Diagnosis
+from .ai_stub import analyze_batch, suggest_diagnoses, suggest_diagnoses_batch
+
+# Configuración (variables de entorno)
+COALESCE_ENABLED = os.getenv("DIAGNOSE_COALESCE", "0") == "1"
+COALESCE_WINDOW_MS = float(os.getenv("DIAGNOSE_COALESCE_WINDOW_MS", "2"))
+COALESCE_MAX_BATCH = int(os.getenv("DIAGNOSE_COALESCE_MAX_BATCH", "64"))
+
+# Límites superiores de los buckets del histograma de tamaño de lote
+_BATCH_BUCKETS = (1, 2, 4, 8, 16, 32, 64, 128, 256)
+
+_STOP = object()
+
+
+class _Pending:
+    __slots__ = ("symptoms", "future", "enqueued_at")
+
+    def __init__(self, symptoms: List[str]):
+        self.symptoms = symptoms
+        self.future: Future = Future()
+        self.enqueued_at = time.perf_counter()
+
+
+class DiagnosisCoalescer:
+    """
+    Agrupa peticiones /diagnose concurrentes en micro-lotes.
+
+    Un hilo de fondo espera la primera petición, sigue recogiendo durante
+    `window_ms` (o hasta `max_batch` elementos) y procesa todo el lote con
+    una sola pasada vectorizada; cada llamador recibe su resultado por un
+    Future.
+
+    Con `submit_fn` (p. ej. el pool de procesos del motor de inferencia) el
+    lote no se calcula en este hilo: `submit_fn` devuelve un Future y el
+    hilo pasa a formar el siguiente lote mientras tanto, así que puede haber
+    varios lotes en curso a la vez.
+    """
+
+    def __init__(
+        self,
+        batch_fn: Callable[[List[List[str]]], List[Any]] = suggest_diagnoses_batch,
+        window_ms: float = COALESCE_WINDOW_MS,
+        max_batch: int = COALESCE_MAX_BATCH,
+        submit_fn: Optional[Callable[[List[List[str]]], Future]] = None,
+    ):
+        self.batch_fn = batch_fn
+        self.submit_fn = submit_fn
+        self.window = window_ms / 1000.0
+        self.max_batch = max(1, max_batch)
+        self._queue: "queue.Queue[Any]" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._stats_lock = threading.Lock()
+        self._batches = 0
+        self._items = 0
+        self._batch_hist = {b: 0 for b in _BATCH_BUCKETS}
+        self._batch_hist_over = 0
+        self._delay_total = 0.0
+        self._delay_max = 0.0
+
+    def start(self) -> None:
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name="diagnose-coalescer", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout: Optional[float] = 5.0) -> None:
+        """Detiene el hilo después de procesar lo que ya estaba en cola."""
+        if self._thread is not None:
+            self._queue.put(_STOP)
+            self._thread.join(timeout)
+            self._thread = None
+
+    def submit(self, symptoms: List[str]) -> Future:
+        if self._thread is None:
+            raise RuntimeError("El coalescer no está iniciado")
+        pending = _Pending(symptoms)
+        self._queue.put(pending)
+        return pending.future
+
+    def diagnose(self, symptoms: List[str], timeout: Optional[float] = None) -> Any:
+        return self.submit(symptoms).result(timeout)
+
+    def _run(self) -> None:
+        stopping = False
+        while not stopping:
+            first = self._queue.get()
+            if first is _STOP:
+                break
+            batch = [first]
+            deadline = first.enqueued_at + self.window
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.perf_counter()
+                try:
+                    item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if item is _STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+            self._process(batch)
+
+        # Lo que llegó después de la orden de parada no se procesará
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is not _STOP and item.future.set_running_or_notify_cancel():
+                item.future.set_exception(RuntimeError("El coalescer se detuvo"))
+
+    def _process(self, batch: List[_Pending]) -> None:
+        started = time.perf_counter()
+        batch = [p for p in batch if p.future.set_running_or_notify_cancel()]
+        if not batch:
+            return
+        self._record(len(batch), [started - p.enqueued_at for p in batch])
+        symptom_lists = [p.symptoms for p in batch]
+        if self.submit_fn is not None:
+            try:
+                future = self.submit_fn(symptom_lists)
+            except Exception as e:
+                self._fail(batch, e)
+                return
+            future.add_done_callback(lambda f: self._deliver(batch, f))
+            return
+        try:
+            results = self.batch_fn(symptom_lists)
+        except Exception as e:
+            self._fail(batch, e)
+            return
+        self._set_results(batch, results)
+
+    def _deliver(self, batch: List[_Pending], future: Future) -> None:
+        if future.cancelled():
+            self._fail(batch, RuntimeError("El lote se canceló"))
+        elif future.exception() is not None:
+            self._fail(batch, future.exception())
+        else:
+            self._set_results(batch, future.result())
+
+    @staticmethod
+    def _fail(batch: List[_Pending], error: BaseException) -> None:
+        for p in batch:
+            p.future.set_exception(error)
+
+    @staticmethod
+    def _set_results(batch: List[_Pending], results: List[Any]) -> None:
+        for p, result in zip(batch, results):
+            p.future.set_result(result)
+
+    def _record(self, size: int, delays: List[float]) -> None:
+        with self._stats_lock:
+            self._batches += 1
+            self._items += size
+            for bucket in _BATCH_BUCKETS:
+                if size <= bucket:
+                    self._batch_hist[bucket] += 1
+                    break
+            else:
+                self._batch_hist_over += 1
+            self._delay_total += sum(delays)
+            self._delay_max = max(self._delay_max, max(delays))
+
+    def stats(self) -> Dict[str, Any]:
+        """Contadores: distribución de tamaños de lote y retardo añadido por la cola."""
+        with self._stats_lock:
+            hist = {f"<={b}": n for b, n in self._batch_hist.items()}
+            hist[f">{_BATCH_BUCKETS[-1]}"] = self._batch_hist_over
+            return {
+                "window_ms": self.window * 1000.0,
+                "max_batch": self.max_batch,
+                "batches": self._batches,
+                "items": self._items,
+                "avg_batch_size": round(self._items / self._batches, 2) if self._batches else 0.0,
+                "batch_size_histogram": hist,
+                "queue_delay_avg_ms": round(self._delay_total / self._items * 1000.0, 3) if self._items else 0.0,
+                "queue_delay_max_ms": round(self._delay_max * 1000.0, 3),
+                "queue_depth": self._queue.qsize(),
+            }
+
+
+_COALESCER: Optional[DiagnosisCoalescer] = None
+_COALESCER_LOCK = threading.Lock()
+
+
+def get_coalescer() -> Optional[DiagnosisCoalescer]:
+    """
+    Coalescer global (iniciado), o None si DIAGNOSE_COALESCE no está
+    activado. Cada resultado es un ai_stub.DiagnosisResult (diagnósticos y
+    síntomas detectados).
+    """
+    global _COALESCER
+    if not COALESCE_ENABLED:
+        return None
+    if _COALESCER is None:
+        with _COALESCER_LOCK:
+            if _COALESCER is None:
+                coalescer = DiagnosisCoalescer(batch_fn=analyze_batch)
+                coalescer.start()
+                _COALESCER = coalescer
+    return _COALESCER
+
+
+def shutdown_coalescer() -> None:
+    """Vacía la cola y detiene el hilo (al apagar el servidor)."""
+    global _COALESCER
+    with _COALESCER_LOCK:
+        if _COALESCER is not None:
+            _COALESCER.stop()
+            _COALESCER = None
+
+
+def diagnose(symptoms: List[str]) -> List[Diagnosis]:
+    """Punto de entrada para /diagnose: usa el coalescer si está activo."""
+    coalescer = get_coalescer()
+    if coalescer is None:
+        return suggest_diagnoses(symptoms)
+    return coalescer.diagnose(symptoms).diagnoses
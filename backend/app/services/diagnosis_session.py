@@ -0,0 +1,225 @@
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Set
+
+import numpy as np
+
+from ..schemas import Diagnosis
+from . import ai_stub
+
+# Configuración (variables de entorno)
+# Segundos sin actividad tras los que una sesión se descarta
+SESSION_TTL_S = float(os.getenv("DIAGNOSE_SESSION_TTL_S", "1800"))
+# Sesiones abiertas a la vez (por proceso); al superarlo se descarta la menos reciente
+SESSION_MAX = int(os.getenv("DIAGNOSE_SESSION_MAX", "10000"))
+
+
+class SessionNotFound(Exception):
+    """La sesión no existe, expiró o pertenece a otro usuario."""
+
+
+class DiagnosisSession:
+    """
+    Estado de un diagnóstico que se construye paso a paso (cuestionario guiado).
+
+    Cada entrada del usuario se normaliza y empareja una sola vez, al
+    añadirla. Se guarda el conjunto de síntomas detectados (con un contador
+    por si dos entradas detectan el mismo) y la puntuación parcial de cada
+    condición como vector disperso (fila -> suma de pesos coincidentes).
+    Añadir o quitar un síntoma solo recalcula las condiciones que lo
+    contienen (su columna en la matriz traspuesta de la KB).
+
+    Las filas afectadas se vuelven a sumar en orden de columna, igual que el
+    producto matricial de ConditionScorer, así el resultado es idéntico al
+    de suggest_diagnoses() con la lista completa.
+    """
+
+    def __init__(self, user_id: int, index: Optional["ai_stub.KnowledgeIndex"] = None):
+        self.id = uuid.uuid4().hex
+        self.user_id = user_id
+        self.touched_at = time.monotonic()
+        self.lock = threading.Lock()
+        # entrada del usuario -> síntomas de la KB que detectó
+        self.inputs: "OrderedDict[str, List[str]]" = OrderedDict()
+        # síntoma detectado -> nº de entradas que lo detectan
+        self._symptoms: Dict[str, int] = {}
+        self._cols: Set[int] = set()
+        self._scores: Dict[int, float] = {}
+        self._bind(index or ai_stub.get_index())
+
+    def _bind(self, index: "ai_stub.KnowledgeIndex") -> None:
+        self.index = index
+        self.version = index.version
+
+    @property
+    def symptoms(self) -> List[str]:
+        """Síntomas de la KB detectados, en el orden de las entradas (como la lista completa)."""
+        return ai_stub._merge_matches(self.inputs.values())
+
+    def add(self, text: str) -> bool:
+        """Añade una entrada de texto libre; False si estaba vacía o repetida."""
+        self._sync()
+        key = text.strip().lower()
+        if not key or key in self.inputs:
+            return False
+        detected = self._match(key)
+        self.inputs[key] = detected
+        for symptom in detected:
+            count = self._symptoms.get(symptom, 0)
+            self._symptoms[symptom] = count + 1
+            if count == 0:
+                self._toggle(symptom, present=True)
+        return True
+
+    def remove(self, text: str) -> bool:
+        """Quita una entrada añadida antes; False si no estaba."""
+        self._sync()
+        detected = self.inputs.pop(text.strip().lower(), None)
+        if detected is None:
+            return False
+        for symptom in detected:
+            self._symptoms[symptom] -= 1
+            if self._symptoms[symptom] == 0:
+                del self._symptoms[symptom]
+                self._toggle(symptom, present=False)
+        return True
+
+    def diagnoses(self, k: int = 3) -> List[Diagnosis]:
+        """Resultado actual (mismo formato que suggest_diagnoses)."""
+        self._sync()
+        if not self.inputs:
+            return []
+        top_results: List = []
+        if self._scores:
+            scorer = self.index.scorer
+            rows = np.fromiter(self._scores.keys(), dtype=np.int64, count=len(self._scores))
+            probs = np.fromiter(self._scores.values(), dtype=np.float64, count=len(self._scores))
+            probs *= scorer.inv_normalizers[rows]
+            top_results = scorer._top_rows(rows, probs, self.symptoms, k)
+        return ai_stub._format_diagnoses(top_results, self.index.source.recs)
+
+    def _match(self, text: str) -> List[str]:
+        fragments = ai_stub._preprocess_inputs([text], self.index)
+        return ai_stub._match_fragment_groups(self.index, [fragments])[0]
+
+    def _toggle(self, symptom: str, present: bool) -> None:
+        scorer = self.index.scorer
+        col = scorer.symptom_index.get(symptom)
+        if col is None:
+            return
+        if present:
+            self._cols.add(col)
+        else:
+            self._cols.discard(col)
+        weights_t = scorer._weights_t
+        affected = weights_t.indices[weights_t.indptr[col]:weights_t.indptr[col + 1]]
+        indptr, indices, data = scorer.weights.indptr, scorer.weights.indices, scorer.weights.data
+        for row in affected.tolist():
+            start, end = indptr[row], indptr[row + 1]
+            total = 0.0
+            for c, w in zip(indices[start:end].tolist(), data[start:end].tolist()):
+                if c in self._cols:
+                    total += w
+            if total:
+                self._scores[row] = total
+            else:
+                self._scores.pop(row, None)
+
+    def _sync(self) -> None:
+        """Si la KB se recargó, se vuelven a emparejar las entradas con la nueva versión."""
+        index = ai_stub.get_index()
+        if index.version == self.version:
+            return
+        texts = list(self.inputs)
+        self.inputs.clear()
+        self._symptoms.clear()
+        self._cols.clear()
+        self._scores.clear()
+        self._bind(index)
+        for text in texts:
+            self.add(text)
+
+
+class SessionStore:
+    """
+    Sesiones abiertas de este proceso, acotadas por TTL y por número.
+
+    Las sesiones viven en memoria: con varios workers de uvicorn el cliente
+    debe volver al mismo proceso (sticky sessions) o usar un solo worker.
+    """
+
+    def __init__(self, ttl: float = SESSION_TTL_S, maxsize: int = SESSION_MAX):
+        self.ttl = ttl
+        self.maxsize = max(1, maxsize)
+        self._sessions: "OrderedDict[str, DiagnosisSession]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.created = 0
+        self.finalized = 0
+        self.expired = 0
+        self.evicted = 0
+
+    def create(self, user_id: int) -> DiagnosisSession:
+        session = DiagnosisSession(user_id)
+        with self._lock:
+            self._purge()
+            self._sessions[session.id] = session
+            self.created += 1
+            while len(self._sessions) > self.maxsize:
+                self._sessions.popitem(last=False)
+                self.evicted += 1
+        return session
+
+    def get(self, session_id: str, user_id: int) -> DiagnosisSession:
+        with self._lock:
+            self._purge()
+            session = self._sessions.get(session_id)
+            if session is None or session.user_id != user_id:
+                raise SessionNotFound(session_id)
+            session.touched_at = time.monotonic()
+            self._sessions.move_to_end(session_id)
+            return session
+
+    def pop(self, session_id: str, user_id: int) -> DiagnosisSession:
+        """Saca la sesión del almacén (al finalizarla)."""
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is None or session.user_id != user_id:
+                raise SessionNotFound(session_id)
+            del self._sessions[session_id]
+            self.finalized += 1
+            return session
+
+    def _purge(self) -> None:
+        # Las sesiones están en orden de último uso: las caducadas van al principio
+        limit = time.monotonic() - self.ttl
+        while self._sessions:
+            session = next(iter(self._sessions.values()))
+            if session.touched_at >= limit:
+                break
+            self._sessions.popitem(last=False)
+            self.expired += 1
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "open": len(self._sessions),
+                "maxsize": self.maxsize,
+                "ttl_s": self.ttl,
+                "created": self.created,
+                "finalized": self.finalized,
+                "expired": self.expired,
+                "evicted": self.evicted,
+            }
+
+
+_STORE = SessionStore()
+
+
+def get_store() -> SessionStore:
+    return _STORE
@@ -0,0 +1,398 @@
+import asyncio
+import gzip
+import json
+import logging
+import os
+import sys
+from collections import defaultdict
+from datetime import datetime
+from typing import Any, AsyncIterator, Dict, Iterable, Iterator, List, NamedTuple, Optional, Set, Tuple
+
+from sqlalchemy import delete, select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from .. import database, models
+from . import history_db
+
+try:
+    import fcntl
+except ImportError:  # Windows: sin bloqueo entre procesos (un solo worker)
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+_BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Configuración (variables de entorno)
+# Meses completos que se quedan en la tabla history además del mes en curso (0 = no se archiva)
+RETENTION_MONTHS = int(os.getenv("HISTORY_RETENTION_MONTHS", "0"))
+ARCHIVE_DIR = os.getenv("HISTORY_ARCHIVE_DIR", os.path.join(_BACKEND_DIR, "history_archive"))
+# Filas por lote: cada lote se escribe en el archivo y se borra en su propia transacción
+ARCHIVE_BATCH_ROWS = int(os.getenv("HISTORY_ARCHIVE_BATCH_ROWS", "1000"))
+# Cada cuántos segundos cada worker intenta archivar (0 = solo con el comando)
+ARCHIVE_INTERVAL_S = float(os.getenv("HISTORY_ARCHIVE_INTERVAL_S", "0"))
+
+
+class ArchivedRow(NamedTuple):
+    """Fila archivada, con la forma de las que devuelve history_db.fetch_page."""
+    id: int
+    created_at: datetime
+    symptoms: str
+    diagnosis_result: Optional[str]
+    detected: Optional[str] = None
+
+
+def retention_cutoff(months: int, now: Optional[datetime] = None) -> datetime:
+    """Primer instante que sigue en caliente: el día 1 del mes `months` meses antes del actual."""
+    now = now or datetime.utcnow()
+    index = now.year * 12 + now.month - 1 - months
+    return datetime(index // 12, index % 12 + 1, 1)
+
+
+class HistoryArchive:
+    """
+    Archivo frío del historial: `<root>/user=<id>/<AAAA-MM>.ndjson.gz`.
+
+    Una línea JSON por fila, con symptoms, diagnosis_result y detected tal cual estaban
+    en la base (se pueden volver a insertar). Cada lote se añade como un
+    miembro gzip más al final del fichero del mes (gzip lee los miembros
+    concatenados), así que archivar nunca reescribe lo ya archivado. Si el
+    job se interrumpe entre escribir un lote y borrarlo de la base, la
+    siguiente pasada lo vuelve a escribir: al leer se descartan ids repetidos.
+
+    Los registros borrados por el usuario no reescriben el mes: su id se
+    añade a `<root>/user=<id>/deleted.txt` y la lectura los omite.
+    """
+
+    def __init__(self, root: str = ARCHIVE_DIR):
+        self.root = root
+
+    def _user_dir(self, user_id: int) -> str:
+        return os.path.join(self.root, f"user={user_id}")
+
+    def _deleted_path(self, user_id: int) -> str:
+        return os.path.join(self._user_dir(user_id), "deleted.txt")
+
+    def deleted(self, user_id: int) -> Set[int]:
+        """Ids archivados que el usuario ha borrado."""
+        try:
+            with open(self._deleted_path(user_id)) as f:
+                return {int(line) for line in f if line.strip()}
+        except FileNotFoundError:
+            return set()
+
+    def append(self, rows: Iterable[Any]) -> int:
+        """Añade filas (id, user_id, created_at, symptoms, diagnosis_result, detected) a sus ficheros de mes."""
+        groups: Dict[Tuple[int, str], List[bytes]] = defaultdict(list)
+        for row in rows:
+            line = json.dumps({
+                "id": row.id,
+                "user_id": row.user_id,
+                "created_at": row.created_at.isoformat(),
+                "symptoms": row.symptoms,
+                "diagnosis_result": row.diagnosis_result,
+                "detected": row.detected,
+            }, ensure_ascii=False, separators=(",", ":"))
+            groups[(row.user_id, row.created_at.strftime("%Y-%m"))].append(line.encode() + b"\n")
+        for (user_id, month), lines in groups.items():
+            directory = self._user_dir(user_id)
+            os.makedirs(directory, exist_ok=True)
+            with open(os.path.join(directory, f"{month}.ndjson.gz"), "ab") as raw:
+                with gzip.GzipFile(fileobj=raw, mode="wb") as member:
+                    member.write(b"".join(lines))
+                raw.flush()
+                # Lo archivado tiene que estar en disco antes de borrarlo de la base
+                os.fsync(raw.fileno())
+        return sum(len(lines) for lines in groups.values())
+
+    def months(self, user_id: int) -> List[str]:
+        """Meses archivados del usuario (AAAA-MM), en orden ascendente."""
+        try:
+            names = os.listdir(self._user_dir(user_id))
+        except FileNotFoundError:
+            return []
+        return sorted(name[:-len(".ndjson.gz")] for name in names if name.endswith(".ndjson.gz"))
+
+    def read_month(self, user_id: int, month: str, deleted: Optional[Set[int]] = None) -> List[ArchivedRow]:
+        """Filas de un mes, sin repetidos ni borradas, de más antigua a más reciente."""
+        if deleted is None:
+            deleted = self.deleted(user_id)
+        rows: Dict[int, ArchivedRow] = {}
+        with gzip.open(os.path.join(self._user_dir(user_id), f"{month}.ndjson.gz"), "rb") as f:
+            for line in f:
+                item = json.loads(line)
+                rows[item["id"]] = ArchivedRow(item["id"], datetime.fromisoformat(item["created_at"]),
+                                               item["symptoms"], item["diagnosis_result"], item.get("detected"))
+        return sorted((r for r in rows.values() if r.id not in deleted), key=lambda r: (r.created_at, r.id))
+
+    def page(self, user_id: int, limit: int,
+             before: Optional[Tuple[datetime, int]] = None) -> Tuple[List[ArchivedRow], bool]:
+        """
+        Hasta `limit` filas anteriores a `before` (created_at, id), de más
+        reciente a más antigua, y si quedan más. Solo se abren los meses
+        necesarios para llenar la página, empezando por el del cursor.
+        """
+        found: List[ArchivedRow] = []
+        deleted = self.deleted(user_id)
+        for month in reversed(self.months(user_id)):
+            if before is not None and month > before[0].strftime("%Y-%m"):
+                continue
+            for row in reversed(self.read_month(user_id, month, deleted)):
+                if before is None or (row.created_at, row.id) < before:
+                    found.append(row)
+            if len(found) > limit:
+                break
+        return found[:limit], len(found) > limit
+
+    def iter_rows(self, user_id: int) -> Iterator[List[ArchivedRow]]:
+        """Filas del usuario de la más antigua a la más reciente, un mes cada vez."""
+        deleted = self.deleted(user_id)
+        for month in self.months(user_id):
+            yield self.read_month(user_id, month, deleted)
+
+    def delete(self, user_id: int, item_id: int) -> Optional[ArchivedRow]:
+        """
+        Borra una fila archivada del usuario y la devuelve (None si no está).
+        Recorre los meses del más reciente al más antiguo hasta encontrarla.
+        """
+        deleted = self.deleted(user_id)
+        for month in reversed(self.months(user_id)):
+            row = next((r for r in self.read_month(user_id, month, deleted) if r.id == item_id), None)
+            if row is not None:
+                break
+        else:
+            return None
+        with open(self._deleted_path(user_id), "a+") as f:
+            # Dos borrados simultáneos del mismo id: solo uno lo da por borrado
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_EX)
+            f.seek(0)
+            if str(item_id) in f.read().split():
+                return None
+            f.write(f"{item_id}\n")
+            f.flush()
+            os.fsync(f.fileno())
+        return row
+
+
+_ARCHIVE = HistoryArchive()
+
+
+def get_archive() -> HistoryArchive:
+    return _ARCHIVE
+
+
+# --- Lectura a través del archivo ---
+
+async def fetch_page(db: AsyncSession, user_id: int, limit: int = history_db.HISTORY_PAGE_SIZE,
+                     before: Optional[str] = None,
+                     archive: Optional[HistoryArchive] = None) -> Tuple[List[Any], Optional[str]]:
+    """
+    Como history_db.fetch_page, pero cuando la tabla caliente se acaba sigue
+    en el archivo con el mismo cursor (created_at, id): para el cliente es un
+    solo historial. Sin archivo del usuario no hay lecturas de más.
+    """
+    archive = archive or get_archive()
+    rows, next_cursor = await history_db.fetch_page(db, user_id, limit, before)
+    if next_cursor is not None or not await asyncio.to_thread(archive.months, user_id):
+        return rows, next_cursor
+    if rows:
+        position = (rows[-1].created_at, rows[-1].id)
+    else:
+        position = history_db.decode_cursor(before) if before else None
+    archived, more = await asyncio.to_thread(archive.page, user_id, limit - len(rows), position)
+    rows = list(rows) + archived
+    if more and rows:
+        next_cursor = history_db.encode_cursor(rows[-1].created_at, rows[-1].id)
+    return rows, next_cursor
+
+
+async def export_rows(user_id: int, fmt: str = "ndjson", sessions: Optional[async_sessionmaker] = None,
+                      archive: Optional[HistoryArchive] = None) -> AsyncIterator[bytes]:
+    """Exportación completa: primero lo archivado (más antiguo) y después la tabla caliente."""
+    archive = archive or get_archive()
+    header = fmt == "csv"
+    months = iter(archive.iter_rows(user_id))
+    while True:
+        rows = await asyncio.to_thread(next, months, None)
+        if rows is None:
+            break
+        if fmt == "csv":
+            chunk = history_db._csv_chunk(rows, header)
+            header = False
+        else:
+            chunk = history_db._ndjson_lines(rows)
+        yield chunk.encode()
+    async for chunk in history_db.export_rows(user_id, fmt, sessions=sessions, header=header):
+        yield chunk
+
+
+# --- Job de retención ---
+
+async def archive_old_rows(months: int = RETENTION_MONTHS, batch_rows: int = ARCHIVE_BATCH_ROWS,
+                           sessions: Optional[async_sessionmaker] = None,
+                           archive: Optional[HistoryArchive] = None,
+                           now: Optional[datetime] = None) -> Dict[str, Any]:
+    """
+    Mueve al archivo las filas de History anteriores a retention_cutoff(months).
+
+    Por lotes de `batch_rows` filas (las más antiguas por id): cada lote se
+    escribe en disco (fsync) y después se borra de la base en su propia
+    transacción, así que ningún DELETE bloquea más de `batch_rows` filas.
+    """
+    archive = archive or get_archive()
+    sessions = sessions or database.AsyncSessionLocal
+    cutoff = retention_cutoff(months, now)
+    h = models.History
+    moved = batches = 0
+    while True:
+        async with sessions() as db:
+            rows = (await db.execute(
+                select(h.id, h.user_id, h.created_at, h.symptoms, h.diagnosis_result, h.detected)
+                .where(h.created_at < cutoff)
+                .order_by(h.id)
+                .limit(batch_rows)
+            )).all()
+            if not rows:
+                break
+            await asyncio.to_thread(archive.append, rows)
+            await db.execute(delete(h).where(h.id.in_([row.id for row in rows])))
+            await db.commit()
+        moved += len(rows)
+        batches += 1
+    return {"cutoff": cutoff.isoformat(), "rows": moved, "batches": batches}
+
+
+class _JobLock:
+    """flock no bloqueante sobre `<root>/.lock`: con varios workers solo archiva uno a la vez."""
+
+    def __init__(self, root: str):
+        self.path = os.path.join(root, ".lock")
+        self._file = None
+
+    def acquire(self) -> bool:
+        if fcntl is None:
+            return True
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self._file = open(self.path, "a")
+        try:
+            fcntl.flock(self._file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            self._file.close()
+            self._file = None
+            return False
+        return True
+
+    def release(self) -> None:
+        if self._file is not None:
+            fcntl.flock(self._file, fcntl.LOCK_UN)
+            self._file.close()
+            self._file = None
+
+
+class RetentionJob:
+    """Tarea del event loop que ejecuta archive_old_rows cada `interval` segundos."""
+
+    def __init__(self, interval: float = ARCHIVE_INTERVAL_S, months: int = RETENTION_MONTHS,
+                 archive: Optional[HistoryArchive] = None):
+        self.interval = interval
+        self.months = months
+        self.archive = archive or get_archive()
+        self._task: Optional[asyncio.Task] = None
+        self.runs = 0
+        self.skipped = 0
+        self.errors = 0
+        self.archived_rows = 0
+        self.last_run: Optional[str] = None
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._loop(), name="history-retention")
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def run_once(self) -> Optional[Dict[str, Any]]:
+        lock = _JobLock(self.archive.root)
+        if not lock.acquire():
+            # Otro worker está archivando
+            self.skipped += 1
+            return None
+        try:
+            result = await archive_old_rows(self.months, archive=self.archive)
+        finally:
+            lock.release()
+        self.runs += 1
+        self.archived_rows += result["rows"]
+        self.last_run = datetime.utcnow().isoformat()
+        return result
+
+    async def _loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.run_once()
+            except Exception:
+                self.errors += 1
+                logger.exception("Falló el archivado del historial")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": True,
+            "retention_months": self.months,
+            "interval_s": self.interval,
+            "runs": self.runs,
+            "skipped": self.skipped,
+            "errors": self.errors,
+            "archived_rows": self.archived_rows,
+            "last_run": self.last_run,
+        }
+
+
+_JOB: Optional[RetentionJob] = None
+
+
+def get_job() -> Optional[RetentionJob]:
+    """Job global (iniciado en el lifespan), o None si no hay retención periódica configurada."""
+    return _JOB
+
+
+def start_job() -> Optional[RetentionJob]:
+    global _JOB
+    if RETENTION_MONTHS > 0 and ARCHIVE_INTERVAL_S > 0 and _JOB is None:
+        _JOB = RetentionJob()
+        _JOB.start()
+    return _JOB
+
+
+async def shutdown_job() -> None:
+    global _JOB
+    if _JOB is not None:
+        job, _JOB = _JOB, None
+        await job.stop()
+
+
+def main() -> None:
+    """Archivado manual o desde cron: python -m app.services.history_archive [meses]"""
+    months = int(sys.argv[1]) if len(sys.argv) > 1 else RETENTION_MONTHS
+    if months <= 0:
+        sys.exit("Indique los meses a conservar (argumento o HISTORY_RETENTION_MONTHS)")
+
+    async def run():
+        job = RetentionJob(months=months)
+        try:
+            return await job.run_once()
+        finally:
+            await database.async_engine.dispose()
+
+    print(asyncio.run(run()) or "Otro proceso está archivando")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,182 @@
+import base64
+import csv
+import io
+import json
+import os
+import zlib
+from datetime import datetime
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+from pydantic import TypeAdapter
+from sqlalchemy import Row, and_, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from .. import database, models
+from ..schemas import Diagnosis
+
+# Tamaño de página de /history por defecto y máximo admitido en ?limit=
+HISTORY_PAGE_SIZE = int(os.getenv("HISTORY_PAGE_SIZE", "50"))
+HISTORY_PAGE_MAX = int(os.getenv("HISTORY_PAGE_MAX", "200"))
+# Filas que se traen de la base (y se envían) en cada bloque de /history/export
+HISTORY_EXPORT_CHUNK_ROWS = int(os.getenv("HISTORY_EXPORT_CHUNK_ROWS", "1000"))
+
+EXPORT_FORMATS = ("ndjson", "csv")
+
+
+class InvalidCursor(ValueError):
+    """El cursor `before` no tiene el formato que devuelve la API."""
+
+
+def encode_cursor(created_at: datetime, item_id: int) -> str:
+    """Cursor opaco con la posición (created_at, id) del último elemento de la página."""
+    raw = f"{created_at.isoformat()}|{item_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        created_at, item_id = raw.split("|")
+        return datetime.fromisoformat(created_at), int(item_id)
+    except (ValueError, UnicodeDecodeError) as e:
+        raise InvalidCursor(cursor) from e
+
+
+_JSON = json.JSONEncoder(ensure_ascii=False)
+_DIAGNOSES = TypeAdapter(List[Diagnosis])
+
+
+def history_row(user_id: int, symptoms: List[str], diagnoses: List[Diagnosis],
+                detected: Optional[List[str]] = None) -> Dict[str, Any]:
+    """
+    Fila de History lista para insertar. Síntomas y diagnósticos se guardan
+    ya serializados en JSON (la única validación: se generan aquí) y al
+    leerlos se copian tal cual en la respuesta.
+    `detected` son los síntomas de la KB que detectó el diagnóstico (los
+    que cuentan los contadores de analytics, al guardar y al borrar).
+    created_at se fija aquí (con escritura diferida el INSERT llega después).
+    """
+    return {
+        "user_id": user_id,
+        "symptoms": _JSON.encode(list(symptoms)),
+        "diagnosis_result": _DIAGNOSES.dump_json(diagnoses).decode(),
+        "detected": None if detected is None else _JSON.encode(list(detected)),
+        "created_at": datetime.utcnow(),
+    }
+
+
+def _symptoms_json(raw: str) -> str:
+    # Filas antiguas: síntomas unidos con ", " en lugar de un array JSON
+    return raw if raw.startswith("[") else _JSON.encode(raw.split(", "))
+
+
+def _diagnoses_json(raw: Optional[str]) -> str:
+    return raw if raw and raw.startswith("[") else "[]"
+
+
+def _item_json(item_id: int, created_at: datetime, symptoms: str, result: Optional[str]) -> str:
+    # symptoms y diagnosis_result ya son JSON válido (columnas JSON en MySQL; los escribe
+    # history_row): se copian sin json.loads/dumps; solo se distinguen las filas antiguas
+    return (f'{{"id":{item_id},"date":"{created_at.isoformat()}",'
+            f'"symptoms":{_symptoms_json(symptoms)},"diagnoses":{_diagnoses_json(result)}}}')
+
+
+def page_json(rows, next_cursor: Optional[str]) -> bytes:
+    """Cuerpo de /history ({"items": [...], "next_cursor": ...}) a partir de las filas, sin re-codificarlas."""
+    # Las cuatro primeras columnas (las filas archivadas llevan además `detected`)
+    items = ",".join(_item_json(*row[:4]) for row in rows)
+    cursor = "null" if next_cursor is None else f'"{next_cursor}"'
+    return f'{{"items":[{items}],"next_cursor":{cursor}}}'.encode()
+
+
+async def fetch_page(db: AsyncSession, user_id: int, limit: int = HISTORY_PAGE_SIZE,
+                     before: Optional[str] = None) -> Tuple[List[Row], Optional[str]]:
+    """
+    Una página del historial del usuario, de más reciente a más antiguo.
+
+    Paginación por clave (created_at, id) en lugar de OFFSET: cada página es
+    un rango del índice ix_history_user_created, así que cuesta lo mismo la
+    primera que la página mil. Devuelve (filas (id, created_at, symptoms,
+    diagnosis_result), cursor de la siguiente página o None si no hay más);
+    page_json las convierte en el cuerpo de la respuesta.
+    """
+    stmt = (
+        select(models.History.id, models.History.created_at, models.History.symptoms,
+               models.History.diagnosis_result)
+        .where(models.History.user_id == user_id)
+        .order_by(models.History.created_at.desc(), models.History.id.desc())
+        # Una fila de más para saber si queda otra página
+        .limit(limit + 1)
+    )
+    if before:
+        created_at, item_id = decode_cursor(before)
+        # OR explícito en vez de (created_at, id) < (...): MySQL lo resuelve como rango del índice
+        stmt = stmt.where(or_(
+            models.History.created_at < created_at,
+            and_(models.History.created_at == created_at, models.History.id < item_id),
+        ))
+    rows = (await db.execute(stmt)).all()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1].created_at, rows[-1].id)
+    return rows, next_cursor
+
+
+def _ndjson_lines(rows) -> str:
+    return "".join(_item_json(*row[:4]) + "\n" for row in rows)
+
+
+def _csv_chunk(rows, header: bool) -> str:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if header:
+        writer.writerow(["id", "date", "symptoms", "diagnoses"])
+    writer.writerows((r.id, r.created_at.isoformat(), _symptoms_json(r.symptoms), _diagnoses_json(r.diagnosis_result))
+                     for r in rows)
+    return buffer.getvalue()
+
+
+async def export_rows(user_id: int, fmt: str = "ndjson", chunk_rows: int = HISTORY_EXPORT_CHUNK_ROWS,
+                      sessions: Optional[async_sessionmaker] = None, header: bool = True) -> AsyncIterator[bytes]:
+    """
+    Todo el historial del usuario en NDJSON o CSV (del más antiguo al más
+    reciente), en bloques de `chunk_rows` filas.
+
+    Las filas se leen con un cursor de servidor (stream + yield_per): solo
+    hay un bloque en memoria a la vez, sea cual sea el tamaño del historial.
+    La sesión es propia del generador porque la de la dependencia de FastAPI
+    se cierra antes de que empiece a enviarse la respuesta. Con
+    header=False no se emite la cabecera CSV (la envió quien va antes, p. ej.
+    las filas archivadas).
+    """
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"Formato desconocido: {fmt} (use {' o '.join(EXPORT_FORMATS)})")
+    stmt = (
+        select(models.History.id, models.History.created_at, models.History.symptoms,
+               models.History.diagnosis_result)
+        .where(models.History.user_id == user_id)
+        .order_by(models.History.created_at, models.History.id)
+        .execution_options(yield_per=chunk_rows)
+    )
+    async with (sessions or database.AsyncSessionLocal)() as db:
+        result = await db.stream(stmt)
+        async for rows in result.partitions():
+            if fmt == "csv":
+                chunk = _csv_chunk(rows, header)
+                header = False
+            else:
+                chunk = _ndjson_lines(rows)
+            yield chunk.encode()
+        if fmt == "csv" and header:
+            yield _csv_chunk((), True).encode()
+
+
+async def gzip_chunks(chunks: AsyncIterator[bytes], level: int = 6) -> AsyncIterator[bytes]:
+    """Comprime en gzip un flujo de bloques sin juntarlo en memoria."""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    async for chunk in chunks:
+        data = compressor.compress(chunk)
+        if data:
+            yield data
+    yield compressor.flush()
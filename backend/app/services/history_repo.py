@@ -1,72 +1,301 @@
 import json
 import os
 import threading
+from contextlib import contextmanager
 from datetime import datetime
-from typing import Any, Dict, List
+from typing import Any, Dict, Iterator, List, Optional, Tuple
 from uuid import uuid4
 
+try:
+    import fcntl
+except ImportError:  # Windows: sin bloqueo entre procesos (un solo worker)
+    fcntl = None
 
-_LOCK = threading.Lock()
+# Cada cuántos segundos se compacta el log en segundo plano (0 = nunca)
+COMPACT_SECONDS = float(os.getenv("HISTORY_REPO_COMPACT_SECONDS", "300"))
+# Fracción mínima del fichero ocupada por registros borrados para compactar
+COMPACT_MIN_DEAD_RATIO = float(os.getenv("HISTORY_REPO_COMPACT_RATIO", "0.3"))
 
 
-def _storage_path() -> str:
+def _storage_dir() -> str:
     base_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "data"))
     os.makedirs(base_dir, exist_ok=True)
-    return os.path.join(base_dir, "history.json")
+    return base_dir
+
+
+def _encode(entry: Dict[str, Any]) -> bytes:
+    return (json.dumps(entry, ensure_ascii=False, separators=(",", ":")) + "\n").encode()
+
+
+class HistoryLog:
+    """
+    Historial en un log JSONL de solo añadir (`history.jsonl`).
+
+    - add: una línea al final del fichero (O(1), sin reescribirlo).
+    - delete: una línea "tumba" {"deleted": id}; el registro desaparece del índice.
+    - Índice en memoria: id -> (offset, longitud) y, por usuario, sus ids en
+      orden de llegada; list_records lee solo los registros de la página.
+    - Varios procesos (workers de uvicorn) comparten el fichero: las
+      escrituras toman un flock exclusivo sobre `history.jsonl.lock` y las
+      lecturas uno compartido. Antes de cada operación el índice se pone al
+      día leyendo solo lo que otros procesos añadieron desde la última vez;
+      si otro proceso compactó (cambió el inodo), se reconstruye entero.
+    - compact: reescribe solo los registros vivos cuando las tumbas y los
+      registros borrados ocupan al menos `COMPACT_MIN_DEAD_RATIO` del fichero.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock_path = path + ".lock"
+        self._thread_lock = threading.RLock()
+        self._offsets: Dict[str, Tuple[int, int]] = {}
+        self._by_user: Dict[Optional[str], List[str]] = {}
+        self._order: List[Optional[str]] = []
+        self._position: Dict[str, int] = {}
+        self._inode: Optional[int] = None
+        self._end = 0
+        self._dead_bytes = 0
+        self.compactions = 0
+
+    # --- bloqueo entre procesos ---
+
+    @contextmanager
+    def _locked(self, exclusive: bool) -> Iterator[None]:
+        with self._thread_lock:
+            if fcntl is None:
+                yield
+                return
+            with open(self._lock_path, "a") as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
 
+    # --- índice ---
 
-def _read_all() -> List[Dict[str, Any]]:
-    path = _storage_path()
-    if not os.path.exists(path):
-        return []
-    try:
-        with open(path, "r", encoding="utf-8") as f:
-            data = json.load(f)
-            if isinstance(data, list):
-                return data
-            return []
-    except Exception:
-        # Corrupted or unreadable file; start fresh but do not crash API
-        return []
+    def _reset_index(self) -> None:
+        self._offsets.clear()
+        self._by_user.clear()
+        self._order.clear()
+        self._position.clear()
+        self._inode = None
+        self._end = 0
+        self._dead_bytes = 0
 
+    def _refresh(self) -> None:
+        """Pone el índice al día con lo que otros procesos escribieron (con el lock tomado)."""
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            self._reset_index()
+            return
+        if stat.st_ino != self._inode or stat.st_size < self._end:
+            self._reset_index()
+            self._inode = stat.st_ino
+        if stat.st_size > self._end:
+            self._scan(self._end, stat.st_size)
+
+    def _scan(self, start: int, end: int) -> None:
+        with open(self.path, "rb") as f:
+            f.seek(start)
+            offset = start
+            for line in f:
+                if offset + len(line) > end or not line.endswith(b"\n"):
+                    # Línea incompleta (escritura interrumpida): se ignora hasta la compactación
+                    break
+                self._index_line(line, offset)
+                offset += len(line)
+        self._end = offset
+
+    def _index_line(self, line: bytes, offset: int) -> None:
+        try:
+            entry = json.loads(line)
+        except ValueError:
+            self._dead_bytes += len(line)
+            return
+        deleted = entry.get("deleted")
+        if deleted is not None:
+            self._dead_bytes += len(line)
+            self._forget(deleted)
+            return
+        rec_id = entry["id"]
+        self._offsets[rec_id] = (offset, len(line))
+        self._position[rec_id] = len(self._order)
+        self._order.append(rec_id)
+        self._by_user.setdefault(entry.get("user_id"), []).append(rec_id)
+
+    def _forget(self, rec_id: str) -> None:
+        location = self._offsets.pop(rec_id, None)
+        if location is None:
+            return
+        self._dead_bytes += location[1]
+        # El hueco en _order se marca con None (borrarlo de la lista sería O(n));
+        # en _by_user queda el id, que list descarta al no estar en _offsets
+        self._order[self._position.pop(rec_id)] = None
+
+    def _read(self, f, rec_id: str) -> Dict[str, Any]:
+        offset, length = self._offsets[rec_id]
+        f.seek(offset)
+        return json.loads(f.read(length))
+
+    # --- operaciones ---
+
+    def add(self, input_symptoms: List[str], result: Any, user_id: Optional[str] = None) -> Dict[str, Any]:
+        record = {
+            "id": str(uuid4()),
+            "user_id": user_id,
+            "input_symptoms": input_symptoms,
+            "result": result,
+            "created_at": datetime.utcnow().isoformat() + "Z",
+        }
+        with self._locked(exclusive=True):
+            self._refresh()
+            self._append(_encode(record))
+        return record
+
+    def delete(self, rec_id: str) -> bool:
+        with self._locked(exclusive=True):
+            self._refresh()
+            if rec_id not in self._offsets:
+                return False
+            self._append(_encode({"deleted": rec_id}))
+        return True
 
-def _write_all(items: List[Dict[str, Any]]) -> None:
-    path = _storage_path()
-    tmp = path + ".tmp"
-    with open(tmp, "w", encoding="utf-8") as f:
-        json.dump(items, f, ensure_ascii=False, indent=2)
-    os.replace(tmp, path)
+    def _append(self, line: bytes) -> None:
+        with open(self.path, "ab") as f:
+            offset = f.tell()
+            if offset != self._end:
+                # Cola incompleta de una escritura interrumpida: se descarta antes de añadir
+                f.truncate(self._end)
+                offset = self._end
+            f.write(line)
+        if self._inode is None:
+            self._inode = os.stat(self.path).st_ino
+        self._index_line(line, offset)
+        self._end = offset + len(line)
+
+    def list(self, limit: int = 50, offset: int = 0, user_id: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Registros de más reciente a más antiguo, saltando `offset`; solo se leen los de la página."""
+        with self._locked(exclusive=False):
+            self._refresh()
+            if user_id is None:
+                ids = self._order
+            else:
+                ids = self._by_user.get(user_id, [])
+            page: List[str] = []
+            skipped = 0
+            for rec_id in reversed(ids):
+                if rec_id is None or rec_id not in self._offsets:
+                    continue
+                if skipped < offset:
+                    skipped += 1
+                    continue
+                page.append(rec_id)
+                if len(page) >= limit:
+                    break
+            if not page:
+                return []
+            with open(self.path, "rb") as f:
+                return [self._read(f, rec_id) for rec_id in page]
+
+    def compact(self, force: bool = False) -> bool:
+        """Reescribe el log solo con los registros vivos (en orden) si merece la pena."""
+        with self._locked(exclusive=True):
+            self._refresh()
+            if not self._end or (not force and self._dead_bytes < self._end * COMPACT_MIN_DEAD_RATIO):
+                return False
+            tmp = self.path + ".tmp"
+            with open(self.path, "rb") as src, open(tmp, "wb") as dst:
+                for rec_id in self._order:
+                    if rec_id is None:
+                        continue
+                    offset, length = self._offsets[rec_id]
+                    src.seek(offset)
+                    dst.write(src.read(length))
+                dst.flush()
+                os.fsync(dst.fileno())
+            os.replace(tmp, self.path)
+            # Los demás procesos ven el inodo nuevo y reconstruyen su índice
+            self._reset_index()
+            self._refresh()
+            self.compactions += 1
+            return True
+
+    def stats(self) -> Dict[str, Any]:
+        with self._thread_lock:
+            return {
+                "records": len(self._offsets),
+                "users": sum(1 for ids in self._by_user.values() if ids),
+                "bytes": self._end,
+                "dead_bytes": self._dead_bytes,
+                "compactions": self.compactions,
+            }
+
+    def import_legacy(self, legacy_path: str) -> int:
+        """Migra el antiguo history.json (lista JSON, más reciente primero) si el log aún no existe."""
+        with self._locked(exclusive=True):
+            if os.path.exists(self.path) or not os.path.exists(legacy_path):
+                return 0
+            try:
+                with open(legacy_path, "r", encoding="utf-8") as f:
+                    items = json.load(f)
+            except (OSError, ValueError):
+                return 0
+            if not isinstance(items, list):
+                return 0
+            for item in reversed(items):
+                if isinstance(item, dict) and "id" in item:
+                    self._append(_encode(item))
+            return len(self._offsets)
+
+
+class _Compactor(threading.Thread):
+    def __init__(self, log: HistoryLog, interval: float):
+        super().__init__(name="history-compactor", daemon=True)
+        self.log = log
+        self.interval = interval
+        self._stopped = threading.Event()
+
+    def run(self) -> None:
+        while not self._stopped.wait(self.interval):
+            try:
+                self.log.compact()
+            except OSError:
+                # Disco lleno o permisos: se reintenta en el siguiente ciclo
+                pass
+
+    def stop(self) -> None:
+        self._stopped.set()
+
+
+_STORE: Optional[HistoryLog] = None
+_COMPACTOR: Optional[_Compactor] = None
+_LOCK = threading.Lock()
+
+
+def _store() -> HistoryLog:
+    global _STORE, _COMPACTOR
+    if _STORE is None:
+        with _LOCK:
+            if _STORE is None:
+                base_dir = _storage_dir()
+                store = HistoryLog(os.path.join(base_dir, "history.jsonl"))
+                store.import_legacy(os.path.join(base_dir, "history.json"))
+                if COMPACT_SECONDS > 0:
+                    _COMPACTOR = _Compactor(store, COMPACT_SECONDS)
+                    _COMPACTOR.start()
+                _STORE = store
+    return _STORE
 
 
 def add_record(input_symptoms: List[str], result: Any, user_id: str | None = None) -> Dict[str, Any]:
-    now = datetime.utcnow().isoformat() + "Z"
-    record = {
-        "id": str(uuid4()),
-        "user_id": user_id,
-        "input_symptoms": input_symptoms,
-        "result": result,
-        "created_at": now,
-    }
-    with _LOCK:
-        items = _read_all()
-        items.insert(0, record)  # newest first
-        # keep only last 200 to avoid unbounded growth
-        items = items[:200]
-        _write_all(items)
-    return record
-
-
-def list_records(limit: int = 50) -> List[Dict[str, Any]]:
-    with _LOCK:
-        items = _read_all()
-        return items[:limit]
+    return _store().add(input_symptoms, result, user_id)
+
+
+def list_records(limit: int = 50, offset: int = 0, user_id: str | None = None) -> List[Dict[str, Any]]:
+    return _store().list(limit, offset, user_id)
 
 
 def delete_record(rec_id: str) -> bool:
-    with _LOCK:
-        items = _read_all()
-        new_items = [it for it in items if it.get("id") != rec_id]
-        if len(new_items) == len(items):
-            return False
-        _write_all(new_items)
-        return True
+    return _store().delete(rec_id)
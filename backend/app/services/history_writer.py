@@ -0,0 +1,229 @@
+import asyncio
+import logging
+import os
+import time
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from .. import database, models
+from . import analytics
+
+logger = logging.getLogger(__name__)
+
+# Configuración (variables de entorno)
+# 1: /diagnose responde sin esperar el INSERT; las filas se escriben por lotes en segundo plano
+WRITE_BEHIND_ENABLED = os.getenv("HISTORY_WRITE_BEHIND", "0") == "1"
+FLUSH_INTERVAL_MS = float(os.getenv("HISTORY_FLUSH_MS", "50"))
+FLUSH_MAX_ROWS = int(os.getenv("HISTORY_FLUSH_ROWS", "500"))
+QUEUE_MAX = int(os.getenv("HISTORY_QUEUE_MAX", "10000"))
+# Espera máxima por hueco en la cola llena antes de responder 503
+ENQUEUE_TIMEOUT_S = float(os.getenv("HISTORY_ENQUEUE_TIMEOUT_S", "1"))
+# Pausa antes de reintentar un lote cuya escritura falló
+_RETRY_DELAY_S = 0.5
+
+
+class HistoryQueueFull(Exception):
+    """La cola de escritura del historial sigue llena tras ENQUEUE_TIMEOUT_S."""
+
+
+class HistoryWriter:
+    """
+    Escritura diferida (write-behind) de filas de History.
+
+    Las rutas encolan las filas (con su created_at ya fijado) y responden
+    sin esperar al commit. Una tarea del event loop las escribe con un
+    INSERT multi-fila cada `interval_ms` o en cuanto hay `max_rows`.
+
+    - Contrapresión: la cola está acotada (`queue_max` filas); si no
+      caben todas las filas de la llamada, `enqueue` espera hueco hasta
+      `enqueue_timeout` y luego lanza HistoryQueueFull (la API responde
+      503). Las filas de una llamada entran todas o ninguna: un 503 nunca
+      deja parte de un /diagnose/batch escrita (el reintento la duplicaría).
+    - Lectura de lo propio escrito: `wait_for_user` fuerza la escritura
+      inmediata y espera a que las filas de ese usuario estén confirmadas;
+      /history lo llama antes de consultar. Vale dentro de este proceso:
+      con varios workers, otra petición puede caer en un worker distinto.
+    - Si el INSERT falla, el lote se reintenta (no se descarta); al
+      parar, `stop` escribe todo lo pendiente.
+    """
+
+    def __init__(self, interval_ms: float = FLUSH_INTERVAL_MS, max_rows: int = FLUSH_MAX_ROWS,
+                 queue_max: int = QUEUE_MAX, enqueue_timeout: float = ENQUEUE_TIMEOUT_S,
+                 sessions: Optional[async_sessionmaker] = None):
+        self.interval = interval_ms / 1000.0
+        self.max_rows = max(1, max_rows)
+        self.queue_max = max(1, queue_max)
+        self.enqueue_timeout = enqueue_timeout
+        self._sessions = sessions
+        # Sin límite propio: el hueco se reserva por llamada con _space/_queued
+        self._queue: "asyncio.Queue[Dict[str, Any]]" = asyncio.Queue()
+        self._space = asyncio.Condition()
+        self._queued = 0
+        self._task: Optional[asyncio.Task] = None
+        self._flush_now = asyncio.Event()
+        self._committed = asyncio.Condition()
+        self._stopping = False
+        # Filas encoladas y aún no confirmadas, por usuario
+        self._pending_by_user: Dict[int, int] = {}
+        self.enqueued = 0
+        self.rejected = 0
+        self.flushes = 0
+        self.flushed_rows = 0
+        self.errors = 0
+        self.dropped = 0
+        self.waits = 0
+        self.depth_max = 0
+        self._flush_total = 0.0
+        self._flush_max = 0.0
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run(), name="history-writer")
+
+    async def stop(self) -> None:
+        """Escribe todo lo encolado y detiene la tarea (al apagar el servidor)."""
+        if self._task is None:
+            return
+        self._stopping = True
+        self._flush_now.set()
+        await self._task
+        self._task = None
+
+    async def enqueue(self, rows: List[Dict[str, Any]]) -> None:
+        """Encola todas las filas o ninguna (HistoryQueueFull si no hay hueco a tiempo)."""
+        n = len(rows)
+        async with self._space:
+            if n > self.queue_max or not await self._wait_for_room(n):
+                self.rejected += 1
+                raise HistoryQueueFull("La cola de escritura del historial está llena")
+            self._queued += n
+        for row in rows:
+            user_id = row["user_id"]
+            # Se cuenta antes de encolar: el writer puede confirmarla en cuanto entra en la cola
+            self._pending_by_user[user_id] = self._pending_by_user.get(user_id, 0) + 1
+            self._queue.put_nowait(row)
+        self.enqueued += n
+        self.depth_max = max(self.depth_max, self._queue.qsize())
+        if self._queue.qsize() >= self.max_rows:
+            self._flush_now.set()
+
+    async def _wait_for_room(self, n: int) -> bool:
+        # Con self._space adquirido
+        try:
+            await asyncio.wait_for(self._space.wait_for(lambda: self._queued + n <= self.queue_max),
+                                   self.enqueue_timeout)
+        except asyncio.TimeoutError:
+            return False
+        return True
+
+    async def wait_for_user(self, user_id: int) -> None:
+        """Espera a que estén confirmadas las filas encoladas del usuario."""
+        if not self._pending_by_user.get(user_id):
+            return
+        self.waits += 1
+        self._flush_now.set()
+        async with self._committed:
+            await self._committed.wait_for(lambda: not self._pending_by_user.get(user_id))
+
+    async def _run(self) -> None:
+        while not self._stopping:
+            try:
+                await asyncio.wait_for(self._flush_now.wait(), self.interval)
+            except asyncio.TimeoutError:
+                pass
+            self._flush_now.clear()
+            while not self._queue.empty():
+                batch = self._drain()
+                # Las filas salen de la cola: su hueco queda libre para otras llamadas
+                async with self._space:
+                    self._queued -= len(batch)
+                    self._space.notify_all()
+                while not await self._write(batch):
+                    if self._stopping:
+                        # Al apagar no se reintenta indefinidamente: el lote se pierde (queda en el log)
+                        self.dropped += len(batch)
+                        await self._release(batch)
+                        break
+                    await asyncio.sleep(_RETRY_DELAY_S)
+
+    def _drain(self) -> List[Dict[str, Any]]:
+        batch = []
+        while len(batch) < self.max_rows and not self._queue.empty():
+            batch.append(self._queue.get_nowait())
+        return batch
+
+    async def _write(self, batch: List[Dict[str, Any]]) -> bool:
+        started = time.perf_counter()
+        try:
+            async with (self._sessions or database.AsyncSessionLocal)() as db:
+                await db.execute(insert(models.History), batch)
+                await analytics.record(db, batch)
+                await db.commit()
+        except Exception:
+            self.errors += 1
+            logger.exception("No se pudo escribir un lote de %d filas del historial", len(batch))
+            return False
+        elapsed = time.perf_counter() - started
+        self.flushes += 1
+        self.flushed_rows += len(batch)
+        self._flush_total += elapsed
+        self._flush_max = max(self._flush_max, elapsed)
+        await self._release(batch)
+        return True
+
+    async def _release(self, batch: List[Dict[str, Any]]) -> None:
+        """Descuenta las filas del lote de sus usuarios y despierta a los que esperan."""
+        for row in batch:
+            left = self._pending_by_user[row["user_id"]] - 1
+            if left:
+                self._pending_by_user[row["user_id"]] = left
+            else:
+                del self._pending_by_user[row["user_id"]]
+        async with self._committed:
+            self._committed.notify_all()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": True,
+            "interval_ms": self.interval * 1000.0,
+            "max_rows": self.max_rows,
+            "queue_max": self.queue_max,
+            "queue_depth": self._queue.qsize(),
+            "queue_depth_max": self.depth_max,
+            "enqueued": self.enqueued,
+            "rejected": self.rejected,
+            "flushes": self.flushes,
+            "flushed_rows": self.flushed_rows,
+            "avg_rows_per_flush": round(self.flushed_rows / self.flushes, 2) if self.flushes else 0.0,
+            "flush_latency_avg_ms": round(self._flush_total / self.flushes * 1000.0, 3) if self.flushes else 0.0,
+            "flush_latency_max_ms": round(self._flush_max * 1000.0, 3),
+            "errors": self.errors,
+            "dropped": self.dropped,
+            "read_your_writes_waits": self.waits,
+        }
+
+
+_WRITER: Optional[HistoryWriter] = None
+
+
+def get_writer() -> Optional[HistoryWriter]:
+    """Writer global (iniciado en el lifespan), o None si HISTORY_WRITE_BEHIND no está activado."""
+    return _WRITER
+
+
+def start_writer() -> Optional[HistoryWriter]:
+    global _WRITER
+    if WRITE_BEHIND_ENABLED and _WRITER is None:
+        _WRITER = HistoryWriter()
+        _WRITER.start()
+    return _WRITER
+
+
+async def shutdown_writer() -> None:
+    """Escribe las filas pendientes y detiene la tarea."""
+    global _WRITER
+    if _WRITER is not None:
+        writer, _WRITER = _WRITER, None
+        await writer.stop()
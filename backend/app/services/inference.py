@@ -0,0 +1,229 @@
+import asyncio
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Any, Dict, List, Optional
+
+from starlette.concurrency import run_in_threadpool
+
+from ..schemas import Diagnosis
+from . import ai_stub, coalescer
+
+# Configuración (variables de entorno)
+# "inprocess": hilos del servidor (con coalescer si está activo); "process": pool de procesos
+ENGINE_MODE = os.getenv("DIAGNOSE_ENGINE", "inprocess")
+ENGINE_WORKERS = int(os.getenv("DIAGNOSE_ENGINE_WORKERS", "0")) or (os.cpu_count() or 1)
+# Peticiones admitidas a la vez (en ejecución + en cola); el resto recibe 503
+ENGINE_MAX_PENDING = int(os.getenv("DIAGNOSE_ENGINE_MAX_PENDING", "0")) or ENGINE_WORKERS * 8
+ENGINE_TIMEOUT_S = float(os.getenv("DIAGNOSE_ENGINE_TIMEOUT_S", "5"))
+
+MODES = ("inprocess", "process")
+
+
+class EngineOverloaded(Exception):
+    """La cola del motor está llena; el llamador debe reintentar más tarde."""
+
+
+class EngineTimeout(Exception):
+    """El diagnóstico no terminó dentro del tiempo máximo por llamada."""
+
+
+# --- Código que corre dentro de los procesos del pool ---
+
+def _init_worker() -> None:
+    # Cada proceso carga (mapea) la KB compilada una sola vez al arrancar
+    ai_stub.warm_up()
+
+
+def _ping() -> int:
+    return os.getpid()
+
+
+def _sync_index(version: str, artifact: Optional[str]) -> None:
+    """Alinea la KB del proceso con la del servidor (tras una recarga en caliente)."""
+    if ai_stub.get_index().version == version:
+        return
+    if artifact:
+        ai_stub.activate_artifact(artifact)
+    else:
+        ai_stub.reload_index()
+
+
+def _run_batch(symptom_lists: List[List[str]], version: str, artifact: Optional[str]) -> List[ai_stub.DiagnosisResult]:
+    _sync_index(version, artifact)
+    return ai_stub.analyze_batch(symptom_lists)
+
+
+class InferenceEngine:
+    """
+    Ejecuta los diagnósticos fuera del hilo del event loop.
+
+    En modo "process" se usa un ProcessPoolExecutor de `workers` procesos
+    calientes (cada uno con el índice ya cargado), de modo que el trabajo
+    de NumPy/Python no compite por el GIL del servidor. En modo "inprocess"
+    se usa el threadpool del servidor, como antes (útil en tests).
+
+    Con DIAGNOSE_COALESCE=1 las peticiones sueltas se agrupan en micro-lotes
+    en ambos modos: en "inprocess" con el coalescer global y en "process" con
+    uno propio del motor que envía cada lote al pool sin esperarlo.
+
+    `max_pending` acota las peticiones admitidas a la vez: si se supera,
+    `diagnose` lanza EngineOverloaded en lugar de encolar sin límite.
+    Cada llamada espera como mucho `timeout` segundos (EngineTimeout). El
+    timeout solo deja de esperar: un lote que ya se está calculando en un
+    proceso (o en un hilo) no se interrumpe y sigue ocupándolo hasta
+    terminar; solo se cancelan los que aún no habían empezado.
+    """
+
+    def __init__(self, mode: str = ENGINE_MODE, workers: int = ENGINE_WORKERS,
+                 max_pending: int = ENGINE_MAX_PENDING, timeout: float = ENGINE_TIMEOUT_S,
+                 coalesce: bool = coalescer.COALESCE_ENABLED):
+        if mode not in MODES:
+            raise ValueError(f"Modo de motor desconocido: {mode} (use {' o '.join(MODES)})")
+        self.mode = mode
+        self.workers = max(1, workers)
+        self.max_pending = max(1, max_pending)
+        self.timeout = timeout
+        self.coalesce = coalesce
+        self._pool: Optional[ProcessPoolExecutor] = None
+        # Coalescer delante del pool de procesos (solo en modo "process")
+        self.coalescer: Optional[coalescer.DiagnosisCoalescer] = None
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._submitted = 0
+        self._completed = 0
+        self._rejected = 0
+        self._timeouts = 0
+        self._errors = 0
+        self._latency_total = 0.0
+
+    def start(self) -> None:
+        if self.mode != "process" or self._pool is not None:
+            return
+        # spawn: los procesos no heredan hilos ni conexiones del servidor
+        self._pool = ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+        )
+        # Arrancar todos los procesos ahora, no en la primera petición
+        for future in [self._pool.submit(_ping) for _ in range(self.workers)]:
+            future.result()
+        if self.coalesce:
+            self.coalescer = coalescer.DiagnosisCoalescer(submit_fn=self._submit)
+            self.coalescer.start()
+
+    def stop(self) -> None:
+        if self.coalescer is not None:
+            self.coalescer.stop()
+            self.coalescer = None
+        if self._pool is not None:
+            self._pool.shutdown(wait=True, cancel_futures=True)
+            self._pool = None
+
+    async def diagnose(self, symptoms: List[str]) -> List[Diagnosis]:
+        return (await self.diagnose_batch([symptoms]))[0]
+
+    async def diagnose_batch(self, symptom_lists: List[List[str]]) -> List[List[Diagnosis]]:
+        return [result.diagnoses for result in await self.analyze_batch(symptom_lists)]
+
+    async def analyze_batch(self, symptom_lists: List[List[str]]) -> List[ai_stub.DiagnosisResult]:
+        """Diagnósticos y síntomas de la KB detectados de cada lista (ver ai_stub.analyze_batch)."""
+        self._admit()
+        started = time.perf_counter()
+        try:
+            result = await asyncio.wait_for(self._execute(symptom_lists), self.timeout)
+        except asyncio.TimeoutError:
+            self._finish(started, timeouts=1)
+            raise EngineTimeout(f"El diagnóstico superó {self.timeout:g} s")
+        except BaseException:
+            self._finish(started, errors=1)
+            raise
+        self._finish(started, completed=1)
+        return result
+
+    async def _execute(self, symptom_lists: List[List[str]]) -> List[ai_stub.DiagnosisResult]:
+        if self._pool is None:
+            active = coalescer.get_coalescer() if self.coalesce else None
+            if active is not None and len(symptom_lists) == 1:
+                # Se espera el Future en el event loop: no ocupa un hilo del threadpool mientras
+                # se forma el lote (si no, el tamaño de lote quedaría limitado por el threadpool)
+                return [await self._await(active.submit(symptom_lists[0]))]
+            return await run_in_threadpool(ai_stub.analyze_batch, symptom_lists)
+        if self.coalescer is not None and len(symptom_lists) == 1:
+            return [await self._await(self.coalescer.submit(symptom_lists[0]))]
+        return await self._await(self._submit(symptom_lists))
+
+    @staticmethod
+    async def _await(future: Future) -> Any:
+        try:
+            return await asyncio.wrap_future(future)
+        except asyncio.CancelledError:
+            # Si aún no empezó (o no entró en un lote), no ocupa un hilo ni un proceso
+            future.cancel()
+            raise
+
+    def _submit(self, symptom_lists: List[List[str]]) -> Future:
+        index = ai_stub.get_index()
+        return self._pool.submit(_run_batch, symptom_lists, index.version, index.artifact)
+
+    def _admit(self) -> None:
+        with self._lock:
+            if self._pending >= self.max_pending:
+                self._rejected += 1
+                raise EngineOverloaded("Demasiadas peticiones de diagnóstico en curso")
+            self._pending += 1
+            self._submitted += 1
+
+    def _finish(self, started: float, completed: int = 0, timeouts: int = 0, errors: int = 0) -> None:
+        with self._lock:
+            self._pending -= 1
+            self._completed += completed
+            self._timeouts += timeouts
+            self._errors += errors
+            self._latency_total += time.perf_counter() - started
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            finished = self._completed + self._timeouts + self._errors
+            return {
+                "mode": self.mode,
+                "coalesce": self.coalescer is not None or (self.mode == "inprocess" and self.coalesce),
+                "workers": self.workers if self.mode == "process" else None,
+                "max_pending": self.max_pending,
+                "timeout_s": self.timeout,
+                "pending": self._pending,
+                "submitted": self._submitted,
+                "completed": self._completed,
+                "rejected": self._rejected,
+                "timeouts": self._timeouts,
+                "errors": self._errors,
+                "latency_avg_ms": round(self._latency_total / finished * 1000.0, 3) if finished else 0.0,
+            }
+
+
+_ENGINE: Optional[InferenceEngine] = None
+_ENGINE_LOCK = threading.Lock()
+
+
+def get_engine() -> InferenceEngine:
+    """Motor global (iniciado) según DIAGNOSE_ENGINE."""
+    global _ENGINE
+    if _ENGINE is None:
+        with _ENGINE_LOCK:
+            if _ENGINE is None:
+                engine = InferenceEngine()
+                engine.start()
+                _ENGINE = engine
+    return _ENGINE
+
+
+def shutdown_engine() -> None:
+    """Detiene el pool de procesos (al apagar el servidor)."""
+    global _ENGINE
+    with _ENGINE_LOCK:
+        if _ENGINE is not None:
+            _ENGINE.stop()
+            _ENGINE = None
@@ -0,0 +1,251 @@
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import threading
+from typing import Callable, Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+from scipy.sparse import csr_matrix
+
+try:
+    import fcntl
+except ImportError:  # Windows: sin bloqueo, cada worker puede compilar su copia
+    fcntl = None
+
+_BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Configuración (variables de entorno)
+KB_SOURCE = os.getenv("KB_SOURCE", os.path.join(_BACKEND_DIR, "app", "data", "knowledge_base.json"))
+KB_ARTIFACT_DIR = os.getenv("KB_ARTIFACT_DIR", os.path.join(_BACKEND_DIR, "kb_artifacts"))
+# Cada cuántos segundos cada worker comprueba si el fichero fuente cambió (0 = nunca).
+# Activado por defecto: es lo que propaga una recarga por /admin/kb/reload al resto de workers
+KB_WATCH_SECONDS = float(os.getenv("KB_WATCH_SECONDS", "5"))
+
+# Se incrementa cuando cambia el contenido o el formato de los arrays compilados
+ARTIFACT_FORMAT = 1
+
+
+class KBSource(NamedTuple):
+    """Contenido de la base de conocimiento tal como viene del fichero fuente."""
+    kb: Dict[str, Dict[str, float]]
+    recs: Dict[str, str]
+    synonyms: Dict[str, str]
+    stopwords: List[str]
+    label: str = ""
+
+
+def kb_fingerprint(kb: Dict[str, Dict[str, float]], recs: Dict[str, str],
+                   synonyms: Dict[str, str], stopwords: Iterable[str]) -> str:
+    """Hash estable del contenido de la KB, recomendaciones y tablas de normalización."""
+    payload = json.dumps({"kb": kb, "recs": recs, "synonyms": synonyms, "stopwords": sorted(set(stopwords))},
+                         sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:16]
+
+
+def source_fingerprint(source: KBSource) -> str:
+    return kb_fingerprint(source.kb, source.recs, source.synonyms, source.stopwords)
+
+
+def load_source(path: str = KB_SOURCE) -> KBSource:
+    """Lee la KB de un fichero JSON o YAML (.yaml/.yml, requiere PyYAML)."""
+    with open(path, encoding="utf-8") as f:
+        if path.endswith((".yaml", ".yml")):
+            try:
+                import yaml
+            except ImportError as e:
+                raise RuntimeError("Para leer la KB en YAML instale PyYAML (pip install pyyaml)") from e
+            try:
+                data = yaml.safe_load(f)
+            except yaml.YAMLError as e:
+                raise ValueError(f"YAML inválido: {e}") from e
+        else:
+            data = json.load(f)
+    return parse_source(data)
+
+
+def parse_source(data: dict) -> KBSource:
+    """Valida la estructura mínima del fichero fuente."""
+    if not isinstance(data, dict):
+        raise ValueError("La KB debe ser un objeto con las claves kb, recs, synonyms y stopwords")
+    missing = [key for key in ("kb", "recs", "synonyms", "stopwords") if key not in data]
+    if missing:
+        raise ValueError(f"Faltan claves en la KB: {', '.join(missing)}")
+    try:
+        return KBSource(
+            kb={str(condition): {str(s): float(w) for s, w in weights.items()}
+                for condition, weights in data["kb"].items()},
+            recs={str(k): str(v) for k, v in data["recs"].items()},
+            synonyms={str(k): str(v) for k, v in data["synonyms"].items()},
+            stopwords=list(dict.fromkeys(str(w) for w in data["stopwords"])),
+            label=str(data.get("version", "")),
+        )
+    except (AttributeError, TypeError, ValueError) as e:
+        raise ValueError(f"Estructura de KB inválida: {e}") from e
+
+
+def artifact_path(version: str, artifact_dir: str = KB_ARTIFACT_DIR) -> str:
+    return os.path.join(artifact_dir, f"v{ARTIFACT_FORMAT}-{version}")
+
+
+def ensure_artifact(source: KBSource, build_arrays: Callable[[KBSource], Dict[str, np.ndarray]],
+                    artifact_dir: str = KB_ARTIFACT_DIR) -> str:
+    """
+    Devuelve la carpeta del artefacto de esta versión de la KB, compilándola
+    si no existe. Se escribe en una carpeta temporal y se publica con un
+    rename atómico. Un lock de fichero hace que, al arrancar varios workers
+    a la vez, solo el primero compile; el resto espera y mapea su artefacto.
+    """
+    version = source_fingerprint(source)
+    path = artifact_path(version, artifact_dir)
+    if os.path.isfile(os.path.join(path, "manifest.json")):
+        return path
+
+    os.makedirs(artifact_dir, exist_ok=True)
+    with open(os.path.join(artifact_dir, ".compile.lock"), "a") as lock:
+        if fcntl is not None:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            if not os.path.isfile(os.path.join(path, "manifest.json")):
+                _compile(source, build_arrays, artifact_dir, path, version)
+        finally:
+            if fcntl is not None:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+    return path
+
+
+def _compile(source: KBSource, build_arrays: Callable[[KBSource], Dict[str, np.ndarray]],
+             artifact_dir: str, path: str, version: str) -> None:
+    tmp = tempfile.mkdtemp(prefix=".tmp-", dir=artifact_dir)
+    try:
+        arrays = build_arrays(source)
+        for name, array in arrays.items():
+            np.save(os.path.join(tmp, f"{name}.npy"), np.ascontiguousarray(array), allow_pickle=False)
+        with open(os.path.join(tmp, "source.json"), "w", encoding="utf-8") as f:
+            json.dump(source._asdict(), f, ensure_ascii=False)
+        manifest = {
+            "format": ARTIFACT_FORMAT,
+            "version": version,
+            "label": source.label,
+            "arrays": {name: {"dtype": str(a.dtype), "shape": list(a.shape)} for name, a in arrays.items()},
+        }
+        # El manifiesto va al final: una carpeta sin él está incompleta
+        with open(os.path.join(tmp, "manifest.json"), "w", encoding="utf-8") as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=2)
+        try:
+            os.rename(tmp, path)
+        except OSError:
+            if not os.path.isfile(os.path.join(path, "manifest.json")):
+                raise
+    finally:
+        if os.path.isdir(tmp):
+            shutil.rmtree(tmp, ignore_errors=True)
+
+
+def load_artifact(path: str) -> Tuple[KBSource, Dict[str, np.ndarray], dict]:
+    """Abre un artefacto compilado; los arrays se mapean en memoria (solo lectura)."""
+    with open(os.path.join(path, "manifest.json"), encoding="utf-8") as f:
+        manifest = json.load(f)
+    if manifest.get("format") != ARTIFACT_FORMAT:
+        raise ValueError(f"Formato de artefacto no soportado: {manifest.get('format')}")
+    with open(os.path.join(path, "source.json"), encoding="utf-8") as f:
+        source = KBSource(**json.load(f))
+    arrays = {
+        name: np.load(os.path.join(path, f"{name}.npy"), mmap_mode="r", allow_pickle=False)
+        for name in manifest["arrays"]
+    }
+    return source, arrays, manifest
+
+
+def csr_to_arrays(name: str, matrix: csr_matrix) -> Dict[str, np.ndarray]:
+    """Partes de una matriz CSR como arrays planos (para guardarlos en .npy)."""
+    return {
+        f"{name}.data": matrix.data,
+        f"{name}.indices": matrix.indices,
+        f"{name}.indptr": matrix.indptr,
+        f"{name}.shape": np.asarray(matrix.shape, dtype=np.int64),
+    }
+
+
+def csr_from_arrays(arrays: Dict[str, np.ndarray], name: str) -> csr_matrix:
+    """Reconstruye la matriz CSR sin copiar los arrays (pueden ser mmap de solo lectura)."""
+    shape = tuple(int(n) for n in arrays[f"{name}.shape"])
+    matrix = csr_matrix((arrays[f"{name}.data"], arrays[f"{name}.indices"], arrays[f"{name}.indptr"]),
+                        shape=shape, copy=False)
+    matrix.has_sorted_indices = True
+    return matrix
+
+
+def touch_source(path: str = KB_SOURCE) -> bool:
+    """
+    Actualiza la fecha de modificación del fichero fuente para que el
+    SourceWatcher de cada worker recargue la KB. False si no se pudo.
+    """
+    try:
+        os.utime(path)
+    except OSError:
+        return False
+    return True
+
+
+class SourceWatcher:
+    """
+    Hilo que vigila la fecha de modificación del fichero fuente y llama a
+    `on_change` cuando cambia (recarga en caliente en cada worker).
+    """
+
+    def __init__(self, path: str, on_change: Callable[[], None], interval: float = KB_WATCH_SECONDS):
+        self.path = path
+        self.on_change = on_change
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._mtime = self._current_mtime()
+
+    def _current_mtime(self) -> Optional[float]:
+        try:
+            return os.stat(self.path).st_mtime
+        except OSError:
+            return None
+
+    def start(self) -> None:
+        if self.interval > 0 and self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="kb-watcher", daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(self.interval + 1)
+            self._thread = None
+
+    def check(self) -> bool:
+        """Llama a on_change si el fichero cambió desde la última comprobación."""
+        mtime = self._current_mtime()
+        if mtime is None or mtime == self._mtime:
+            return False
+        self._mtime = mtime
+        self.on_change()
+        return True
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            try:
+                self.check()
+            except Exception:
+                # Un fichero a medio escribir o inválido no debe matar al hilo;
+                # se sigue sirviendo la versión anterior
+                self._mtime = None
+
+
+def main() -> None:
+    """Compila el artefacto de KB_SOURCE (p. ej. en el despliegue, antes de arrancar los workers)."""
+    from .ai_stub import _compile_arrays
+
+    source = load_source(KB_SOURCE)
+    print(ensure_artifact(source, _compile_arrays, KB_ARTIFACT_DIR))
+
+
+if __name__ == "__main__":
+    main()
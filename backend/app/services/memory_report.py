@@ -0,0 +1,57 @@
+import os
+import sys
+from typing import Dict, Optional
+
+# Campos de /proc/<pid>/smaps_rollup que se reportan (en kB en el fichero)
+_SMAPS_FIELDS = {
+    "Rss": "rss_mb",
+    "Pss": "pss_mb",
+    "Shared_Clean": "shared_mb",
+    "Shared_Dirty": "shared_mb",
+    "Private_Clean": "private_mb",
+    "Private_Dirty": "private_mb",
+}
+
+
+def process_memory(pid: Optional[int] = None) -> Dict[str, float]:
+    """
+    Memoria del proceso en MB.
+
+    En Linux se lee /proc/<pid>/smaps_rollup: `rss_mb` cuenta entera cada
+    página compartida (p. ej. los arrays de la KB mapeados por todos los
+    workers), mientras que `pss_mb` la reparte entre los procesos que la
+    usan, así que la suma de PSS de los workers es la memoria real del host.
+    En otros sistemas solo se devuelve el RSS máximo (resource), si existe.
+    """
+    pid = pid or os.getpid()
+    report: Dict[str, float] = {"pid": pid}
+    try:
+        with open(f"/proc/{pid}/smaps_rollup") as f:
+            for line in f:
+                key, _, rest = line.partition(":")
+                field = _SMAPS_FIELDS.get(key)
+                if field:
+                    report[field] = report.get(field, 0.0) + int(rest.split()[0]) / 1024
+    except OSError:
+        try:
+            import resource
+        except ImportError:  # Windows
+            return report
+        maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # ru_maxrss viene en bytes en macOS y en kB en Linux
+        report["rss_mb"] = maxrss / (1024 * 1024) if sys.platform == "darwin" else maxrss / 1024
+    return {k: round(v, 2) if isinstance(v, float) else v for k, v in report.items()}
+
+
+_SNAPSHOTS: Dict[str, Dict[str, float]] = {}
+
+
+def snapshot(name: str) -> Dict[str, float]:
+    """Guarda la memoria actual del proceso con un nombre (p. ej. antes/después de cargar la KB)."""
+    _SNAPSHOTS[name] = process_memory()
+    return _SNAPSHOTS[name]
+
+
+def memory_stats() -> Dict[str, Dict[str, float]]:
+    """Instantáneas guardadas de este worker más la memoria actual."""
+    return {**_SNAPSHOTS, "current": process_memory()}
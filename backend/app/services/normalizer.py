@@ -0,0 +1,120 @@
+import re
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from .spelling import SpellingIndex
+
+# Conectores que cortan la oración (además de la puntuación y el salto de línea)
+SEPARATOR_WORDS = frozenset({"y", "o", "ademas"})
+# Palabras que, al inicio de un fragmento, lo marcan como negado
+NEGATIONS = frozenset({"no", "sin", "nunca", "jamás"})
+
+_SYNONYM = "syn"
+_STOPWORD = "stop"
+_END = ""  # clave de fin de frase en el trie (ningún token es vacío)
+
+_Entry = Tuple[str, Optional[str]]
+
+
+class Normalizer:
+    """
+    Normalizador de texto libre compilado una sola vez.
+
+    Sinónimos (de una o varias palabras, p. ej. "sin fuerzas") y stopwords se
+    guardan en un trie por tokens y el separador de fragmentos se compila al
+    construir el objeto. Cada fragmento se recorre una sola vez: corrección
+    ortográfica (si hay `speller`), detección de negación y reemplazo por la
+    frase más larga que coincida.
+    """
+
+    def __init__(
+        self,
+        synonyms: Dict[str, str],
+        stopwords: Iterable[str],
+        negations: Iterable[str] = NEGATIONS,
+        separator_words: Iterable[str] = SEPARATOR_WORDS,
+        speller: Optional[SpellingIndex] = None,
+    ):
+        self.speller = speller
+        self.negations = frozenset(negations)
+        self.separator_words = frozenset(separator_words)
+        words = "|".join(re.escape(w) for w in sorted(self.separator_words))
+        self._splitter = re.compile(rf"[,.;\n]|\b(?:{words})\b" if words else r"[,.;\n]")
+        self._trie: Dict[str, dict] = {}
+        self._max_phrase = 1
+        for word in stopwords:
+            self._add(word.split(), (_STOPWORD, None))
+        # Los sinónimos se insertan después: si una palabra es ambas cosas, gana el sinónimo
+        for phrase, replacement in synonyms.items():
+            self._add(phrase.lower().split(), (_SYNONYM, replacement))
+
+    def _add(self, tokens: List[str], entry: _Entry) -> None:
+        if not tokens:
+            return
+        node = self._trie
+        for token in tokens:
+            node = node.setdefault(token, {})
+        node[_END] = entry
+        self._max_phrase = max(self._max_phrase, len(tokens))
+
+    def _longest(self, tokens: List[str], start: int) -> Tuple[int, Optional[_Entry]]:
+        """Frase más larga del trie que empieza en tokens[start]."""
+        node = self._trie
+        best_len, best = 0, None
+        for i in range(start, min(len(tokens), start + self._max_phrase)):
+            node = node.get(tokens[i])
+            if node is None:
+                break
+            entry = node.get(_END)
+            if entry is not None:
+                best_len, best = i - start + 1, entry
+        return best_len, best
+
+    def fragments(self, texts: Iterable[str]) -> List[str]:
+        """Divide los textos en fragmentos normalizados, descartando los negados."""
+        out: List[str] = []
+        for text in texts:
+            for part in self._splitter.split(text.lower()):
+                self._emit(part.split(), out)
+        return out
+
+    def normalize(self, text: str) -> str:
+        """Corrige, aplica sinónimos y elimina stopwords sin dividir ni mirar negaciones."""
+        tokens = text.lower().split()
+        if self.speller is not None:
+            tokens = [self.speller.correct(t) for t in tokens]
+        return self._normalize_tokens(tokens)
+
+    def _emit(self, tokens: List[str], out: List[str]) -> None:
+        if not tokens:
+            return
+        if self.speller is not None:
+            tokens = [self.speller.correct(t) for t in tokens]
+        if len(tokens) > 1 and tokens[0] in self.negations:
+            # "sin fuerzas" es un síntoma, no una negación
+            _, entry = self._longest(tokens, 0)
+            if entry is None or entry[0] != _SYNONYM:
+                return
+        normalized = self._normalize_tokens(tokens)
+        if normalized:
+            out.append(normalized)
+
+    def _normalize_tokens(self, tokens: List[str]) -> str:
+        words = []
+        trie = self._trie
+        i = 0
+        n = len(tokens)
+        while i < n:
+            # Camino rápido: el token no empieza ninguna frase conocida
+            if tokens[i] not in trie:
+                words.append(tokens[i])
+                i += 1
+                continue
+            length, entry = self._longest(tokens, i)
+            if entry is None:
+                words.append(tokens[i])
+                i += 1
+                continue
+            if entry[0] == _SYNONYM:
+                words.append(entry[1])
+            i += length
+        return " ".join(words)
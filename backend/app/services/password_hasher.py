@@ -0,0 +1,114 @@
+import asyncio
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional, TypeVar
+
+# Hilos dedicados a bcrypt (bcrypt libera el GIL mientras calcula)
+HASH_WORKERS = int(os.getenv("AUTH_HASH_WORKERS", "0")) or min(4, os.cpu_count() or 1)
+# Operaciones admitidas a la vez (en ejecución + en cola); el resto recibe 503
+HASH_MAX_PENDING = int(os.getenv("AUTH_HASH_MAX_PENDING", "0")) or HASH_WORKERS * 8
+
+T = TypeVar("T")
+
+
+class HasherOverloaded(Exception):
+    """La cola de bcrypt está llena; el llamador debe reintentar más tarde."""
+
+
+class PasswordHasher:
+    """
+    Pool de hilos propio para hash/verificación de contraseñas.
+
+    bcrypt tarda decenas de ms por llamada: en el threadpool del servidor,
+    una ráfaga de logins deja sin hilos a /diagnose y /history. Aquí el
+    trabajo va a `workers` hilos dedicados y `max_pending` acota lo admitido
+    a la vez: si se supera, `run` lanza HasherOverloaded en lugar de encolar
+    sin límite (la API responde 503 con Retry-After).
+    """
+
+    def __init__(self, workers: int = HASH_WORKERS, max_pending: int = HASH_MAX_PENDING):
+        self.workers = max(1, workers)
+        self.max_pending = max(1, max_pending)
+        self._pool: Optional[ThreadPoolExecutor] = ThreadPoolExecutor(
+            max_workers=self.workers, thread_name_prefix="bcrypt")
+        self._lock = threading.Lock()
+        self._pending = 0
+        self._submitted = 0
+        self._completed = 0
+        self._rejected = 0
+        self._queue_wait_total = 0.0
+        self._latency_total = 0.0
+
+    async def run(self, fn: Callable[..., T], *args: Any) -> T:
+        if self._pool is None:
+            raise RuntimeError("El pool de contraseñas está detenido")
+        self._admit()
+        submitted = time.perf_counter()
+        started = [submitted]
+
+        def call() -> T:
+            started[0] = time.perf_counter()
+            return fn(*args)
+
+        future = self._pool.submit(call)
+        # El hueco se libera cuando el hilo termina (no cuando el cliente deja de esperar)
+        future.add_done_callback(lambda _f: self._finish(submitted, started[0]))
+        return await asyncio.wrap_future(future)
+
+    def stop(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown(wait=True, cancel_futures=True)
+            self._pool = None
+
+    def _admit(self) -> None:
+        with self._lock:
+            if self._pending >= self.max_pending:
+                self._rejected += 1
+                raise HasherOverloaded("Demasiadas operaciones de contraseña en curso")
+            self._pending += 1
+            self._submitted += 1
+
+    def _finish(self, submitted: float, started: float) -> None:
+        with self._lock:
+            self._pending -= 1
+            self._completed += 1
+            self._queue_wait_total += started - submitted
+            self._latency_total += time.perf_counter() - submitted
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            done = self._completed
+            return {
+                "workers": self.workers,
+                "max_pending": self.max_pending,
+                "pending": self._pending,
+                "submitted": self._submitted,
+                "completed": self._completed,
+                "rejected": self._rejected,
+                "queue_wait_avg_ms": round(self._queue_wait_total / done * 1000.0, 3) if done else 0.0,
+                "latency_avg_ms": round(self._latency_total / done * 1000.0, 3) if done else 0.0,
+            }
+
+
+_HASHER: Optional[PasswordHasher] = None
+_HASHER_LOCK = threading.Lock()
+
+
+def get_hasher() -> PasswordHasher:
+    global _HASHER
+    if _HASHER is None:
+        with _HASHER_LOCK:
+            if _HASHER is None:
+                _HASHER = PasswordHasher()
+    return _HASHER
+
+
+def shutdown_hasher() -> None:
+    """Detiene los hilos de bcrypt (al apagar el servidor)."""
+    global _HASHER
+    with _HASHER_LOCK:
+        if _HASHER is not None:
+            _HASHER.stop()
+            _HASHER = None
@@ -0,0 +1,130 @@
+import threading
+import time
+from typing import Any, Dict, Optional
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import Pool, QueuePool
+
+
+class PoolMonitor:
+    """
+    Contadores del pool de conexiones de un engine.
+
+    Los eventos del pool (checkout, checkin, connect, invalidate) cuentan
+    conexiones prestadas, abiertas e invalidadas (p. ej. por pre-ping tras
+    un corte de MySQL). El tiempo de espera para obtener una conexión no
+    tiene evento propio: se mide en una subclase del pool (pool_class) que
+    cronometra _do_get, incluidos los "QueuePool limit" que acaban en timeout.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._engine: Optional[Engine] = None
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.checkins = 0
+        self.connects = 0
+        self.invalidations = 0
+        self.timeouts = 0
+        self.in_use = 0
+        self.in_use_max = 0
+        self._waits = 0
+        self._wait_total = 0.0
+        self._wait_max = 0.0
+
+    def pool_class(self, base: type) -> type:
+        """Subclase de `base` que mide la espera de cada checkout (sobrevive a pool.recreate())."""
+        monitor = self
+
+        def _do_get(pool):
+            start = time.perf_counter()
+            try:
+                return base._do_get(pool)
+            except PoolTimeoutError:
+                monitor.record_wait(time.perf_counter() - start, timeout=True)
+                raise
+            finally:
+                monitor.record_wait(time.perf_counter() - start)
+
+        return type(f"Instrumented{base.__name__}", (base,), {"_do_get": _do_get})
+
+    def attach(self, engine: Engine) -> None:
+        """Registra los eventos del pool del engine (síncrono; para AsyncEngine usar .sync_engine)."""
+        self._engine = engine
+        event.listen(engine, "checkout", self._on_checkout)
+        event.listen(engine, "checkin", self._on_checkin)
+        event.listen(engine, "connect", self._on_connect)
+        event.listen(engine, "invalidate", self._on_invalidate)
+
+    def record_wait(self, seconds: float, timeout: bool = False) -> None:
+        with self._lock:
+            if timeout:
+                # La llamada ya se contó en el finally de _do_get
+                self.timeouts += 1
+                return
+            self._waits += 1
+            self._wait_total += seconds
+            self._wait_max = max(self._wait_max, seconds)
+
+    def _on_checkout(self, *_args) -> None:
+        with self._lock:
+            self.checkouts += 1
+            self.in_use += 1
+            self.in_use_max = max(self.in_use_max, self.in_use)
+
+    def _on_checkin(self, *_args) -> None:
+        with self._lock:
+            self.checkins += 1
+            self.in_use = max(0, self.in_use - 1)
+
+    def _on_connect(self, *_args) -> None:
+        with self._lock:
+            self.connects += 1
+
+    def _on_invalidate(self, *_args) -> None:
+        with self._lock:
+            self.invalidations += 1
+
+    def stats(self) -> Dict[str, Any]:
+        pool: Optional[Pool] = self._engine.pool if self._engine is not None else None
+        with self._lock:
+            report: Dict[str, Any] = {
+                "pool": type(pool).__name__ if pool is not None else None,
+                "in_use": self.in_use,
+                "in_use_max": self.in_use_max,
+                "checkouts": self.checkouts,
+                "connects": self.connects,
+                "invalidations": self.invalidations,
+                "timeouts": self.timeouts,
+                "wait_avg_ms": round(self._wait_total / self._waits * 1000.0, 3) if self._waits else 0.0,
+                "wait_max_ms": round(self._wait_max * 1000.0, 3),
+            }
+        # Solo los pools con cola (QueuePool) tienen tamaño y overflow
+        if isinstance(pool, QueuePool):
+            report.update(
+                size=pool.size(),
+                # SQLAlchemy cuenta el overflow desde -size: se reporta solo el que está en uso
+                overflow=max(0, pool.overflow()),
+                max_overflow=pool._max_overflow,
+                open=pool.checkedin() + pool.checkedout(),
+                idle=pool.checkedin(),
+                timeout_s=pool._timeout,
+            )
+        return report
+
+
+_MONITORS: Dict[str, PoolMonitor] = {}
+
+
+def get_monitor(name: str) -> PoolMonitor:
+    monitor = _MONITORS.get(name)
+    if monitor is None:
+        monitor = _MONITORS[name] = PoolMonitor(name)
+    return monitor
+
+
+def pool_stats() -> Dict[str, Dict[str, Any]]:
+    """Contadores de todos los engines instrumentados, por nombre."""
+    return {name: monitor.stats() for name, monitor in _MONITORS.items()}
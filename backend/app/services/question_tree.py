@@ -0,0 +1,230 @@
+import os
+import threading
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+import numpy as np
+
+from . import ai_stub
+from .diagnosis_cache import MISSING, LRUCache
+
+# Configuración (variables de entorno)
+# Profundidad máxima del árbol precalculado (preguntas seguidas)
+QUESTION_MAX_DEPTH = int(os.getenv("DIAGNOSE_QUESTION_DEPTH", "8"))
+# No se precalculan ramas cuya probabilidad de camino sea menor (se calculan al pedirlas)
+QUESTION_MIN_PATH_PROB = float(os.getenv("DIAGNOSE_QUESTION_MIN_PROB", "0.0001"))
+# Con una condición por encima de esta probabilidad ya no se pregunta más
+QUESTION_CONFIDENCE = float(os.getenv("DIAGNOSE_QUESTION_CONFIDENCE", "0.9"))
+QUESTION_CACHE_SIZE = 5000
+
+# P(síntoma | condición) para los síntomas que la condición no tiene en la KB
+_LEAK = 0.02
+# Ganancias menores no justifican otra pregunta
+_MIN_GAIN = 1e-3
+_TOP_CANDIDATES = 3
+
+
+class NextQuestion(NamedTuple):
+    symptom: Optional[str]
+    information_gain: float
+    candidates: List[Tuple[str, float]]
+    source: str  # "tree" (recorrido del árbol) o "computed" (fuera del árbol)
+
+
+def _xlogx(x: np.ndarray) -> np.ndarray:
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.where(x > 0, x * np.log(x), 0.0)
+
+
+class QuestionTree:
+    """
+    Árbol de decisión de preguntas sí/no sobre la KB.
+
+    Los pesos de la KB se interpretan como P(síntoma | condición) (con una
+    probabilidad pequeña para los síntomas que la condición no tiene) y se
+    parte de una distribución uniforme sobre las condiciones. En cada nodo se
+    elige el síntoma con máxima ganancia de información sobre la condición y
+    se precalculan sus ramas "sí" y "no" con la distribución a posteriori.
+
+    Elegir la siguiente pregunta es recorrer el árbol con las respuestas
+    dadas: O(profundidad). Las ramas poco probables o más profundas que
+    `max_depth`, y las respuestas que no siguen el camino del árbol (p. ej.
+    síntomas escritos a mano), se calculan al pedirlas y se guardan en una
+    caché LRU. El cálculo usa las matrices dispersas del ConditionScorer,
+    así que cuesta O(pesos de la KB) y no O(síntomas x condiciones).
+    """
+
+    def __init__(self, index: "ai_stub.KnowledgeIndex", max_depth: int = QUESTION_MAX_DEPTH,
+                 min_path_prob: float = QUESTION_MIN_PATH_PROB, confidence: float = QUESTION_CONFIDENCE):
+        scorer = index.scorer
+        self.version = index.version
+        self.max_depth = max(1, max_depth)
+        self.min_path_prob = min_path_prob
+        self.confidence = confidence
+        self.conditions = scorer.conditions
+        self.symptoms = list(scorer.symptom_index)
+        self.symptom_index = scorer.symptom_index
+        # Verosimilitudes en el formato CSR de la traspuesta (síntomas x condiciones)
+        weights_t = scorer._weights_t
+        self._indptr = weights_t.indptr
+        self._indices = weights_t.indices
+        self._yes = np.clip(np.asarray(weights_t.data, dtype=np.float64), _LEAK, 1.0 - _LEAK)
+        self._rows = np.repeat(np.arange(len(self.symptoms)), np.diff(self._indptr))
+        # Condiciones sin pesos no pueden observarse: prior 0
+        prior = (np.asarray(scorer.inv_normalizers) > 0).astype(np.float64)
+        self._prior = prior / prior.sum() if prior.sum() else prior
+
+        # Nodos: síntoma preguntado (-1 = no hace falta preguntar más), ganancia,
+        # hijos sí/no (-1 = rama no precalculada) y condiciones más probables
+        self._symptom: List[int] = []
+        self._gain: List[float] = []
+        self._child_yes: List[int] = []
+        self._child_no: List[int] = []
+        self._top: List[List[Tuple[str, float]]] = []
+        self._expand(self._prior, frozenset(), 0, 1.0)
+        self._computed = LRUCache(QUESTION_CACHE_SIZE)
+
+    def __len__(self) -> int:
+        return len(self._symptom)
+
+    def _likelihood(self, col: int, present: bool) -> np.ndarray:
+        """P(respuesta | condición) para cada condición."""
+        start, end = self._indptr[col], self._indptr[col + 1]
+        values = self._yes[start:end]
+        likelihood = np.full(len(self.conditions), _LEAK if present else 1.0 - _LEAK)
+        likelihood[self._indices[start:end]] = values if present else 1.0 - values
+        return likelihood
+
+    def gains(self, posterior: np.ndarray, asked: frozenset = frozenset()) -> np.ndarray:
+        """
+        Ganancia de información de preguntar cada síntoma, para todos a la vez.
+
+        La entropía condicionada se reparte en un término común a todos los
+        síntomas (el de la probabilidad de fondo) más una corrección dispersa
+        sobre las condiciones que sí tienen cada síntoma.
+        """
+        n = len(self.symptoms)
+        p_entry = posterior[self._indices]
+        yes = p_entry * self._yes
+        no = p_entry * (1.0 - self._yes)
+        total = posterior.sum()
+        p_yes = _LEAK * total + np.bincount(self._rows, yes - p_entry * _LEAK, minlength=n)
+        p_no = total - p_yes
+        sum_yes = _xlogx(posterior * _LEAK).sum() + np.bincount(
+            self._rows, _xlogx(yes) - _xlogx(p_entry * _LEAK), minlength=n)
+        sum_no = _xlogx(posterior * (1.0 - _LEAK)).sum() + np.bincount(
+            self._rows, _xlogx(no) - _xlogx(p_entry * (1.0 - _LEAK)), minlength=n)
+        conditional = -(sum_yes + sum_no) + _xlogx(p_yes) + _xlogx(p_no)
+        gains = -_xlogx(posterior).sum() - conditional
+        if asked:
+            gains[list(asked)] = -np.inf
+        return gains
+
+    def _top_candidates(self, posterior: np.ndarray) -> List[Tuple[str, float]]:
+        order = np.argsort(-posterior, kind="stable")[:_TOP_CANDIDATES]
+        return [(self.conditions[i], round(float(posterior[i]), 4)) for i in order if posterior[i] > 0]
+
+    def _choose(self, posterior: np.ndarray, asked: frozenset) -> Tuple[int, float]:
+        if not len(posterior) or posterior.max() >= self.confidence or len(asked) >= len(self.symptoms):
+            return -1, 0.0
+        gains = self.gains(posterior, asked)
+        best = int(np.argmax(gains))
+        if gains[best] < _MIN_GAIN:
+            return -1, 0.0
+        return best, float(gains[best])
+
+    def _expand(self, posterior: np.ndarray, asked: frozenset, depth: int, path_prob: float) -> int:
+        node = len(self._symptom)
+        col, gain = self._choose(posterior, asked)
+        self._symptom.append(col)
+        self._gain.append(gain)
+        self._child_yes.append(-1)
+        self._child_no.append(-1)
+        self._top.append(self._top_candidates(posterior))
+        if col < 0 or depth + 1 >= self.max_depth:
+            return node
+        for present, children in ((True, self._child_yes), (False, self._child_no)):
+            joint = posterior * self._likelihood(col, present)
+            p_answer = joint.sum()
+            if p_answer > 0 and path_prob * p_answer >= self.min_path_prob:
+                children[node] = self._expand(joint / p_answer, asked | {col}, depth + 1, path_prob * p_answer)
+        return node
+
+    def posterior(self, answers: Dict[int, bool]) -> np.ndarray:
+        """Distribución sobre las condiciones dadas las respuestas (columna -> sí/no)."""
+        log_post = np.log(np.where(self._prior > 0, self._prior, 1.0))
+        for col, present in answers.items():
+            log_post += np.log(self._likelihood(col, present))
+        log_post[self._prior == 0] = -np.inf
+        if not np.isfinite(log_post).any():
+            return self._prior
+        posterior = np.exp(log_post - log_post.max())
+        return posterior / posterior.sum()
+
+    def next_question(self, answers: Dict[int, bool]) -> NextQuestion:
+        """Siguiente síntoma a preguntar dadas las respuestas (columna -> sí/no)."""
+        node, used = 0, 0
+        while True:
+            col = self._symptom[node]
+            if col < 0 or col not in answers:
+                if used == len(answers):
+                    return self._result(node)
+                break
+            used += 1
+            child = self._child_yes[node] if answers[col] else self._child_no[node]
+            if child < 0:
+                break
+            node = child
+        return self._compute(answers)
+
+    def _result(self, node: int) -> NextQuestion:
+        col = self._symptom[node]
+        return NextQuestion(self.symptoms[col] if col >= 0 else None, self._gain[node], self._top[node], "tree")
+
+    def _compute(self, answers: Dict[int, bool]) -> NextQuestion:
+        key = frozenset(answers.items())
+        cached = self._computed.get(key)
+        if cached is not MISSING:
+            return cached
+        posterior = self.posterior(answers)
+        col, gain = self._choose(posterior, frozenset(answers))
+        result = NextQuestion(self.symptoms[col] if col >= 0 else None, gain,
+                              self._top_candidates(posterior), "computed")
+        self._computed.put(key, result)
+        return result
+
+    def stats(self) -> Dict[str, object]:
+        return {"version": self.version, "nodes": len(self), "max_depth": self.max_depth,
+                "computed": self._computed.stats()}
+
+
+_TREE: Optional[QuestionTree] = None
+_TREE_LOCK = threading.Lock()
+
+
+def get_question_tree() -> QuestionTree:
+    """Árbol de la KB activa; se reconstruye cuando cambia la versión de la KB."""
+    global _TREE
+    index = ai_stub.get_index()
+    tree = _TREE
+    if tree is None or tree.version != index.version:
+        with _TREE_LOCK:
+            tree = _TREE
+            if tree is None or tree.version != index.version:
+                tree = QuestionTree(index)
+                _TREE = tree
+    return tree
+
+
+def next_question(yes: List[str], no: List[str]) -> NextQuestion:
+    """
+    Siguiente pregunta dados los síntomas de la KB confirmados y descartados.
+    Lanza ValueError si alguno no es un síntoma de la KB.
+    """
+    tree = get_question_tree()
+    unknown = [s for s in (*yes, *no) if s not in tree.symptom_index]
+    if unknown:
+        raise ValueError(f"Síntomas desconocidos: {', '.join(unknown)}")
+    answers = {tree.symptom_index[s]: False for s in no}
+    # Si un síntoma aparece en ambas listas, gana el "sí"
+    answers.update({tree.symptom_index[s]: True for s in yes})
+    return tree.next_question(answers)
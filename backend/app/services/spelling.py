@@ -0,0 +1,164 @@
+import os
+from typing import Dict, Iterable, List, Optional, Set
+
+import numpy as np
+
+# Distancia de edición máxima para corregir una palabra (0 desactiva la corrección)
+SPELL_MAX_DISTANCE = int(os.getenv("DIAGNOSE_SPELL_MAX_DISTANCE", "2"))
+# Las palabras más cortas no se corrigen: con 2-3 letras casi todo está a distancia 1
+SPELL_MIN_LENGTH = 4
+SPELL_MEMO_SIZE = 50_000
+
+
+class SpellingIndex:
+    """
+    Corrector ortográfico por borrado simétrico (estilo SymSpell).
+
+    Al construirlo se generan todas las variantes de cada palabra del
+    diccionario con hasta `max_distance` letras borradas. Para corregir una
+    palabra se generan sus propios borrados y se buscan en esa tabla: los
+    candidatos salen de búsquedas en un dict (O(1) esperado) y solo se
+    verifica la distancia real (Damerau-Levenshtein restringida) de esos
+    pocos candidatos.
+
+    `known` son palabras que nunca se corrigen (stopwords, negaciones...)
+    pero que no son destino de corrección.
+
+    La tabla de borrados puede exportarse (to_arrays) y cargarse desde un
+    artefacto mapeado en memoria (from_arrays); en ese caso se consulta con
+    búsqueda binaria sobre las variantes ordenadas en vez de con un dict.
+    """
+
+    def __init__(self, words: Iterable[str], max_distance: int = SPELL_MAX_DISTANCE,
+                 known: Iterable[str] = (), min_length: int = SPELL_MIN_LENGTH):
+        self.max_distance = max(0, max_distance)
+        self.min_length = min_length
+        # palabra -> orden de inserción (desempata candidatos a igual distancia)
+        self.words: Dict[str, int] = {}
+        for word in words:
+            self.words.setdefault(word, len(self.words))
+        self.known: Set[str] = set(self.words) | set(known)
+        self._deletes: Optional[Dict[str, List[str]]] = {}
+        self._arrays: Optional[Dict[str, np.ndarray]] = None
+        self._word_list = list(self.words)
+        # Correcciones ya resueltas (el texto de los usuarios se repite mucho)
+        self._memo: Dict[str, str] = {}
+        if self.max_distance:
+            for word in self.words:
+                for variant in _deletes(word, self.max_distance):
+                    self._deletes.setdefault(variant, []).append(word)
+
+    @classmethod
+    def from_arrays(cls, arrays: Dict[str, np.ndarray], known: Iterable[str] = (),
+                    min_length: int = SPELL_MIN_LENGTH) -> "SpellingIndex":
+        """Corrector sobre la tabla de borrados exportada con to_arrays()."""
+        speller = cls(arrays["spell.words"].tolist(), max_distance=0, known=known, min_length=min_length)
+        speller.max_distance = int(arrays["spell.max_distance"][0])
+        speller._deletes = None
+        speller._arrays = arrays
+        return speller
+
+    def to_arrays(self) -> Dict[str, np.ndarray]:
+        """Tabla de borrados como arrays: variantes ordenadas + ids de palabra (estilo CSR)."""
+        variants = sorted(self._deletes or {})
+        ids = [self.words[w] for v in variants for w in self._deletes[v]]
+        indptr = np.cumsum([0] + [len(self._deletes[v]) for v in variants])
+        return {
+            "spell.words": np.array(self._word_list, dtype=str),
+            "spell.max_distance": np.asarray([self.max_distance], dtype=np.int64),
+            "spell.variants": np.array(variants, dtype=str),
+            "spell.indptr": np.asarray(indptr, dtype=np.int64),
+            "spell.word_ids": np.asarray(ids, dtype=np.int64),
+        }
+
+    def _candidates(self, variants: Set[str]) -> Iterable[str]:
+        if self._deletes is not None:
+            for variant in variants:
+                yield from self._deletes.get(variant, ())
+            return
+        keys = self._arrays["spell.variants"]
+        if not len(keys):
+            return
+        query = np.array(sorted(variants))
+        pos = np.searchsorted(keys, query)
+        pos[pos == len(keys)] = 0
+        indptr, word_ids = self._arrays["spell.indptr"], self._arrays["spell.word_ids"]
+        for p in pos[keys[pos] == query]:
+            for i in word_ids[indptr[p]:indptr[p + 1]]:
+                yield self._word_list[i]
+
+    def __len__(self) -> int:
+        return len(self.words)
+
+    def _distance_for(self, word: str) -> int:
+        """Distancia permitida según la longitud: 1 hasta 7 letras, 2 a partir de 8."""
+        if len(word) < self.min_length:
+            return 0
+        return min(self.max_distance, max(1, len(word) // 4))
+
+    def correct(self, word: str) -> str:
+        """Palabra del diccionario más cercana, o la propia palabra si no hay ninguna."""
+        if word in self.known:
+            return word
+        corrected = self._memo.get(word)
+        if corrected is None:
+            corrected = self._lookup(word)
+            if len(self._memo) >= SPELL_MEMO_SIZE:
+                self._memo.clear()
+            self._memo[word] = corrected
+        return corrected
+
+    def _lookup(self, word: str) -> str:
+        limit = self._distance_for(word)
+        if not limit:
+            return word
+        best: Optional[str] = None
+        best_key = None
+        for candidate in self._candidates(_deletes(word, limit)):
+            if abs(len(candidate) - len(word)) > limit:
+                continue
+            distance = _osa_distance(word, candidate, limit)
+            if distance > limit:
+                continue
+            key = (distance, self.words[candidate])
+            if best_key is None or key < best_key:
+                best, best_key = candidate, key
+        return best if best is not None else word
+
+
+def _deletes(word: str, max_distance: int) -> Set[str]:
+    """La palabra y todas sus variantes con hasta max_distance letras borradas."""
+    result = {word}
+    frontier = {word}
+    for _ in range(max_distance):
+        next_frontier = set()
+        for w in frontier:
+            for i in range(len(w)):
+                next_frontier.add(w[:i] + w[i + 1:])
+        next_frontier -= result
+        result |= next_frontier
+        frontier = next_frontier
+    return result
+
+
+def _osa_distance(a: str, b: str, limit: int) -> int:
+    """
+    Distancia de Damerau-Levenshtein restringida (inserción, borrado,
+    sustitución y transposición de letras contiguas). Devuelve limit + 1 en
+    cuanto una fila entera supera el límite.
+    """
+    if a == b:
+        return 0
+    prev2: List[int] = []
+    prev = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        cur = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            cur[j] = min(prev[j] + 1, cur[j - 1] + 1, prev[j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                cur[j] = min(cur[j], prev2[j - 2] + 1)
+        if min(cur) > limit:
+            return limit + 1
+        prev2, prev = prev, cur
+    return prev[-1]
@@ -0,0 +1,223 @@
+from typing import Dict, Iterable, List, Tuple
+
+import numpy as np
+from scipy.sparse import csr_matrix
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.preprocessing import normalize
+
+from .kb_artifacts import csr_from_arrays, csr_to_arrays
+
+# A partir de este tamaño de vocabulario se usa la búsqueda con poda por
+# fragmento; por debajo, un único producto disperso para todo el lote es
+# más barato que el bucle Python.
+PRUNE_MIN_TERMS = 50_000
+# N-gramas más raros de la consulta que se puntúan primero para fijar el umbral de poda
+SEED_GRAMS = 3
+SEED_MAX_POSTINGS = 512
+
+
+class NgramIndex:
+    """
+    Índice invertido de n-gramas de caracteres (char_wb) sobre una lista de términos.
+
+    `postings` es la matriz (n-gramas x términos) en CSR: la fila de cada
+    n-grama es su lista de términos con el peso TF-IDF normalizado. Una
+    consulta solo puntúa los términos que comparten algún n-grama con ella.
+
+    Con vocabularios grandes se podan además los n-gramas más frecuentes de
+    la consulta (estilo MaxScore): primero se puntúan los candidatos de los
+    n-gramas más raros para fijar theta = max(umbral, k-ésima mejor
+    puntuación); después, mientras la suma de peso_consulta x
+    peso_máximo_en_la_lista de los n-gramas frecuentes sea menor que theta,
+    un término que solo comparta esos n-gramas no puede entrar en el top-k,
+    así que no se recorren sus listas y el resultado sigue siendo exacto.
+    """
+
+    def __init__(self, terms: Iterable[str], ngram_range: Tuple[int, int] = (2, 4)):
+        self.terms: List[str] = list(terms)
+        self.vectorizer = TfidfVectorizer(analyzer='char_wb', ngram_range=ngram_range, norm=None)
+        # Filas de términos normalizadas L2: producto punto == similitud de coseno
+        term_matrix = normalize(self.vectorizer.fit_transform(self.terms)).tocsr()
+        postings = term_matrix.T.tocsr()
+        postings.sort_indices()  # listas ordenadas por id (búsqueda binaria)
+        # Peso máximo de cada n-grama en su lista (cota superior de su aporte)
+        posting_lengths = np.diff(postings.indptr)
+        posting_max = np.zeros(postings.shape[0])
+        nonempty = posting_lengths > 0
+        if nonempty.any():
+            posting_max[nonempty] = np.maximum.reduceat(postings.data, postings.indptr[:-1][nonempty])
+        self._set_matrices(term_matrix, postings, posting_max)
+
+    @classmethod
+    def from_arrays(cls, terms: Iterable[str], arrays: Dict[str, np.ndarray]) -> "NgramIndex":
+        """Índice ya ajustado a partir de los arrays de to_arrays() (sin volver a ajustar)."""
+        index = cls.__new__(cls)
+        index.terms = list(terms)
+        vocabulary = {gram: i for i, gram in enumerate(arrays["ngram.vocabulary"].tolist())}
+        ngram_range = tuple(int(n) for n in arrays["ngram.range"])
+        index.vectorizer = TfidfVectorizer(analyzer='char_wb', ngram_range=ngram_range, norm=None,
+                                           vocabulary=vocabulary)
+        index.vectorizer.idf_ = np.asarray(arrays["ngram.idf"])
+        term_matrix = csr_from_arrays(arrays, "ngram.term_matrix")
+        if term_matrix.shape[0] != len(index.terms):
+            raise ValueError("Los arrays no corresponden a estos términos")
+        index._set_matrices(term_matrix, csr_from_arrays(arrays, "ngram.postings"), arrays["ngram.posting_max"])
+        return index
+
+    def to_arrays(self) -> Dict[str, np.ndarray]:
+        """Estado ajustado del índice como arrays planos (vocabulario, IDF y matrices)."""
+        vocabulary = sorted(self._vocabulary, key=self._vocabulary.get)
+        arrays = {
+            "ngram.vocabulary": np.array(vocabulary, dtype=str),
+            "ngram.range": np.asarray(self.vectorizer.ngram_range, dtype=np.int64),
+            "ngram.idf": self.vectorizer.idf_,
+            "ngram.posting_max": self.posting_max,
+        }
+        arrays.update(csr_to_arrays("ngram.term_matrix", self.term_matrix))
+        arrays.update(csr_to_arrays("ngram.postings", self.postings))
+        return arrays
+
+    def _set_matrices(self, term_matrix: csr_matrix, postings: csr_matrix, posting_max: np.ndarray) -> None:
+        self.term_matrix = term_matrix
+        self.postings = postings
+        self.posting_lengths = np.diff(self.postings.indptr)
+        self.posting_max = posting_max
+        self._analyzer = self.vectorizer.build_analyzer()
+        self._vocabulary = self.vectorizer.vocabulary_
+        # IDF que tendría un n-grama visto solo en el texto de la consulta (df=1)
+        self._oov_idf = float(np.log((len(self.terms) + 2) / 2.0) + 1.0)
+
+    def __len__(self) -> int:
+        return len(self.terms)
+
+    def transform(self, fragments: List[str]) -> csr_matrix:
+        """
+        Vectoriza los fragmentos y los normaliza contando también los n-gramas
+        que no están en el vocabulario; si no, una sola coincidencia parcial
+        ("xyz" -> "yz") tendría similitud inflada.
+        """
+        query_vectors = self.vectorizer.transform(fragments)
+        oov_mass = np.zeros(len(fragments))
+        for i, fragment in enumerate(fragments):
+            counts: Dict[str, int] = {}
+            for gram in self._analyzer(fragment):
+                if gram not in self._vocabulary:
+                    counts[gram] = counts.get(gram, 0) + 1
+            oov_mass[i] = sum(c * c for c in counts.values())
+
+        sq_norms = np.asarray(query_vectors.multiply(query_vectors).sum(axis=1)).ravel()
+        norms = np.sqrt(sq_norms + oov_mass * self._oov_idf ** 2)
+        norms[norms == 0] = 1.0
+        return csr_matrix(query_vectors.multiply(1.0 / norms[:, None]))
+
+    def similarities(self, fragments: List[str]) -> np.ndarray:
+        """Matriz densa (fragmentos x términos) de similitud de coseno."""
+        return (self.transform(fragments) @ self.postings).toarray()
+
+    def search(self, fragments: List[str], top_k: int = 2, threshold: float = 0.15) -> List[List[Tuple[int, float]]]:
+        """
+        Para cada fragmento, hasta top_k pares (id de término, similitud) con
+        similitud >= threshold, de mayor a menor (a igualdad, id menor primero).
+        """
+        if not self.terms or not fragments:
+            return [[] for _ in fragments]
+
+        queries = self.transform(fragments)
+        if len(self.terms) < PRUNE_MIN_TERMS or threshold <= 0:
+            scores = (queries @ self.postings).tocsr()
+            return [
+                _top_k(scores.indices[scores.indptr[i]:scores.indptr[i + 1]],
+                       scores.data[scores.indptr[i]:scores.indptr[i + 1]],
+                       top_k, threshold)
+                for i in range(len(fragments))
+            ]
+        return [self._search_pruned(queries, i, top_k, threshold) for i in range(len(fragments))]
+
+    def _search_pruned(self, queries: csr_matrix, row: int, top_k: int, threshold: float) -> List[Tuple[int, float]]:
+        start, end = queries.indptr[row], queries.indptr[row + 1]
+        grams, weights = queries.indices[start:end], queries.data[start:end]
+        if len(grams) == 0:
+            return []
+        query = queries[row]
+
+        # N-gramas de la consulta de más a menos frecuentes, con la cota
+        # acumulada de lo que pueden aportar a cualquier término.
+        order = np.argsort(-self.posting_lengths[grams], kind="stable")
+        grams, weights = grams[order], weights[order]
+        bounds = np.cumsum(weights * self.posting_max[grams])
+
+        # Ni sumando el aporte máximo de todos sus n-gramas llega al umbral
+        if bounds[-1] < threshold - 1e-9:
+            return []
+
+        # 1. Semilla con los n-gramas más raros (listas cortas): sus mejores
+        #    puntuaciones exactas suben el umbral efectivo (theta) para la poda.
+        theta = threshold
+        seed_grams = grams[-SEED_GRAMS:]
+        seed_grams = seed_grams[self.posting_lengths[seed_grams] <= SEED_MAX_POSTINGS]
+        seed = self._candidates(seed_grams)
+        if len(seed) >= top_k:
+            seed_scores = self._scores(seed, query)
+            theta = max(theta, float(np.partition(seed_scores, -top_k)[-top_k]))
+
+        # 2. Los n-gramas frecuentes cuyo aporte máximo acumulado no llega a
+        #    theta no generan candidatos (margen mínimo para el redondeo).
+        n_skip = int(np.searchsorted(bounds, theta - 1e-9, side="left"))
+        essential = range(n_skip, len(grams))
+        if not essential:
+            return []
+
+        # 3. Puntuación parcial con las listas de los n-gramas esenciales.
+        indptr, indices, data = self.postings.indptr, self.postings.indices, self.postings.data
+        ids = np.concatenate([indices[indptr[grams[j]]:indptr[grams[j] + 1]] for j in essential])
+        contrib = np.concatenate([data[indptr[grams[j]]:indptr[grams[j] + 1]] * weights[j] for j in essential])
+        if len(ids) * 16 > len(self.terms):
+            # Muchas coincidencias: acumular sobre un vector denso es más barato que ordenar
+            dense = np.bincount(ids, weights=contrib, minlength=len(self.terms))
+            candidates = np.flatnonzero(dense)
+            scores = dense[candidates]
+        else:
+            candidates, inverse = np.unique(ids, return_inverse=True)
+            scores = np.bincount(inverse, weights=contrib)
+
+        # 4. Se completan las puntuaciones con los n-gramas podados, del menos
+        #    al más frecuente, descartando en cada paso a los candidatos que ni
+        #    con la cota restante llegan a theta. Al final son exactas.
+        for j in range(n_skip - 1, -1, -1):
+            alive = scores + bounds[j] >= theta - 1e-9
+            candidates, scores = candidates[alive], scores[alive]
+            if len(candidates) == 0:
+                return []
+            plist = indices[indptr[grams[j]]:indptr[grams[j] + 1]]
+            pos = np.searchsorted(plist, candidates)
+            pos[pos == len(plist)] = 0
+            hit = plist[pos] == candidates if len(plist) else np.zeros(len(candidates), dtype=bool)
+            scores[hit] += weights[j] * data[indptr[grams[j]] + pos[hit]]
+
+        return _top_k(candidates, scores, top_k, threshold)
+
+    def _candidates(self, grams: np.ndarray) -> np.ndarray:
+        """Unión de las listas invertidas de los n-gramas dados."""
+        indptr, indices = self.postings.indptr, self.postings.indices
+        lists = [indices[indptr[g]:indptr[g + 1]] for g in grams]
+        if not lists:
+            return np.empty(0, dtype=indices.dtype)
+        return np.unique(np.concatenate(lists))
+
+    def _scores(self, candidates: np.ndarray, query: csr_matrix) -> np.ndarray:
+        """Similitud exacta de coseno entre la consulta y los términos candidatos."""
+        dense_query = np.zeros(self.term_matrix.shape[1])
+        dense_query[query.indices] = query.data
+        return self.term_matrix[candidates] @ dense_query
+
+
+def _top_k(ids: np.ndarray, scores: np.ndarray, k: int, threshold: float) -> List[Tuple[int, float]]:
+    """Top-k por argpartition entre los candidatos que superan el umbral."""
+    keep = scores >= threshold
+    ids, scores = ids[keep], scores[keep]
+    if len(ids) > k:
+        cutoff = scores[np.argpartition(-scores, k - 1)[:k]].min()
+        keep = scores >= cutoff
+        ids, scores = ids[keep], scores[keep]
+    order = np.lexsort((ids, -scores))[:k]
+    return [(int(ids[i]), float(scores[i])) for i in order]
@@ -0,0 +1,132 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Dict, NamedTuple, Optional, Set, Tuple
+
+# Segundos que se reutiliza un token ya verificado sin consultar la base
+USER_CACHE_TTL_S = float(os.getenv("AUTH_USER_CACHE_TTL_S", "60"))
+# Tokens cacheados a la vez (por proceso); 0 desactiva la caché
+USER_CACHE_MAX = int(os.getenv("AUTH_USER_CACHE_MAX", "10000"))
+
+
+class CachedUser(NamedTuple):
+    """Identidad ligera del usuario autenticado (lo que leen las rutas, sin sesión ORM)."""
+    id: int
+    email: str
+    full_name: Optional[str]
+    created_at: Optional[datetime]
+
+
+class UserCache:
+    """
+    Caché token verificado -> CachedUser, acotada por TTL y por número.
+
+    Una entrada caduca a los `ttl` segundos o al expirar el JWT, lo que
+    llegue antes. Las rutas que modifican un usuario (perfil, contraseña,
+    bloqueo) llaman a invalidate_user para descartar todos sus tokens.
+
+    `generation` sirve para no guardar una identidad leída de la base antes
+    de una invalidación concurrente: se toma antes de la consulta y put()
+    descarta el valor si entretanto se invalidó algún usuario.
+
+    La caché es por proceso: con varios workers, un cambio hecho en otro
+    proceso se ve aquí como mucho `ttl` segundos después.
+    """
+
+    def __init__(self, ttl: float = USER_CACHE_TTL_S, maxsize: int = USER_CACHE_MAX):
+        self.ttl = ttl
+        self.maxsize = max(0, maxsize)
+        self._entries: "OrderedDict[str, Tuple[CachedUser, float]]" = OrderedDict()
+        self._tokens: Dict[int, Set[str]] = {}
+        self._lock = threading.Lock()
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, token: str) -> Optional[CachedUser]:
+        with self._lock:
+            entry = self._entries.get(token)
+            if entry is None:
+                self.misses += 1
+                return None
+            user, expires_at = entry
+            if expires_at <= time.monotonic():
+                self._drop(token)
+                self.expired += 1
+                self.misses += 1
+                return None
+            self._entries.move_to_end(token)
+            self.hits += 1
+            return user
+
+    def put(self, token: str, user: CachedUser, token_exp: Optional[float] = None,
+            generation: Optional[int] = None) -> None:
+        """`token_exp`: claim exp del JWT (epoch); `generation`: la leída antes de consultar la base."""
+        if self.maxsize == 0 or self.ttl <= 0:
+            return
+        expires_at = time.monotonic() + self.ttl
+        if token_exp is not None:
+            expires_at = min(expires_at, time.monotonic() + token_exp - time.time())
+        with self._lock:
+            if generation is not None and generation != self.generation:
+                return
+            self._drop(token)
+            self._entries[token] = (user, expires_at)
+            self._tokens.setdefault(user.id, set()).add(token)
+            while len(self._entries) > self.maxsize:
+                self._drop(next(iter(self._entries)))
+                self.evictions += 1
+
+    def invalidate_user(self, user_id: int) -> None:
+        with self._lock:
+            self.generation += 1
+            self.invalidations += 1
+            for token in self._tokens.pop(user_id, ()):
+                self._entries.pop(token, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self.generation += 1
+            self._entries.clear()
+            self._tokens.clear()
+
+    def _drop(self, token: str) -> None:
+        entry = self._entries.pop(token, None)
+        if entry is None:
+            return
+        tokens = self._tokens.get(entry[0].id)
+        if tokens is not None:
+            tokens.discard(token)
+            if not tokens:
+                del self._tokens[entry[0].id]
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "users": len(self._tokens),
+                "maxsize": self.maxsize,
+                "ttl_s": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+                "expired": self.expired,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
+
+
+_CACHE = UserCache()
+
+
+def get_user_cache() -> UserCache:
+    return _CACHE
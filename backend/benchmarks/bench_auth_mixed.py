@@ -0,0 +1,119 @@
+"""
+Benchmark: carga mixta de logins (bcrypt) y diagnósticos contra la API.
+
+Durante `segundos` segundos, `logins` clientes hacen POST /token sin
+parar mientras `diagnósticos` clientes llaman a POST /diagnose. Compara:
+
+- solo-diagnose: sin logins (referencia de latencia).
+- threadpool: bcrypt en el threadpool compartido del servidor (como antes).
+- dedicado: bcrypt en el pool propio de auth (AUTH_HASH_WORKERS hilos,
+  AUTH_HASH_MAX_PENDING en cola; el exceso recibe 503).
+
+Uso (desde la carpeta backend):
+    python benchmarks/bench_auth_mixed.py [logins] [diagnósticos] [segundos] [bcrypt_rounds]
+"""
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+_tmp = tempfile.TemporaryDirectory()
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_tmp.name, 'bench.db')}"
+os.environ["AUTH_BCRYPT_ROUNDS"] = sys.argv[4] if len(sys.argv) > 4 else "10"
+
+# Add the parent directory to sys.path to import app modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+from starlette.concurrency import run_in_threadpool
+
+from app.main import app
+from app.services import password_hasher
+
+USERS = 20
+SYMPTOMS = ["fiebre alta y tos seca", "dolor de cabeza, náuseas", "me duele la garganta"]
+
+
+class _SharedThreadpool:
+    """bcrypt en el threadpool de Starlette, sin límite propio (comportamiento anterior)."""
+
+    async def run(self, fn, *args):
+        return await run_in_threadpool(fn, *args)
+
+    def stats(self):
+        return {}
+
+
+def _percentile(values, p):
+    values = sorted(values)
+    return values[max(0, int(len(values) * p) - 1)] * 1000 if values else 0.0
+
+
+async def _load(client, token, logins, diagnoses, seconds):
+    deadline = time.perf_counter() + seconds
+    counts = {"logins": 0, "rejected": 0}
+    latencies = []
+
+    async def login_client(i):
+        email = f"u{i % USERS}@example.com"
+        while time.perf_counter() < deadline:
+            r = await client.post("/token", data={"username": email, "password": "secreta"})
+            if r.status_code == 503:
+                counts["rejected"] += 1
+                await asyncio.sleep(float(r.headers.get("Retry-After", "1")) / 10)
+            else:
+                r.raise_for_status()
+                counts["logins"] += 1
+
+    async def diagnose_client(i):
+        headers = {"Authorization": f"Bearer {token}"}
+        n = i
+        while time.perf_counter() < deadline:
+            t0 = time.perf_counter()
+            r = await client.post("/diagnose", json={"symptoms": [SYMPTOMS[n % len(SYMPTOMS)]]}, headers=headers)
+            r.raise_for_status()
+            latencies.append(time.perf_counter() - t0)
+            n += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*[login_client(i) for i in range(logins)],
+                         *[diagnose_client(i) for i in range(diagnoses)])
+    elapsed = time.perf_counter() - start
+    return counts["logins"] / elapsed, counts["rejected"], len(latencies) / elapsed, latencies
+
+
+async def _run(logins, diagnoses, seconds):
+    async with app.router.lifespan_context(app):
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=60) as client:
+            for i in range(USERS):
+                r = await client.post("/register", json={"email": f"u{i}@example.com", "password": "secreta",
+                                                         "full_name": f"U{i}"})
+                r.raise_for_status()
+            r = await client.post("/token", data={"username": "u0@example.com", "password": "secreta"})
+            token = r.json()["access_token"]
+
+            dedicated = password_hasher.get_hasher()
+            print(f"{'modo':>14} {'logins/s':>9} {'503':>6} {'diag/s':>7} {'diag p50 (ms)':>14} {'diag p95 (ms)':>14}")
+            for mode in ("solo-diagnose", "threadpool", "dedicado"):
+                password_hasher._HASHER = _SharedThreadpool() if mode == "threadpool" else dedicated
+                rps, rejected, dps, latencies = await _load(
+                    client, token, 0 if mode == "solo-diagnose" else logins, diagnoses, seconds)
+                print(f"{mode:>14} {rps:>9.1f} {rejected:>6} {dps:>7.1f} "
+                      f"{_percentile(latencies, 0.5):>14.1f} {_percentile(latencies, 0.95):>14.1f}")
+            password_hasher._HASHER = dedicated
+
+
+def main():
+    logins = int(sys.argv[1]) if len(sys.argv) > 1 else 64
+    diagnoses = int(sys.argv[2]) if len(sys.argv) > 2 else 8
+    seconds = float(sys.argv[3]) if len(sys.argv) > 3 else 5.0
+    print(f"logins={logins} diagnósticos={diagnoses} segundos={seconds:g} "
+          f"bcrypt_rounds={os.environ['AUTH_BCRYPT_ROUNDS']} hilos_bcrypt={password_hasher.HASH_WORKERS} "
+          f"cola_bcrypt={password_hasher.HASH_MAX_PENDING}")
+    asyncio.run(_run(logins, diagnoses, seconds))
+
+
+if __name__ == "__main__":
+    main()
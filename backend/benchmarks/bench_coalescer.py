@@ -0,0 +1,70 @@
+"""
+Benchmark: /diagnose concurrente con y sin micro-batching (DiagnosisCoalescer).
+
+Lanza N hilos que piden diagnósticos sin pausa, como el threadpool de
+FastAPI bajo carga, y mide throughput y latencia por petición.
+
+Uso (desde la carpeta backend):
+    python benchmarks/bench_coalescer.py [hilos] [peticiones_por_hilo]
+"""
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# Add the parent directory to sys.path to import app modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services import ai_stub
+from app.services.coalescer import DiagnosisCoalescer
+
+SCENARIOS = [
+    ["fiebre", "tos"],
+    ["me duele la cabeza y me molesta la luz"],
+    ["diarrea, vomitos"],
+    ["dolor de garganta", "estornudos"],
+]
+
+
+def _run(fn, threads, per_thread):
+    latencies = []
+
+    def worker(t):
+        local = []
+        for i in range(per_thread):
+            start = time.perf_counter()
+            fn(SCENARIOS[(t + i) % len(SCENARIOS)])
+            local.append(time.perf_counter() - start)
+        return local
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        for local in pool.map(worker, range(threads)):
+            latencies.extend(local)
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    return len(latencies) / elapsed, latencies[len(latencies) // 2] * 1000, latencies[int(len(latencies) * 0.99)] * 1000
+
+
+def main(threads: int = 32, per_thread: int = 50):
+    ai_stub.warm_up()
+    print(f"{threads} hilos x {per_thread} peticiones")
+
+    rps, p50, p99 = _run(ai_stub.suggest_diagnoses, threads, per_thread)
+    print(f"directo     : {rps:8.0f} req/s  p50 {p50:6.2f} ms  p99 {p99:6.2f} ms")
+
+    for window_ms in (1.0, 2.0, 5.0):
+        coalescer = DiagnosisCoalescer(window_ms=window_ms, max_batch=64)
+        coalescer.start()
+        try:
+            rps, p50, p99 = _run(coalescer.diagnose, threads, per_thread)
+        finally:
+            coalescer.stop()
+        stats = coalescer.stats()
+        print(f"coalesce {window_ms:3.0f}ms: {rps:8.0f} req/s  p50 {p50:6.2f} ms  p99 {p99:6.2f} ms"
+              f"  lote medio {stats['avg_batch_size']:5.1f}  espera media {stats['queue_delay_avg_ms']:.2f} ms")
+
+
+if __name__ == "__main__":
+    args = [int(a) for a in sys.argv[1:3]]
+    main(*args)
@@ -0,0 +1,153 @@
+"""
+Benchmark: acceso a la base de datos desde la API en tres modos, con
+peticiones /history concurrentes (throughput y latencia p95):
+
+- sync en async def: sesión síncrona dentro de una ruta async (el patrón
+  que tenía get_current_user: cada consulta bloquea el event loop).
+- sync + threadpool: rutas `def` con sesión síncrona (threadpool de Starlette).
+- async: AsyncSession con driver asíncrono (aiosqlite), como la API ahora.
+
+SQLite local no tiene latencia de red; para simular la de MySQL cada
+petición ejecuta antes `SELECT sleep_ms(N)`, una función registrada en la
+conexión que bloquea el hilo del driver N milisegundos.
+
+Uso (desde la carpeta backend):
+    python benchmarks/bench_db_async.py [concurrencia] [peticiones] [latencia_ms]
+"""
+import asyncio
+import os
+import sys
+import tempfile
+import time
+
+# Add the parent directory to sys.path to import app modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+from fastapi import Depends, FastAPI
+from sqlalchemy import create_engine, event, func, insert, select
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+from app import models
+from app.database import Base, async_url
+
+USERS = 50
+ROWS_PER_USER = 20
+
+
+def _seed(url):
+    engine = create_engine(url)
+    Base.metadata.create_all(engine)
+    with engine.begin() as conn:
+        conn.execute(insert(models.User), [
+            {"id": u, "email": f"u{u}@example.com", "password_hash": "x", "full_name": f"U{u}"}
+            for u in range(1, USERS + 1)
+        ])
+        conn.execute(insert(models.History), [
+            {"user_id": u, "symptoms": "fiebre, tos", "diagnosis_result": "[]"}
+            for u in range(1, USERS + 1) for _ in range(ROWS_PER_USER)
+        ])
+    engine.dispose()
+
+
+def _query(user_id):
+    return (select(models.History).where(models.History.user_id == user_id)
+            .order_by(models.History.created_at.desc()))
+
+
+def _register_sleep(engine, latency_ms):
+    def on_connect(dbapi_connection, _record):
+        dbapi_connection.create_function("sleep_ms", 1, lambda ms: time.sleep(ms / 1000) or 0)
+
+    event.listen(engine, "connect", on_connect)
+
+
+def _format(records):
+    return [{"id": r.id, "date": r.created_at.isoformat(), "symptoms": r.symptoms.split(", ")} for r in records]
+
+
+def _build_app(mode, url, latency_ms):
+    app = FastAPI()
+
+    if mode == "async":
+        engine = create_async_engine(async_url(url), poolclass=AsyncAdaptedQueuePool,
+                                     pool_size=40, max_overflow=0)
+        _register_sleep(engine.sync_engine, latency_ms)
+        sessions = async_sessionmaker(engine, expire_on_commit=False)
+
+        async def get_db():
+            async with sessions() as db:
+                yield db
+
+        @app.get("/history/{user_id}")
+        async def history(user_id: int, db=Depends(get_db)):
+            await db.execute(select(func.sleep_ms(latency_ms)))
+            return _format((await db.scalars(_query(user_id))).all())
+    else:
+        engine = create_engine(url, pool_size=40, max_overflow=0)
+        _register_sleep(engine, latency_ms)
+        sessions = sessionmaker(bind=engine)
+
+        def get_db():
+            db = sessions()
+            try:
+                yield db
+            finally:
+                db.close()
+
+        if mode == "sync-async-def":
+            @app.get("/history/{user_id}")
+            async def history(user_id: int, db=Depends(get_db)):
+                db.execute(select(func.sleep_ms(latency_ms)))
+                return _format(db.scalars(_query(user_id)).all())
+        else:
+            @app.get("/history/{user_id}")
+            def history(user_id: int, db=Depends(get_db)):
+                db.execute(select(func.sleep_ms(latency_ms)))
+                return _format(db.scalars(_query(user_id)).all())
+    return app, engine
+
+
+async def _run(app, concurrency, requests):
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        await client.get("/history/1")
+        latencies = []
+
+        async def worker(w):
+            for i in range(w, requests, concurrency):
+                t0 = time.perf_counter()
+                r = await client.get(f"/history/{i % USERS + 1}")
+                r.raise_for_status()
+                latencies.append(time.perf_counter() - t0)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker(w) for w in range(concurrency)))
+        elapsed = time.perf_counter() - start
+    latencies.sort()
+    return requests / elapsed, latencies[int(len(latencies) * 0.95) - 1] * 1000
+
+
+def main():
+    concurrency = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    requests = int(sys.argv[2]) if len(sys.argv) > 2 else 1000
+    latency_ms = float(sys.argv[3]) if len(sys.argv) > 3 else 5.0
+    with tempfile.TemporaryDirectory() as tmp:
+        url = f"sqlite:///{os.path.join(tmp, 'bench.db')}"
+        _seed(url)
+        print(f"concurrencia={concurrency} peticiones={requests} filas/usuario={ROWS_PER_USER} latencia={latency_ms:g} ms")
+        print(f"{'modo':>16} {'req/s':>8} {'p95 (ms)':>9}")
+        for mode in ("sync-async-def", "sync-threadpool", "async"):
+            app, engine = _build_app(mode, url, latency_ms)
+            rps, p95 = asyncio.run(_run(app, concurrency, requests))
+            if mode == "async":
+                asyncio.run(engine.dispose())
+            else:
+                engine.dispose()
+            print(f"{mode:>16} {rps:>8.0f} {p95:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""
+Benchmark: cuestionario guiado paso a paso. Compara reenviar la lista
+completa en cada respuesta (re-dividir, normalizar, vectorizar y puntuar
+todo) frente a una sesión que solo procesa el síntoma añadido o quitado.
+Las cachés se vacían antes de cada flujo para simular usuarios distintos.
+
+Uso (desde la carpeta backend):
+    python benchmarks/bench_diagnosis_session.py
+"""
+import os
+import sys
+import time
+
+# Add the parent directory to sys.path to import app modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_kb_artifacts import _synthetic_source
+from app.services import ai_stub
+from app.services.diagnosis_session import DiagnosisSession
+
+# Respuestas del cuestionario: (+) añade, (-) quita
+STEPS = [("+", "fiebre"), ("+", "tos persistente"), ("+", "dolor de cabeza intenso"),
+         ("+", "dificultad para respirar"), ("-", "tos persistente"), ("+", "me duele la garganta"),
+         ("+", "congestion nasal"), ("+", "cansancio y malestar general"), ("-", "fiebre"),
+         ("+", "escalofrios")]
+FLOWS = 50
+
+
+def _clear_caches():
+    ai_stub.FRAGMENT_CACHE.clear()
+    ai_stub.RESULT_CACHE.clear()
+
+
+def _repost_flow():
+    current = []
+    for op, text in STEPS:
+        if op == "+":
+            current.append(text)
+        else:
+            current.remove(text)
+        ai_stub.suggest_diagnoses(current)
+
+
+def _session_flow():
+    session = DiagnosisSession(user_id=1)
+    for op, text in STEPS:
+        if op == "+":
+            session.add(text)
+        else:
+            session.remove(text)
+        session.diagnoses()
+
+
+def _time(flow):
+    total = 0.0
+    for _ in range(FLOWS):
+        _clear_caches()
+        start = time.perf_counter()
+        flow()
+        total += time.perf_counter() - start
+    return total / (FLOWS * len(STEPS)) * 1000
+
+
+def main():
+    print(f"{'síntomas':>10} {'reenvío (ms/paso)':>18} {'sesión (ms/paso)':>17} {'x':>6}")
+    for n_symptoms in (0, 10_000):
+        ai_stub._publish(ai_stub.load_index(_synthetic_source(n_symptoms), None))
+        _repost_flow()
+        _session_flow()
+        repost_ms = _time(_repost_flow)
+        session_ms = _time(_session_flow)
+        print(f"{n_symptoms:>10} {repost_ms:>18.3f} {session_ms:>17.3f} {repost_ms / session_ms:>6.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+"""
+Benchmark: servir un historial de 5k filas (una sola página) desde SQLite.
+
+- anterior: json.loads de cada diagnosis_result, split de los síntomas,
+  dicts intermedios y codificación de FastAPI (jsonable_encoder + JSON).
+- pre-serializado: el JSON guardado de cada fila se copia tal cual en el
+  cuerpo de la respuesta (history_db.page_json).
+
+Uso (desde la carpeta backend):
+    python benchmarks/bench_history_render.py [filas] [repeticiones]
+"""
+import asyncio
+import json
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+# Add the parent directory to sys.path to import app modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from sqlalchemy import insert, select
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from app import models
+from app.database import Base
+from app.schemas import Diagnosis
+from app.services import history_db
+
+DIAGNOSES = [
+    Diagnosis(condition=f"Condición {i}", confidence=0.3 - i * 0.05,
+              recommendation="Reposo, hidratación y consulte al médico si empeora.")
+    for i in range(3)
+]
+
+
+async def _seed(sessions, rows):
+    start = datetime(2024, 1, 1)
+    async with sessions() as db:
+        db.add(models.User(id=1, email="ana@example.com", password_hash="x"))
+        await db.flush()
+        batch = []
+        for i in range(rows):
+            row = history_db.history_row(1, ["fiebre alta", "tos seca", "dolor de cabeza"], DIAGNOSES)
+            row["created_at"] = start + timedelta(minutes=i)
+            batch.append(row)
+        await db.execute(insert(models.History), batch)
+        await db.commit()
+
+
+async def _previous(db, rows):
+    """Camino anterior: ORM completo + parseo por fila + codificación de FastAPI."""
+    records = (await db.scalars(
+        select(models.History).where(models.History.user_id == 1).order_by(models.History.created_at.desc())
+    )).all()
+    result = []
+    for r in records:
+        try:
+            dx = json.loads(r.diagnosis_result)
+        except Exception:
+            dx = []
+        result.append({"id": r.id, "date": r.created_at.isoformat(),
+                       "symptoms": json.loads(r.symptoms), "diagnoses": dx})
+    return JSONResponse(jsonable_encoder(result)).body
+
+
+async def _preserialized(db, rows):
+    page, cursor = await history_db.fetch_page(db, 1, limit=rows)
+    return history_db.page_json(page, cursor)
+
+
+async def _time(sessions, fn, rows, repeat):
+    async with sessions() as db:
+        body = await fn(db, rows)
+        start = time.perf_counter()
+        for _ in range(repeat):
+            await fn(db, rows)
+        return (time.perf_counter() - start) / repeat * 1000, len(body)
+
+
+async def _run(rows, repeat):
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_async_engine(f"sqlite+aiosqlite:///{os.path.join(tmp, 'bench.db')}")
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        sessions = async_sessionmaker(engine, expire_on_commit=False)
+        await _seed(sessions, rows)
+        print(f"filas={rows} repeticiones={repeat}")
+        print(f"{'camino':>16} {'ms/respuesta':>13} {'KB':>7}")
+        for name, fn in (("anterior", _previous), ("pre-serializado", _preserialized)):
+            ms, size = await _time(sessions, fn, rows, repeat)
+            print(f"{name:>16} {ms:>13.1f} {size / 1024:>7.0f}")
+        await engine.dispose()
+
+
+def main():
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    repeat = int(sys.argv[2]) if len(sys.argv) > 2 else 10
+    asyncio.run(_run(rows, repeat))
+
+
+if __name__ == "__main__":
+    main()
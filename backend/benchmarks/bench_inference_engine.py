@@ -0,0 +1,73 @@
+"""
+Benchmark: throughput de diagnósticos concurrentes con el motor en hilos
+(inprocess, limitado por el GIL) frente al pool de procesos con 1..N
+workers. Las cachés se desactivan y las entradas son textos largos
+distintos para que el trabajo sea CPU puro.
+
+Uso (desde la carpeta backend):
+    python benchmarks/bench_inference_engine.py [peticiones] [concurrencia]
+"""
+import asyncio
+import os
+import random
+import sys
+import time
+
+os.environ["DIAGNOSE_CACHE_FRAGMENTS"] = "0"
+os.environ["DIAGNOSE_CACHE_RESULTS"] = "0"
+
+# Add the parent directory to sys.path to import app modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.ai_stub import KB, SYNONYMS, warm_up
+from app.services.inference import InferenceEngine
+
+
+def make_inputs(n, seed=42):
+    rnd = random.Random(seed)
+    words = [w for phrase in list(SYNONYMS) + [s for weights in KB.values() for s in weights] for w in phrase.split()]
+    words += ["mucho", "desde", "ayer", "noche", "cuerpo", "cortado", "raro", "siento"]
+    inputs = []
+    for _ in range(n):
+        parts = [" ".join(rnd.choice(words) for _ in range(rnd.randint(2, 5))) for _ in range(rnd.randint(10, 20))]
+        inputs.append([", ".join(parts)])
+    return inputs
+
+
+async def _drive(engine, inputs, concurrency):
+    queue = list(inputs)
+
+    async def client():
+        while queue:
+            await engine.diagnose(queue.pop())
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    return time.perf_counter() - start
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    concurrency = int(sys.argv[2]) if len(sys.argv) > 2 else 32
+    inputs = make_inputs(n)
+    warm_up()
+    cores = os.cpu_count() or 1
+    configs = [("inprocess", 1)] + [("process", w) for w in sorted({1, 2, 4, 8, cores}) if w <= cores]
+
+    print(f"{n} peticiones, {concurrency} clientes concurrentes, {cores} CPU")
+    print(f"{'modo':<10}{'workers':>8}{'req/s':>10}{'x':>6}")
+    baseline = None
+    for mode, workers in configs:
+        engine = InferenceEngine(mode=mode, workers=workers, max_pending=concurrency, timeout=60)
+        engine.start()
+        try:
+            elapsed = asyncio.run(_drive(engine, inputs, concurrency))
+        finally:
+            engine.stop()
+        rate = n / elapsed
+        baseline = baseline or rate
+        print(f"{mode:<10}{workers if mode == 'process' else '-':>8}{rate:>10.1f}{rate / baseline:>6.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""
+Benchmark: arranque de un worker construyendo el índice desde la fuente
+(ajuste TF-IDF + matrices) frente a mapear en memoria el artefacto
+compilado, con KB sintéticas crecientes.
+
+Uso (desde la carpeta backend):
+    python benchmarks/bench_kb_artifacts.py
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+
+# Add the parent directory to sys.path to import app modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.ai_stub import KnowledgeIndex, _compile_arrays
+from app.services.kb_artifacts import KB_SOURCE, KBSource, ensure_artifact, load_source
+
+
+def _synthetic_source(n_symptoms: int, seed: int = 7) -> KBSource:
+    base = load_source(KB_SOURCE)
+    rnd = random.Random(seed)
+    syllables = [c + v for c in "bcdfglmnprstvz" for v in "aeiou"]
+    symptoms = set()
+    while len(symptoms) < n_symptoms:
+        symptoms.add(" ".join("".join(rnd.choice(syllables) for _ in range(rnd.randint(2, 4)))
+                              for _ in range(rnd.randint(1, 3))))
+    symptoms = sorted(symptoms)
+    kb = dict(base.kb)
+    for c in range(n_symptoms // 4):
+        kb[f"condicion {c}"] = {s: round(rnd.uniform(0.1, 0.5), 2) for s in rnd.sample(symptoms, rnd.randint(3, 8))}
+    return base._replace(kb=kb)
+
+
+def main():
+    print(f"{'síntomas':>10} {'construir (ms)':>15} {'compilar (ms)':>14} {'mmap (ms)':>10} {'x':>6}")
+    with tempfile.TemporaryDirectory() as artifact_dir:
+        for n_symptoms in (0, 1_000, 10_000):
+            source = _synthetic_source(n_symptoms)
+
+            start = time.perf_counter()
+            KnowledgeIndex.from_source(source)
+            build_ms = (time.perf_counter() - start) * 1000
+
+            start = time.perf_counter()
+            path = ensure_artifact(source, _compile_arrays, artifact_dir)
+            compile_ms = (time.perf_counter() - start) * 1000
+
+            start = time.perf_counter()
+            KnowledgeIndex.from_artifact(path)
+            load_ms = (time.perf_counter() - start) * 1000
+
+            total = len({s for weights in source.kb.values() for s in weights})
+            print(f"{total:>10} {build_ms:>15.1f} {compile_ms:>14.1f} {load_ms:>10.1f} {build_ms / load_ms:>6.1f}")
+
+
+if __name__ == "__main__":
+    main()
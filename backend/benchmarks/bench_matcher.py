@@ -0,0 +1,69 @@
+"""
+Benchmark: matching de síntomas con el índice TF-IDF ajustado una vez
+frente al esquema anterior (fit_transform en cada petición).
+
+Uso (desde la carpeta backend):
+    python benchmarks/bench_matcher.py
+"""
+import os
+import sys
+import time
+
+# Add the parent directory to sys.path to import app modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.metrics.pairwise import cosine_similarity
+
+from app.services import ai_stub
+
+SCENARIOS = [
+    ["fiebre", "tos"],
+    ["Siento que la cabeza me va a estallar y me molesta mucho la luz"],
+    ["Tengo el cuerpo cortado, mucha temperatura y escalofríos"],
+    ["No paro de ir al baño y me duele mucho la panza"],
+    ["dolor de garganta, estornudos y goteo nasal"],
+]
+
+
+def _legacy_match(user_inputs, threshold=0.15):
+    """Versión anterior: reajusta el vectorizador en cada llamada."""
+    known_symptoms = ai_stub._get_all_known_symptoms()
+    processed_inputs = ai_stub._preprocess_inputs(user_inputs)
+    if not processed_inputs:
+        return []
+    vectorizer = TfidfVectorizer(analyzer='char_wb', ngram_range=(2, 4))
+    tfidf_matrix = vectorizer.fit_transform(known_symptoms + processed_inputs)
+    similarity_matrix = cosine_similarity(tfidf_matrix[len(known_symptoms):], tfidf_matrix[:len(known_symptoms)])
+    detected = set()
+    for sim_scores in similarity_matrix:
+        for idx in np.argsort(sim_scores)[::-1][:2]:
+            if sim_scores[idx] >= threshold:
+                detected.add(known_symptoms[idx])
+    return list(detected)
+
+
+def _bench(fn, rounds):
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for scenario in SCENARIOS:
+            fn([s.lower() for s in scenario])
+    elapsed = time.perf_counter() - start
+    return elapsed / (rounds * len(SCENARIOS)) * 1000
+
+
+def main(rounds: int = 200):
+    ai_stub.get_matcher()  # ajuste inicial fuera de la medición
+
+    legacy_ms = _bench(_legacy_match, rounds)
+    fitted_ms = _bench(ai_stub._match_symptoms_with_ai, rounds)
+
+    print(f"Peticiones por escenario: {rounds} ({len(SCENARIOS)} escenarios)")
+    print(f"fit_transform por petición : {legacy_ms:8.3f} ms/petición")
+    print(f"índice ajustado una vez    : {fitted_ms:8.3f} ms/petición")
+    print(f"Aceleración                : {legacy_ms / fitted_ms:8.1f}x")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 200)
@@ -0,0 +1,93 @@
+"""
+Benchmark: Normalizer compilado (una pasada con trie de frases) frente a las
+funciones anteriores (_split_sentences + _is_negated + _normalize_text) con
+textos libres largos.
+
+Uso (desde la carpeta backend):
+    python benchmarks/bench_normalizer.py
+"""
+import os
+import random
+import re
+import sys
+import time
+
+# Add the parent directory to sys.path to import app modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.ai_stub import STOPWORDS, SYNONYMS
+from app.services.normalizer import Normalizer
+
+
+# --- Versión anterior (copiada de ai_stub) ---
+
+def _split_sentences(text_list):
+    split_list = []
+    separators = r'[,.;y\n]|\by\b|\bo\b|\bademas\b'
+    for text in text_list:
+        parts = re.split(separators, text)
+        split_list.extend(p.strip() for p in parts if p.strip())
+    return split_list
+
+
+def _normalize_text(text):
+    normalized_words = []
+    for word in text.lower().split():
+        word = SYNONYMS.get(word, word)
+        if word not in STOPWORDS:
+            normalized_words.append(word)
+    return " ".join(normalized_words)
+
+
+def _is_negated(text):
+    negations = ["no ", "sin ", "nunca ", "jamás "]
+    return any(text.startswith(neg) for neg in negations)
+
+
+def legacy_fragments(texts):
+    out = []
+    for part in _split_sentences(texts):
+        if _is_negated(part):
+            continue
+        norm = _normalize_text(part)
+        if norm:
+            out.append(norm)
+    return out
+
+
+_WORDS = ["me", "duele", "la", "panza", "tengo", "calentura", "tos", "seca", "mucho", "cansancio",
+          "sin", "fuerzas", "dolor", "de", "cabeza", "garganta", "desde", "hace", "dias", "mareo"]
+_SEPARATORS = [",", ".", " y", " o", ";"]
+
+
+def _text(rnd, words):
+    out = []
+    for i in range(words):
+        out.append(rnd.choice(_WORDS))
+        if i % 7 == 6:
+            out[-1] += rnd.choice(_SEPARATORS)
+    return " ".join(out)
+
+
+def main():
+    rnd = random.Random(5)
+    normalizer = Normalizer(SYNONYMS, STOPWORDS)
+    print(f"{'palabras':>9} {'anterior (ms)':>14} {'Normalizer (ms)':>16} {'x':>6}")
+    for words in (50, 500, 5_000, 50_000):
+        texts = [_text(rnd, words) for _ in range(20)]
+
+        start = time.perf_counter()
+        for text in texts:
+            legacy_fragments([text])
+        legacy_ms = (time.perf_counter() - start) / len(texts) * 1000
+
+        start = time.perf_counter()
+        for text in texts:
+            normalizer.fragments([text])
+        new_ms = (time.perf_counter() - start) / len(texts) * 1000
+
+        print(f"{words:>9} {legacy_ms:>14.3f} {new_ms:>16.3f} {legacy_ms / new_ms:>6.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,86 @@
+"""
+Benchmark: elegir la siguiente pregunta (máxima ganancia de información).
+Compara el cálculo ingenuo por petición (cada síntoma x todas las
+condiciones), el cálculo disperso vectorizado y el recorrido del árbol
+precalculado, con KB sintéticas crecientes.
+
+Uso (desde la carpeta backend):
+    python benchmarks/bench_question_tree.py
+"""
+import os
+import random
+import sys
+import time
+
+import numpy as np
+
+# Add the parent directory to sys.path to import app modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_kb_artifacts import _synthetic_source
+from app.services import ai_stub
+from app.services.question_tree import QuestionTree
+
+
+def _naive_next(tree, answers):
+    """Versión directa: una pasada sobre todas las condiciones por cada síntoma."""
+    posterior = tree.posterior(answers)
+
+    def entropy(p):
+        p = p[p > 0]
+        return -(p * np.log(p)).sum()
+
+    best, best_gain = None, -np.inf
+    for col in range(len(tree.symptoms)):
+        if col in answers:
+            continue
+        gain = entropy(posterior)
+        for present in (True, False):
+            joint = posterior * tree._likelihood(col, present)
+            gain -= joint.sum() * entropy(joint / joint.sum())
+        if gain > best_gain:
+            best, best_gain = col, gain
+    return best
+
+
+def _flows(tree, n, seed=5):
+    """Respuestas de usuarios que siguen las preguntas del árbol."""
+    rnd = random.Random(seed)
+    flows = []
+    for _ in range(n):
+        answers = {}
+        for _ in range(rnd.randint(0, 5)):
+            q = tree.next_question(answers)
+            if q.symptom is None:
+                break
+            answers[tree.symptom_index[q.symptom]] = rnd.random() < 0.5
+        flows.append(answers)
+    return flows
+
+
+def _time(fn, flows):
+    start = time.perf_counter()
+    for answers in flows:
+        fn(answers)
+    return (time.perf_counter() - start) / len(flows) * 1000
+
+
+def main():
+    print(f"{'síntomas':>10} {'nodos':>6} {'construir (ms)':>15} {'ingenuo (ms)':>13} "
+          f"{'disperso (ms)':>14} {'árbol (ms)':>11}")
+    for n_symptoms in (0, 1_000, 10_000):
+        index = ai_stub.load_index(_synthetic_source(n_symptoms), None)
+        start = time.perf_counter()
+        tree = QuestionTree(index)
+        build_ms = (time.perf_counter() - start) * 1000
+        flows = _flows(tree, 200)
+
+        naive_ms = _time(lambda a: _naive_next(tree, a), flows[:5 if n_symptoms else 200])
+        sparse_ms = _time(lambda a: tree._choose(tree.posterior(a), frozenset(a)), flows)
+        tree_ms = _time(tree.next_question, flows)
+        print(f"{n_symptoms:>10} {len(tree):>6} {build_ms:>15.1f} {naive_ms:>13.3f} "
+              f"{sparse_ms:>14.3f} {tree_ms:>11.4f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""
+Benchmark: puntuación de condiciones con la KB compilada (matriz dispersa +
+argpartition) frente al bucle Python anterior, con KB sintéticas crecientes.
+
+Uso (desde la carpeta backend):
+    python benchmarks/bench_scoring.py
+"""
+import os
+import random
+import sys
+import time
+
+# Add the parent directory to sys.path to import app modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.ai_stub import ConditionScorer
+
+
+def _synthetic_kb(n_conditions: int, n_symptoms: int, seed: int = 7):
+    rnd = random.Random(seed)
+    symptoms = [f"sintoma {i}" for i in range(n_symptoms)]
+    return {
+        f"condicion {c}": {s: round(rnd.uniform(0.1, 0.5), 2) for s in rnd.sample(symptoms, rnd.randint(3, 8))}
+        for c in range(n_conditions)
+    }, symptoms
+
+
+def _legacy_score(kb, detected_symptoms):
+    """Versión anterior: recorre todas las condiciones en Python."""
+    scores = []
+    for condition, weights in kb.items():
+        current_score = 0.0
+        max_possible_score = sum(weights.values())
+        matched = []
+        for symptom in detected_symptoms:
+            if symptom in weights:
+                current_score += weights[symptom]
+                matched.append(symptom)
+        probability = current_score / max_possible_score if max_possible_score > 0 else 0.0
+        if probability > 0:
+            scores.append((condition, probability, matched))
+    scores.sort(key=lambda x: x[1], reverse=True)
+    return scores[:3]
+
+
+def _time(fn, queries):
+    start = time.perf_counter()
+    for q in queries:
+        fn(q)
+    return (time.perf_counter() - start) / len(queries) * 1000
+
+
+def main():
+    print(f"{'condiciones':>12} {'bucle (ms)':>12} {'matriz (ms)':>12} {'x':>6}")
+    for n_conditions in (18, 1_000, 5_000, 20_000):
+        kb, symptoms = _synthetic_kb(n_conditions, max(80, n_conditions // 4))
+        scorer = ConditionScorer(kb)
+        rnd = random.Random(1)
+        queries = [rnd.sample(symptoms, 4) for _ in range(200)]
+
+        legacy_ms = _time(lambda q: _legacy_score(kb, q), queries)
+        matrix_ms = _time(lambda q: scorer.top_k(q, k=3), queries)
+        print(f"{n_conditions:>12} {legacy_ms:>12.3f} {matrix_ms:>12.3f} {legacy_ms / matrix_ms:>6.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""
+Benchmark: corrector ortográfico por borrado simétrico + tabla de
+coincidencias exactas frente al matching solo con TF-IDF, con entradas
+coloquiales con errores de escritura.
+
+Uso (desde la carpeta backend):
+    python benchmarks/bench_spelling.py
+"""
+import os
+import random
+import sys
+import time
+
+# Add the parent directory to sys.path to import app modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.ai_stub import KB, RECS, STOPWORDS, SYNONYMS, KnowledgeIndex, SymptomMatcher
+from app.services.normalizer import Normalizer
+
+
+def typo(word, rng):
+    """Introduce un error: borrado, transposición o sustitución de una letra."""
+    if len(word) < 5:
+        return word
+    i = rng.randrange(1, len(word) - 1)
+    kind = rng.choice(("delete", "swap", "replace"))
+    if kind == "delete":
+        return word[:i] + word[i + 1:]
+    if kind == "swap":
+        return word[:i] + word[i + 1] + word[i] + word[i + 2:]
+    return word[:i] + rng.choice("aeiourscz") + word[i + 1:]
+
+
+def make_inputs(n, rng):
+    phrases = [s for weights in KB.values() for s in weights] + list(SYNONYMS)
+    inputs = []
+    for _ in range(n):
+        phrase = rng.choice(phrases)
+        inputs.append(" ".join(typo(w, rng) if rng.random() < 0.5 else w for w in phrase.split()))
+    return inputs
+
+
+def run(normalizer, matcher, inputs, use_exact):
+    exact = matcher.exact if use_exact else {}
+    transformed = 0
+    start = time.perf_counter()
+    for text in inputs:
+        fragments = normalizer.fragments([text])
+        misses = [f for f in fragments if f not in exact]
+        transformed += len(misses)
+        if misses:
+            matcher.index.search(misses, top_k=2, threshold=0.15)
+    elapsed = time.perf_counter() - start
+    return elapsed / len(inputs) * 1000, transformed
+
+
+def main():
+    rng = random.Random(42)
+    inputs = make_inputs(5000, rng)
+
+    index = KnowledgeIndex(KB, RECS, SYNONYMS, STOPWORDS)
+    plain = Normalizer(SYNONYMS, STOPWORDS)
+    tfidf_only = SymptomMatcher(index.matcher.known_symptoms)
+
+    base_ms, base_tf = run(plain, tfidf_only, inputs, use_exact=False)
+    # Primera pasada para llenar la memo del corrector (estado estable del servidor)
+    run(index.normalizer, index.matcher, inputs, use_exact=True)
+    spell_ms, spell_tf = run(index.normalizer, index.matcher, inputs, use_exact=True)
+
+    print(f"{len(inputs)} entradas, diccionario del corrector: {len(index.speller)} palabras")
+    print(f"{'modo':<26}{'ms/entrada':>12}{'fragmentos TF-IDF':>20}")
+    print(f"{'solo TF-IDF':<26}{base_ms:>12.4f}{base_tf:>20}")
+    print(f"{'corrector + tabla exacta':<26}{spell_ms:>12.4f}{spell_tf:>20}")
+    print(f"speedup: {base_ms / spell_ms:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""
+Benchmark: búsqueda de síntomas con el índice invertido de n-gramas
+(candidatos + argpartition, con poda) frente a la similitud densa con
+argsort completo, para vocabularios sintéticos de 1k/10k/100k síntomas.
+
+Uso (desde la carpeta backend):
+    python benchmarks/bench_symptom_index.py
+"""
+import os
+import random
+import sys
+import time
+
+# Add the parent directory to sys.path to import app modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+
+from app.services import symptom_index
+from app.services.symptom_index import NgramIndex
+
+_CONSONANTS = "bcdfglmnprstvz"
+_VOWELS = "aeiou"
+_SYLLABLES = ([c + v for c in _CONSONANTS for v in _VOWELS]
+              + [c + v + "r" for c in "bcdfgpt" for v in _VOWELS] + list(_VOWELS))
+_CONNECTORS = ["de", "en", "al", "con"]
+
+
+def _word(rnd):
+    return "".join(rnd.choice(_SYLLABLES) for _ in range(rnd.randint(2, 4)))
+
+
+def _vocabulary(size, seed=3):
+    rnd = random.Random(seed)
+    terms = set()
+    while len(terms) < size:
+        words = [_word(rnd) for _ in range(rnd.randint(1, 3))]
+        if len(words) > 1 and rnd.random() < 0.5:
+            words.insert(1, rnd.choice(_CONNECTORS))
+        terms.add(" ".join(words))
+    return sorted(terms)
+
+
+def _dense_search(index, fragments, top_k=2, threshold=0.15):
+    """Esquema anterior: matriz densa completa y argsort por fila."""
+    results = []
+    for sims in index.similarities(fragments):
+        top = np.argsort(sims)[::-1][:top_k]
+        results.append([(int(i), float(sims[i])) for i in top if sims[i] >= threshold])
+    return results
+
+
+def _time(fn, queries, rounds=3):
+    best = float("inf")
+    for _ in range(rounds):
+        start = time.perf_counter()
+        for q in queries:
+            fn(q)
+        best = min(best, time.perf_counter() - start)
+    return best / len(queries) * 1000
+
+
+def main():
+    rnd = random.Random(11)
+    print(f"{'síntomas':>9} {'build (s)':>10} {'denso (ms)':>11} {'listas (ms)':>12} {'poda (ms)':>10}")
+    for size in (1_000, 10_000, 100_000):
+        terms = _vocabulary(size)
+        start = time.perf_counter()
+        index = NgramIndex(terms)
+        build = time.perf_counter() - start
+
+        # Consultas: un término con una errata, una palabra suelta y texto sin coincidencias
+        queries = []
+        for _ in range(50):
+            term = rnd.choice(terms)
+            queries.append([term[:-1] + "x", rnd.choice(terms).split()[0], f"{_word(rnd)} de {_word(rnd)}"])
+
+        dense_ms = _time(lambda q: _dense_search(index, q), queries)
+        symptom_index.PRUNE_MIN_TERMS = 10 ** 9  # producto disperso sobre las listas invertidas
+        product = [index.search(q) for q in queries]
+        product_ms = _time(lambda q: index.search(q), queries)
+        symptom_index.PRUNE_MIN_TERMS = 0  # búsqueda con poda por fragmento
+        pruned = [index.search(q) for q in queries]
+        pruned_ms = _time(lambda q: index.search(q), queries)
+
+        # La poda es exacta: mismos síntomas que el producto completo
+        for a, b in zip(product, pruned):
+            assert [[i for i, _ in hits] for hits in a] == [[i for i, _ in hits] for hits in b]
+
+        print(f"{size:>9} {build:>10.2f} {dense_ms:>11.3f} {product_ms:>12.3f} {pruned_ms:>10.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""
+Benchmark: memoria por worker (RSS y PSS) con el índice de la KB construido
+en cada proceso frente a mapear el artefacto compilado compartido. Simula
+N workers de uvicorn con procesos `spawn` vivos a la vez y muestra la
+memoria de cada uno antes y después de cargar la KB.
+
+Uso (desde la carpeta backend):
+    python benchmarks/bench_worker_memory.py [workers] [síntomas]
+"""
+import multiprocessing as mp
+import os
+import sys
+import tempfile
+
+# Add the parent directory to sys.path to import app modules
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_kb_artifacts import _synthetic_source
+
+
+def _worker(mode, n_symptoms, artifact_dir, loaded, done, results):
+    from app.services import ai_stub
+    from app.services.memory_report import process_memory
+
+    source = _synthetic_source(n_symptoms)
+    before = process_memory()
+    index = ai_stub.load_index(source, artifact_dir if mode == "mmap" else None)
+    index.matcher.match_fragments(["fiebre", "dolor de cabeza"])
+    # PSS se mide con todos los workers vivos: reparte las páginas compartidas
+    loaded.wait()
+    results.put((mode, before, process_memory()))
+    done.wait()
+
+
+def _run(mode, workers, n_symptoms, artifact_dir):
+    ctx = mp.get_context("spawn")
+    loaded, done = ctx.Barrier(workers), ctx.Event()
+    results = ctx.Queue()
+    procs = [ctx.Process(target=_worker, args=(mode, n_symptoms, artifact_dir, loaded, done, results))
+             for _ in range(workers)]
+    for p in procs:
+        p.start()
+    rows = [results.get() for _ in procs]
+    done.set()
+    for p in procs:
+        p.join()
+    return rows
+
+
+def main():
+    workers = int(sys.argv[1]) if len(sys.argv) > 1 else 4
+    n_symptoms = int(sys.argv[2]) if len(sys.argv) > 2 else 10_000
+
+    from app.services.ai_stub import _compile_arrays
+    from app.services.kb_artifacts import ensure_artifact
+
+    with tempfile.TemporaryDirectory() as artifact_dir:
+        # El artefacto ya compilado (como tras el primer arranque o el despliegue)
+        ensure_artifact(_synthetic_source(n_symptoms), _compile_arrays, artifact_dir)
+        print(f"{workers} workers, KB sintética con {n_symptoms} síntomas extra (MB)")
+        print(f"{'modo':<8}{'pid':>8}{'RSS antes':>11}{'RSS después':>13}{'PSS después':>13}{'compartida':>12}{'privada':>10}")
+        for mode in ("build", "mmap"):
+            rows = _run(mode, workers, n_symptoms, artifact_dir)
+            for _, before, after in rows:
+                print(f"{mode:<8}{after['pid']:>8}{before['rss_mb']:>11.1f}{after['rss_mb']:>13.1f}"
+                      f"{after['pss_mb']:>13.1f}{after['shared_mb']:>12.1f}{after['private_mb']:>10.1f}")
+            grown = sum(after["private_mb"] - before["private_mb"] for _, before, after in rows)
+            total_pss = sum(after["pss_mb"] for _, _, after in rows)
+            print(f"{mode:<8}{'total':>8}  memoria privada añadida por la KB: {grown:.1f}  PSS total: {total_pss:.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -18,9 +18,46 @@ CREATE TABLE IF NOT EXISTS users (
 CREATE TABLE IF NOT EXISTS history (
     id INT AUTO_INCREMENT PRIMARY KEY,
     user_id INT NOT NULL,
-    symptoms TEXT NOT NULL, -- Guardado como JSON o texto separado por comas
-    diagnosis_result TEXT, -- JSON con los resultados
+    symptoms JSON NOT NULL, -- Array JSON de síntomas (bases antiguas: TEXT separado por comas, se sigue leyendo)
+    diagnosis_result JSON, -- JSON con los resultados; /history lo envía tal cual
+    detected JSON, -- Síntomas de la KB detectados al diagnosticar (contadores de analítica); NULL en filas antiguas
     created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE,
+    -- Paginación de /history por usuario (más reciente primero)
+    INDEX ix_history_user_created (user_id, created_at DESC, id DESC)
+);
+
+-- Bases ya creadas con una versión anterior de este script:
+-- CREATE INDEX ix_history_user_created ON history (user_id, created_at DESC, id DESC);
+-- Columnas TEXT a JSON: primero se pasan a array las filas con síntomas unidos por ", "
+-- y se vacían los diagnósticos que no sean JSON válido (si no, el ALTER falla)
+-- UPDATE history SET symptoms = CONCAT('["', REPLACE(REPLACE(REPLACE(symptoms, '\\', '\\\\'), '"', '\\"'), ', ', '","'), '"]')
+--     WHERE NOT JSON_VALID(symptoms);
+-- UPDATE history SET diagnosis_result = NULL WHERE NOT JSON_VALID(diagnosis_result);
+-- ALTER TABLE history MODIFY symptoms JSON NOT NULL, MODIFY diagnosis_result JSON;
+-- ALTER TABLE history ADD COLUMN detected JSON AFTER diagnosis_result;
+
+-- Analítica: contadores por día que la API suma al guardar cada diagnóstico
+CREATE TABLE IF NOT EXISTS analytics_condition_daily (
+    day DATE NOT NULL,
+    `condition` VARCHAR(255) NOT NULL,
+    total INT NOT NULL DEFAULT 0,
+    PRIMARY KEY (day, `condition`)
+);
+
+CREATE TABLE IF NOT EXISTS analytics_symptom_daily (
+    day DATE NOT NULL,
+    symptom VARCHAR(255) NOT NULL,
+    total INT NOT NULL DEFAULT 0,
+    PRIMARY KEY (day, symptom)
+);
+
+CREATE TABLE IF NOT EXISTS analytics_user_condition_daily (
+    user_id INT NOT NULL,
+    day DATE NOT NULL,
+    `condition` VARCHAR(255) NOT NULL,
+    total INT NOT NULL DEFAULT 0,
+    PRIMARY KEY (user_id, day, `condition`),
     FOREIGN KEY (user_id) REFERENCES users(id) ON DELETE CASCADE
 );
 
@@ -0,0 +1,36 @@
+import asyncio
+
+import pytest
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import async_sessionmaker
+
+from app import models
+from app.database import Base, make_engine
+
+# Usuarios que existen en cada base de pruebas; cada test crea sus propias filas
+USER_IDS = (1, 2)
+
+
+@pytest.fixture
+def run_db(tmp_path):
+    """
+    Ejecuta `await scenario(sessions)` contra una base SQLite nueva (en
+    tmp_path) con las tablas creadas y los usuarios USER_IDS. El engine
+    está en `sessions.kw["bind"]` y se cierra al terminar.
+    """
+    def run(scenario):
+        async def main():
+            engine = make_engine(f"sqlite+aiosqlite:///{tmp_path / 'test.db'}", asynchronous=True, name="tests")
+            async with engine.begin() as conn:
+                await conn.run_sync(Base.metadata.create_all)
+                await conn.execute(insert(models.User), [
+                    {"id": u, "email": f"u{u}@example.com", "password_hash": "x"} for u in USER_IDS
+                ])
+            try:
+                return await scenario(async_sessionmaker(engine, expire_on_commit=False))
+            finally:
+                await engine.dispose()
+
+        return asyncio.run(main())
+
+    return run
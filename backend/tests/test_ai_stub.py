@@ -0,0 +1,44 @@
+from app.services import ai_stub
+
+
+def test_matcher_is_fitted_once():
+    first = ai_stub.get_matcher()
+    ai_stub.suggest_diagnoses(["fiebre", "tos"])
+    assert ai_stub.get_matcher() is first
+
+
+def test_matcher_finds_known_symptoms():
+    matcher = ai_stub.get_matcher()
+    assert {"fiebre", "escalofrios"} <= set(matcher.match(["fiebre", "escalofrios"]))
+    assert matcher.match(["xyz"]) == []
+
+
+def test_suggest_diagnoses_ranking():
+    diagnoses = ai_stub.suggest_diagnoses(["fiebre", "tos"])
+    assert diagnoses[0].condition == "Gripe Estacional"
+    assert [d.confidence for d in diagnoses] == sorted((d.confidence for d in diagnoses), reverse=True)
+
+
+def test_scorer_matches_kb_weights():
+    scorer = ai_stub.ConditionScorer(ai_stub.KB)
+    results = scorer.top_k(["fiebre", "tos"], k=3)
+    gripe = ai_stub.KB["Gripe Estacional"]
+    assert results[0][0] == "Gripe Estacional"
+    assert abs(results[0][1] - (gripe["fiebre"] + gripe["tos"]) / sum(gripe.values())) < 1e-9
+    assert results[0][2] == ["fiebre", "tos"]
+
+
+def test_scorer_breaks_ties_by_kb_order():
+    kb = {"A": {"x": 1.0}, "B": {"x": 1.0}, "C": {"x": 1.0}, "D": {"x": 1.0, "y": 1.0}}
+    results = ai_stub.ConditionScorer(kb).top_k(["x"], k=2)
+    assert [r[0] for r in results] == ["A", "B"]
+    assert ai_stub.ConditionScorer(kb).top_k(["z"]) == []
+
+
+def test_batch_matches_single_requests():
+    inputs = [["fiebre", "tos"], [], ["diarrea y vomitos"], ["xyz"]]
+    batch = ai_stub.suggest_diagnoses_batch(inputs)
+    assert len(batch) == len(inputs)
+    for symptoms, diagnoses in zip(inputs, batch):
+        single = ai_stub.suggest_diagnoses(symptoms)
+        assert [(d.condition, d.confidence) for d in diagnoses] == [(d.condition, d.confidence) for d in single]
@@ -0,0 +1,116 @@
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import insert, select
+
+from app import models
+from app.schemas import Diagnosis
+from app.services import ai_stub, analytics, history_db
+
+TODAY = date(2024, 3, 10)
+
+
+def _row(user_id, day, symptoms, *conditions, detected=None):
+    # Por defecto, los síntomas del texto son los que "detectó" el diagnóstico
+    diagnoses = [Diagnosis(condition=c, confidence=0.5, recommendation="r") for c in conditions]
+    row = history_db.history_row(user_id, symptoms, diagnoses, symptoms if detected is None else detected)
+    row["created_at"] = datetime.combine(day, datetime.min.time()) + timedelta(hours=12)
+    return row
+
+
+async def _save(sessions, rows):
+    # Lo mismo que hace la API al guardar un diagnóstico
+    async with sessions() as db:
+        await db.execute(insert(models.History), rows)
+        await analytics.record(db, rows)
+        await db.commit()
+
+
+def test_increments_count_top_condition_and_detected_kb_symptoms(monkeypatch):
+    legacy = {"user_id": 2, "symptoms": "Fiebre, FATIGA", "diagnosis_result": "[]",
+              "created_at": datetime.combine(TODAY, datetime.min.time())}
+    rows = [
+        _row(1, TODAY, ["Fiebre alta", "fiebre"], "Gripe", "COVID-19", detected=["fiebre"]),
+        legacy,
+        _row(2, TODAY, ["xyzzy"], ai_stub.NO_DIAGNOSIS, detected=[]),
+    ]
+    inc = analytics.increments_for(rows, rematch=True)
+    assert inc.conditions == {(TODAY, "Gripe"): 1}
+    assert inc.user_conditions == {(1, TODAY, "Gripe"): 1}
+    # Síntomas de la KB: los guardados o, en filas antiguas, los que detecta el matching
+    assert inc.symptoms == {(TODAY, "fiebre"): 2, (TODAY, "fatiga extrema"): 1}
+
+    # Al guardar y borrar no se repite el matching: las filas antiguas solo cuentan la condición
+    def fail(*args, **kwargs):
+        raise AssertionError("no debería volver a detectar síntomas")
+
+    monkeypatch.setattr(ai_stub, "detect_symptoms_batch", fail)
+    assert analytics.increments_for(rows).symptoms == {(TODAY, "fiebre"): 1}
+
+
+def test_deleted_rows_are_subtracted_from_the_stored_keys(run_db):
+    async def scenario(sessions):
+        rows = [_row(1, TODAY, ["fiebre"], "Gripe"), _row(1, TODAY, ["calentura", "tos"], "Gripe",
+                                                           detected=["fiebre", "tos"])]
+        await _save(sessions, rows)
+        async with sessions() as db:
+            await analytics.forget(db, rows[1:])
+            await db.commit()
+            return (await analytics.top_per_day(db, "symptom", 1, 10, today=TODAY),
+                    await analytics.user_trend(db, 1, 1, today=TODAY))
+
+    symptoms, trend = run_db(scenario)
+    assert symptoms["top"] == [{"symptom": "fiebre", "count": 1}]
+    assert trend["days"] == [{"day": "2024-03-10", "total": 1, "conditions": {"Gripe": 1}}]
+
+
+def test_counters_accumulate_and_rank_per_day(run_db):
+    yesterday = TODAY - timedelta(days=1)
+
+    async def scenario(sessions):
+        await _save(sessions, [_row(1, TODAY, ["fiebre"], "Gripe"), _row(2, TODAY, ["tos"], "Gripe")])
+        await _save(sessions, [_row(1, TODAY, ["tos"], "Resfriado"), _row(1, yesterday, ["tos"], "Resfriado")])
+        async with sessions() as db:
+            return (await analytics.top_per_day(db, "condition", 3, 10, today=TODAY),
+                    await analytics.top_per_day(db, "symptom", 1, 1, today=TODAY),
+                    await analytics.user_trend(db, 1, 2, today=TODAY))
+
+    conditions, symptoms, trend = run_db(scenario)
+    assert [d["day"] for d in conditions["days"]] == ["2024-03-08", "2024-03-09", "2024-03-10"]
+    assert [d["total"] for d in conditions["days"]] == [0, 1, 3]
+    assert conditions["days"][2]["top"] == [{"condition": "Gripe", "count": 2}, {"condition": "Resfriado", "count": 1}]
+    assert conditions["top"] == [{"condition": "Gripe", "count": 2}, {"condition": "Resfriado", "count": 2}]
+    assert symptoms["top"] == [{"symptom": "tos", "count": 2}]
+    assert trend["days"] == [
+        {"day": "2024-03-09", "total": 1, "conditions": {"Resfriado": 1}},
+        {"day": "2024-03-10", "total": 2, "conditions": {"Gripe": 1, "Resfriado": 1}},
+    ]
+
+
+def test_backfill_rebuilds_past_days_only_and_is_repeatable(run_db):
+    async def scenario(sessions):
+        # Historial anterior a los contadores (sin analytics.record) y un día de hoy ya contado
+        async with sessions() as db:
+            await db.execute(insert(models.History), [
+                _row(1 + i % 2, TODAY - timedelta(days=1 + i % 3), ["fiebre"], "Gripe") for i in range(30)
+            ])
+            await db.commit()
+        await _save(sessions, [_row(1, TODAY, ["tos"], "Resfriado")])
+
+        first = await analytics.backfill(until=TODAY, chunk_rows=7, sessions=sessions)
+        again = await analytics.backfill(until=TODAY, chunk_rows=7, sessions=sessions)
+        async with sessions() as db:
+            rows = (await db.execute(select(models.ConditionDaily.day, models.ConditionDaily.condition,
+                                            models.ConditionDaily.total)
+                                     .order_by(models.ConditionDaily.day))).all()
+            trend = await analytics.user_trend(db, 2, 4, today=TODAY)
+        return first, again, rows, trend
+
+    first, again, rows, trend = run_db(scenario)
+    assert first == again == {"until": "2024-03-10", "rows": 30, "chunks": 5}
+    assert [tuple(r) for r in rows] == [
+        (TODAY - timedelta(days=3), "Gripe", 10),
+        (TODAY - timedelta(days=2), "Gripe", 10),
+        (TODAY - timedelta(days=1), "Gripe", 10),
+        (TODAY, "Resfriado", 1),
+    ]
+    assert [d["total"] for d in trend["days"]] == [5, 5, 5, 0]
@@ -0,0 +1,37 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from app.services import ai_stub
+from app.services.coalescer import DiagnosisCoalescer
+
+
+def test_coalescer_fans_out_results_in_order():
+    coalescer = DiagnosisCoalescer(window_ms=20, max_batch=8)
+    coalescer.start()
+    inputs = [["fiebre", "tos"], ["diarrea"], ["dolor de oido"], ["xyz"]] * 4
+    try:
+        with ThreadPoolExecutor(max_workers=16) as pool:
+            results = list(pool.map(coalescer.diagnose, inputs))
+    finally:
+        coalescer.stop()
+
+    for symptoms, diagnoses in zip(inputs, results):
+        expected = ai_stub.suggest_diagnoses(symptoms)
+        assert [d.condition for d in diagnoses] == [d.condition for d in expected]
+
+    stats = coalescer.stats()
+    assert stats["items"] == len(inputs)
+    assert stats["batches"] < len(inputs)
+    assert sum(stats["batch_size_histogram"].values()) == stats["batches"]
+
+
+def test_coalescer_propagates_errors():
+    def failing(_):
+        raise ValueError("boom")
+
+    coalescer = DiagnosisCoalescer(batch_fn=failing, window_ms=1)
+    coalescer.start()
+    try:
+        future = coalescer.submit(["fiebre"])
+        assert isinstance(future.exception(timeout=5), ValueError)
+    finally:
+        coalescer.stop()
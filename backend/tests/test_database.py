@@ -0,0 +1,35 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from app import auth, models
+from app.database import Base, async_url
+
+
+def test_async_url_maps_sync_drivers():
+    assert async_url("mysql+pymysql://root:pw@localhost:3306/db") == "mysql+aiomysql://root:pw@localhost:3306/db"
+    assert async_url("sqlite:///./dev.db") == "sqlite+aiosqlite:///./dev.db"
+    assert async_url("sqlite+aiosqlite:///./dev.db") == "sqlite+aiosqlite:///./dev.db"
+
+
+def test_current_user_is_loaded_with_async_session(tmp_path):
+    async def run():
+        engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'test.db'}")
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        sessions = async_sessionmaker(engine, expire_on_commit=False)
+        async with sessions() as db:
+            db.add(models.User(email="ana@example.com", password_hash="x", full_name="Ana"))
+            await db.commit()
+            token = auth.create_access_token({"sub": "ana@example.com"})
+            user = await auth.get_current_user(token=token, db=db)
+            missing = auth.create_access_token({"sub": "nadie@example.com"})
+            with pytest.raises(HTTPException):
+                await auth.get_current_user(token=missing, db=db)
+        await engine.dispose()
+        return user
+
+    user = asyncio.run(run())
+    assert (user.email, user.full_name) == ("ana@example.com", "Ana")
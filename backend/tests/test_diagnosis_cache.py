@@ -0,0 +1,60 @@
+import json
+
+from app.services import ai_stub
+from app.services.kb_artifacts import KB_SOURCE, load_source
+from app.services.diagnosis_cache import MISSING, LRUCache
+
+
+def test_lru_evicts_oldest_and_counts():
+    cache = LRUCache(2)
+    cache.put("a", 1)
+    cache.put("b", 2)
+    assert cache.get("a") == 1
+    cache.put("c", 3)
+    assert cache.get("b") is MISSING
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["evictions"]) == (1, 1, 1)
+
+
+def test_lru_invalidates_on_version_change():
+    cache = LRUCache(10)
+    cache.put("a", 1, version="v1")
+    assert cache.get("a", version="v2") is MISSING
+    assert cache.stats()["invalidations"] == 1
+
+
+def test_repeated_input_skips_matcher_and_scorer(monkeypatch):
+    ai_stub.suggest_diagnoses(["fiebre y tos"])
+    index = ai_stub.get_index()
+
+    def fail(*args, **kwargs):
+        raise AssertionError("no debería recalcularse")
+
+    monkeypatch.setattr(index.matcher, "match_fragments", fail)
+    monkeypatch.setattr(index.scorer, "top_k_batch", fail)
+    # Mismo conjunto de síntomas, en otro orden: comparte la entrada de caché
+    diagnoses = ai_stub.suggest_diagnoses(["tos, fiebre"])
+    assert diagnoses[0].condition == "Gripe Estacional"
+    # ...pero las coincidencias siguen el orden de esta petición
+    assert diagnoses[0].recommendation.endswith("(Coincidencias detectadas: tos, fiebre)")
+
+
+def test_cached_explanation_follows_input_order():
+    ai_stub.suggest_diagnoses(["tos", "fiebre"])
+    diagnoses = ai_stub.suggest_diagnoses(["fiebre", "tos"])
+    assert diagnoses[0].recommendation.endswith("(Coincidencias detectadas: fiebre, tos)")
+
+
+def test_kb_change_invalidates_cache(tmp_path):
+    before = ai_stub.suggest_diagnoses(["fiebre"])
+    source = load_source(KB_SOURCE)
+    source.kb["Fiebre Aislada"] = {"fiebre": 1.0}
+    path = tmp_path / "kb.json"
+    path.write_text(json.dumps(source._asdict(), ensure_ascii=False), encoding="utf-8")
+    try:
+        ai_stub.reload_index(str(path), artifact_dir=str(tmp_path / "artifacts"))
+        after = ai_stub.suggest_diagnoses(["fiebre"])
+        assert after[0].condition == "Fiebre Aislada"
+        assert before[0].condition != "Fiebre Aislada"
+    finally:
+        ai_stub.reload_index()
@@ -0,0 +1,77 @@
+import json
+import random
+import time
+
+import pytest
+
+from app.services import ai_stub
+from app.services.diagnosis_session import DiagnosisSession, SessionNotFound, SessionStore
+from app.services.kb_artifacts import KB_SOURCE, load_source
+
+ANSWERS = ["fiebre", "tos", "dolor de cabeza", "dificultad para respirar", "palpitaciones",
+           "me duele la garganta", "congestion nasal", "nauseas y vomitos", "sin fiebre", "cansancio"]
+
+
+def test_deltas_match_full_diagnosis():
+    rnd = random.Random(3)
+    session = DiagnosisSession(user_id=1)
+    current = []
+    for _ in range(40):
+        if current and rnd.random() < 0.4:
+            text = rnd.choice(current)
+            assert session.remove(text)
+            current.remove(text)
+        else:
+            text = rnd.choice([a for a in ANSWERS if a not in current] or ANSWERS)
+            if session.add(text):
+                current.append(text)
+        # La caché de resultados ignora el orden de los síntomas: se vacía para comparar
+        ai_stub.RESULT_CACHE.clear()
+        assert session.diagnoses() == ai_stub.suggest_diagnoses(current)
+
+
+def test_delta_only_rescores_conditions_with_that_symptom():
+    session = DiagnosisSession(user_id=1)
+    session.add("fiebre")
+    before = dict(session._scores)
+    session.add("palpitaciones")
+    scorer = session.index.scorer
+    touched = set()
+    for symptom in session.inputs["palpitaciones"]:
+        col = scorer.symptom_index[symptom]
+        touched.update(scorer._weights_t.indices[scorer._weights_t.indptr[col]:scorer._weights_t.indptr[col + 1]].tolist())
+    assert {row: s for row, s in session._scores.items() if row not in touched} == \
+        {row: s for row, s in before.items() if row not in touched}
+    session.remove("palpitaciones")
+    assert session._scores == before
+
+
+def test_store_is_per_user_and_expires():
+    store = SessionStore(ttl=0.05, maxsize=2)
+    session = store.create(user_id=1)
+    with pytest.raises(SessionNotFound):
+        store.get(session.id, user_id=2)
+    assert store.get(session.id, user_id=1) is session
+    time.sleep(0.1)
+    with pytest.raises(SessionNotFound):
+        store.get(session.id, user_id=1)
+    ids = [store.create(user_id=1).id for _ in range(3)]
+    assert len(store) == 2 and store.stats()["evicted"] == 1
+    store.pop(ids[-1], user_id=1)
+    with pytest.raises(SessionNotFound):
+        store.pop(ids[-1], user_id=1)
+
+
+def test_session_rematches_after_kb_reload(tmp_path):
+    session = DiagnosisSession(user_id=1)
+    session.add("fiebre")
+    source = load_source(KB_SOURCE)
+    source.kb["Fiebre Aislada"] = {"fiebre": 1.0}
+    path = tmp_path / "kb.json"
+    path.write_text(json.dumps(source._asdict(), ensure_ascii=False), encoding="utf-8")
+    try:
+        ai_stub.reload_index(str(path), artifact_dir=str(tmp_path / "artifacts"))
+        assert session.diagnoses()[0].condition == "Fiebre Aislada"
+        assert session.version == ai_stub.get_index().version
+    finally:
+        ai_stub.reload_index()
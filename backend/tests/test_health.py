@@ -1,9 +1,29 @@
 from fastapi.testclient import TestClient
+from app import main
 from app.main import app
 
 
-def test_health():
+def test_health(monkeypatch):
+    async def ping_ok():
+        return None
+
+    monkeypatch.setattr(main, "ping_db", ping_ok)
     client = TestClient(app)
     r = client.get("/health")
     assert r.status_code == 200
-    assert r.json() == {"status": "ok"}
+    body = r.json()
+    assert body["status"] == "ok"
+    assert body["db"] == main.async_engine.dialect.name
+    assert "in_use" in body["pool"]
+
+
+def test_health_db_down(monkeypatch):
+    async def ping_fails():
+        raise ConnectionRefusedError("sin base")
+
+    monkeypatch.setattr(main, "ping_db", ping_fails)
+    client = TestClient(app)
+    r = client.get("/health")
+    assert r.status_code == 503
+    assert r.json()["status"] == "error"
+    assert r.json()["error"] == "ConnectionRefusedError"
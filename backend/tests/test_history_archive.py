@@ -0,0 +1,139 @@
+import gzip
+import json
+from datetime import datetime, timedelta
+
+from sqlalchemy import func, insert, select
+
+from app import models
+from app.services import history_archive, history_db
+from app.services.history_archive import HistoryArchive, archive_old_rows, retention_cutoff
+
+NOW = datetime(2024, 6, 15, 12, 0)
+
+
+async def _seed(sessions):
+    # 90 filas de dos usuarios repartidas entre enero y abril de 2024, varias por instante
+    start = datetime(2024, 1, 1)
+    async with sessions() as db:
+        await db.execute(insert(models.History), [
+            {"user_id": 1 + i % 2, "symptoms": json.dumps([f"s{i}"]), "diagnosis_result": "[]",
+             "created_at": start + timedelta(days=4 * (i // 3))}
+            for i in range(90)
+        ])
+        await db.commit()
+
+
+def _with_history(run_db, tmp_path, scenario):
+    async def seeded(sessions):
+        await _seed(sessions)
+        return await scenario(sessions, HistoryArchive(str(tmp_path / "archive")))
+
+    return run_db(seeded)
+
+
+async def _hot_count(sessions):
+    async with sessions() as db:
+        return await db.scalar(select(func.count()).select_from(models.History))
+
+
+async def _all_pages(sessions, archive, user_id, limit):
+    ids, cursor = [], None
+    while True:
+        async with sessions() as db:
+            rows, cursor = await history_archive.fetch_page(db, user_id, limit, cursor, archive=archive)
+        ids.extend(row.id for row in rows)
+        if cursor is None:
+            return ids
+
+
+def test_retention_cutoff_is_start_of_month():
+    assert retention_cutoff(3, NOW) == datetime(2024, 3, 1)
+    assert retention_cutoff(6, NOW) == datetime(2023, 12, 1)
+    assert retention_cutoff(0, NOW) == datetime(2024, 6, 1)
+
+
+def test_old_rows_move_to_monthly_files_in_bounded_batches(run_db, tmp_path):
+    async def scenario(sessions, archive):
+        result = await archive_old_rows(3, batch_rows=10, sessions=sessions, archive=archive, now=NOW)
+        async with sessions() as db:
+            oldest = await db.scalar(select(func.min(models.History.created_at)))
+        again = await archive_old_rows(3, batch_rows=10, sessions=sessions, archive=archive, now=NOW)
+        return result, again, oldest, await _hot_count(sessions)
+
+    result, again, oldest, hot = _with_history(run_db, tmp_path, scenario)
+    # Enero y febrero (3 filas cada 4 días) salen de la tabla
+    assert result == {"cutoff": "2024-03-01T00:00:00", "rows": 45, "batches": 5}
+    assert again["rows"] == 0
+    assert hot == 45 and oldest >= datetime(2024, 3, 1)
+    archive = HistoryArchive(str(tmp_path / "archive"))
+    assert archive.months(1) == archive.months(2) == ["2024-01", "2024-02"]
+    with gzip.open(tmp_path / "archive" / "user=1" / "2024-01.ndjson.gz") as f:
+        line = json.loads(f.readline())
+    assert set(line) == {"id", "user_id", "created_at", "symptoms", "diagnosis_result", "detected"}
+
+
+def test_history_pages_read_through_to_the_archive(run_db, tmp_path):
+    async def scenario(sessions, archive):
+        before = [await _all_pages(sessions, archive, u, 7) for u in (1, 2)]
+        await archive_old_rows(3, batch_rows=10, sessions=sessions, archive=archive, now=NOW)
+        after = [await _all_pages(sessions, archive, u, 7) for u in (1, 2)]
+        # Página que mezcla filas calientes y archivadas
+        async with sessions() as db:
+            rows, _ = await history_archive.fetch_page(db, 1, 50, archive=archive)
+            body = json.loads(history_db.page_json(rows, None))
+        return before, after, body
+
+    before, after, body = _with_history(run_db, tmp_path, scenario)
+    assert after == before
+    assert len(after[0]) == len(set(after[0])) == 45
+    assert body["items"][0]["date"].startswith("2024-04")
+    assert body["items"][-1]["symptoms"] == ["s0"] and body["items"][-1]["date"].startswith("2024-01")
+
+
+def test_interrupted_batch_is_not_duplicated(run_db, tmp_path):
+    async def scenario(sessions, archive):
+        # Lote escrito en el archivo pero no borrado de la base (job interrumpido)
+        async with sessions() as db:
+            rows = (await db.execute(
+                select(models.History.id, models.History.user_id, models.History.created_at,
+                       models.History.symptoms, models.History.diagnosis_result, models.History.detected)
+                .order_by(models.History.id).limit(10))).all()
+        archive.append(rows)
+        await archive_old_rows(3, batch_rows=10, sessions=sessions, archive=archive, now=NOW)
+        return await _all_pages(sessions, archive, 1, 10)
+
+    ids = _with_history(run_db, tmp_path, scenario)
+    assert len(ids) == len(set(ids)) == 45
+
+
+def test_export_includes_archived_rows_first(run_db, tmp_path):
+    async def scenario(sessions, archive):
+        await archive_old_rows(3, batch_rows=10, sessions=sessions, archive=archive, now=NOW)
+        out = {}
+        for fmt in ("ndjson", "csv"):
+            chunks = history_archive.export_rows(1, fmt, sessions=sessions, archive=archive)
+            out[fmt] = b"".join([chunk async for chunk in chunks]).decode()
+        return out
+
+    out = _with_history(run_db, tmp_path, scenario)
+    items = [json.loads(line) for line in out["ndjson"].splitlines()]
+    assert len(items) == 45
+    assert [i["date"] for i in items] == sorted(i["date"] for i in items)
+    csv_lines = out["csv"].splitlines()
+    assert csv_lines[0] == "id,date,symptoms,diagnoses"
+    assert len(csv_lines) == 46
+
+
+def test_archived_rows_can_be_deleted(run_db, tmp_path):
+    async def scenario(sessions, archive):
+        await archive_old_rows(3, batch_rows=10, sessions=sessions, archive=archive, now=NOW)
+        target = (await _all_pages(sessions, archive, 1, 50))[-1]
+        row = archive.delete(1, target)
+        results = (row, archive.delete(1, target), archive.delete(1, target + 1))
+        return target, results, await _all_pages(sessions, archive, 1, 7)
+
+    target, (row, again, other_user), ids = _with_history(run_db, tmp_path, scenario)
+    assert row.id == target and row.created_at == datetime(2024, 1, 1)
+    # Un segundo borrado, o el de una fila de otro usuario, no encuentran nada
+    assert again is None and other_user is None
+    assert target not in ids and len(ids) == 44
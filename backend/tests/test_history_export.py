@@ -0,0 +1,74 @@
+import asyncio
+import gc
+import json
+import sqlite3
+import zlib
+
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from app.database import Base, make_engine
+from app.services import history_db
+from app.services.memory_report import process_memory
+
+ROWS = 1_000_000
+DIAGNOSIS = json.dumps([{"condition": "Gripe Estacional", "confidence": 0.37, "recommendation": "Reposo"}])
+
+
+def _seed(path, rows):
+    engine = make_engine(f"sqlite:///{path}", name="test-export-seed")
+    Base.metadata.create_all(engine)
+    engine.dispose()
+    with sqlite3.connect(path) as conn:
+        conn.execute("INSERT INTO users (id, email, password_hash) VALUES (1, 'ana@example.com', 'x')")
+        conn.execute(
+            "WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n WHERE i < ?) "
+            "INSERT INTO history (user_id, symptoms, diagnosis_result, created_at) "
+            "SELECT 1, 'fiebre, tos seca', ?, datetime('2024-01-01', '+' || i || ' seconds') FROM n",
+            (rows, DIAGNOSIS),
+        )
+
+
+def _export(path, fmt):
+    async def run():
+        engine = create_async_engine(f"sqlite+aiosqlite:///{path}")
+        chunks = history_db.export_rows(1, fmt, chunk_rows=1000, sessions=async_sessionmaker(engine))
+        gc.collect()
+        baseline = process_memory()["rss_mb"]
+        peak, total, first, last = baseline, 0, None, b""
+        async for chunk in chunks:
+            peak = max(peak, process_memory()["rss_mb"]) if total % 50 == 0 else peak
+            first = first or chunk
+            total += 1
+            last = chunk
+        await engine.dispose()
+        return peak - baseline, total, first, last
+
+    return asyncio.run(run())
+
+
+def test_export_of_1m_rows_streams_with_bounded_memory(tmp_path):
+    path = tmp_path / "export.db"
+    _seed(path, ROWS)
+    growth_mb, chunks, first, last = _export(path, "ndjson")
+    # ~180 MB de NDJSON: en memoria de una vez crecería cientos de MB
+    assert chunks == ROWS // 1000
+    assert growth_mb < 40
+    row = json.loads(first.split(b"\n", 1)[0])
+    assert (row["id"], row["symptoms"], row["diagnoses"][0]["condition"]) == (1, ["fiebre", "tos seca"], "Gripe Estacional")
+    assert json.loads(last.rstrip(b"\n").rsplit(b"\n", 1)[-1])["id"] == ROWS
+
+
+def test_csv_export_with_gzip(tmp_path):
+    path = tmp_path / "export.db"
+    _seed(path, 2500)
+
+    async def collect():
+        engine = create_async_engine(f"sqlite+aiosqlite:///{path}")
+        chunks = history_db.gzip_chunks(history_db.export_rows(1, "csv", sessions=async_sessionmaker(engine)))
+        data = b"".join([chunk async for chunk in chunks])
+        await engine.dispose()
+        return data
+
+    lines = zlib.decompress(asyncio.run(collect()), 31).decode().splitlines()
+    assert lines[0] == "id,date,symptoms,diagnoses"
+    assert len(lines) == 2501 and lines[1].startswith('1,2024-01-01T00:00:01,"[""fiebre"", ""tos seca""]"')
@@ -0,0 +1,88 @@
+import json
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import insert, text
+
+from app import models
+from app.schemas import Diagnosis
+from app.services import history_db
+
+
+def _with_history(run_db, scenario):
+    async def seeded(sessions):
+        start = datetime(2024, 1, 1)
+        async with sessions() as db:
+            # Varias filas por segundo (TIMESTAMP de MySQL): el id desempata dentro del mismo instante
+            await db.execute(insert(models.History), [
+                {"user_id": 1 + i % 2, "symptoms": f"s{i}", "diagnosis_result": "[]",
+                 "created_at": start + timedelta(seconds=i // 6)}
+                for i in range(60)
+            ])
+            await db.commit()
+            return await scenario(db)
+
+    return run_db(seeded)
+
+
+def test_pages_cover_history_in_order_without_gaps(run_db):
+    async def scenario(db):
+        pages, cursor = [], None
+        while True:
+            rows, cursor = await history_db.fetch_page(db, 1, limit=7, before=cursor)
+            page = json.loads(history_db.page_json(rows, cursor))
+            assert page["next_cursor"] == cursor
+            pages.append(page["items"])
+            if cursor is None:
+                return pages
+
+    pages = _with_history(run_db, scenario)
+    ids = [item["id"] for page in pages for item in page]
+    assert [len(page) for page in pages] == [7, 7, 7, 7, 2]
+    # Ids de este usuario de más reciente a más antiguo, sin repetidos ni huecos
+    assert ids == list(range(59, 0, -2))
+    assert pages[0][0]["symptoms"] == ["s58"]
+
+
+def test_page_query_uses_composite_index(run_db):
+    async def scenario(db):
+        cursor = history_db.encode_cursor(datetime(2024, 1, 1, 0, 0, 5), 40)
+        plan = await db.execute(text(
+            "EXPLAIN QUERY PLAN SELECT id FROM history WHERE user_id = 1 AND "
+            "(created_at < :c OR (created_at = :c AND id < 40)) ORDER BY created_at DESC, id DESC LIMIT 8"
+        ), {"c": "2024-01-01 00:00:05"})
+        rows, _ = await history_db.fetch_page(db, 1, limit=3, before=cursor)
+        return " ".join(str(row) for row in plan), rows
+
+    plan, items = _with_history(run_db, scenario)
+    assert "ix_history_user_created" in plan and "TEMP B-TREE" not in plan
+    assert [row.id for row in items] == [35, 33, 31]
+
+
+def test_stored_json_is_served_verbatim_and_legacy_rows_still_read():
+    diagnoses = [Diagnosis(condition="Gripe", confidence=0.5, recommendation="Reposo, líquidos")]
+    row = history_db.history_row(1, ["dolor de cabeza, fuerte", "tos"], diagnoses)
+    stored = (7, datetime(2024, 1, 1), row["symptoms"], row["diagnosis_result"])
+    legacy = (6, datetime(2023, 1, 1), "fiebre, tos", '[{"condition": "Gripe", "confidence": 0.5, "recommendation": "x"}]')
+    page = json.loads(history_db.page_json([stored, legacy], None))
+    # Un síntoma con coma ya no se parte en dos
+    assert page["items"][0]["symptoms"] == ["dolor de cabeza, fuerte", "tos"]
+    assert page["items"][0]["diagnoses"] == [d.model_dump() for d in diagnoses]
+    assert page["items"][1]["symptoms"] == ["fiebre", "tos"]
+    assert page["next_cursor"] is None
+
+
+def test_non_array_legacy_values_are_not_spliced():
+    # Solo filas antiguas (texto, no array JSON) pasan por el camino lento; el resto se copia
+    rows = [
+        (2, datetime(2024, 1, 2), '{"a": 1}', "no es json"),
+        (1, datetime(2024, 1, 1), "fiebre", None),
+    ]
+    page = json.loads(history_db.page_json(rows, None))
+    assert [i["symptoms"] for i in page["items"]] == [['{"a": 1}'], ["fiebre"]]
+    assert [i["diagnoses"] for i in page["items"]] == [[], []]
+
+
+def test_invalid_cursor_is_rejected():
+    with pytest.raises(history_db.InvalidCursor):
+        history_db.decode_cursor("no-es-un-cursor")
@@ -0,0 +1,129 @@
+import json
+import multiprocessing
+import os
+
+from app.services.history_repo import HistoryLog
+
+
+def _log(tmp_path):
+    return HistoryLog(str(tmp_path / "history.jsonl"))
+
+
+def test_add_appends_one_line_and_lists_newest_first(tmp_path):
+    log = _log(tmp_path)
+    for i in range(5):
+        log.add([f"s{i}"], {"n": i}, user_id="u1")
+        assert len(open(log.path, "rb").read().splitlines()) == i + 1
+
+    page = log.list(limit=2)
+    assert [r["result"]["n"] for r in page] == [4, 3]
+    assert [r["result"]["n"] for r in log.list(limit=2, offset=2)] == [2, 1]
+    assert [r["result"]["n"] for r in log.list(limit=2, offset=4)] == [0]
+    assert log.list(limit=2, offset=5) == []
+
+
+def test_list_by_user(tmp_path):
+    log = _log(tmp_path)
+    log.add(["a"], 1, user_id="u1")
+    log.add(["b"], 2, user_id="u2")
+    log.add(["c"], 3, user_id="u1")
+
+    assert [r["result"] for r in log.list(user_id="u1")] == [3, 1]
+    assert [r["result"] for r in log.list(user_id="u2")] == [2]
+    assert log.list(user_id="nadie") == []
+
+
+def test_delete_writes_tombstone(tmp_path):
+    log = _log(tmp_path)
+    keep = log.add(["a"], 1, user_id="u1")
+    gone = log.add(["b"], 2, user_id="u1")
+
+    assert log.delete(gone["id"]) is True
+    assert log.delete(gone["id"]) is False
+    assert [r["id"] for r in log.list(user_id="u1")] == [keep["id"]]
+    last = json.loads(open(log.path, "rb").read().splitlines()[-1])
+    assert last == {"deleted": gone["id"]}
+
+
+def test_index_is_rebuilt_from_file(tmp_path):
+    log = _log(tmp_path)
+    a = log.add(["a"], 1)
+    b = log.add(["b"], 2)
+    log.delete(a["id"])
+
+    reopened = _log(tmp_path)
+    assert [r["id"] for r in reopened.list()] == [b["id"]]
+
+
+def test_second_instance_sees_appends_and_deletes(tmp_path):
+    # Dos instancias sobre el mismo fichero = dos workers
+    w1, w2 = _log(tmp_path), _log(tmp_path)
+    a = w1.add(["a"], 1)
+    assert [r["id"] for r in w2.list()] == [a["id"]]
+    b = w2.add(["b"], 2)
+    w2.delete(a["id"])
+    assert [r["id"] for r in w1.list()] == [b["id"]]
+
+
+def test_compaction_drops_dead_records(tmp_path):
+    w1, w2 = _log(tmp_path), _log(tmp_path)
+    records = [w1.add([str(i)], i, user_id="u1") for i in range(10)]
+    for rec in records[:8]:
+        w1.delete(rec["id"])
+    size_before = os.path.getsize(w1.path)
+
+    assert w1.compact() is True
+    assert os.path.getsize(w1.path) < size_before
+    assert len(open(w1.path, "rb").read().splitlines()) == 2
+    assert w1.stats()["dead_bytes"] == 0
+    # El otro "worker" detecta el fichero nuevo y rehace su índice
+    assert [r["result"] for r in w2.list(user_id="u1")] == [9, 8]
+    # Con pocos registros borrados no merece la pena
+    assert w1.compact() is False
+
+
+def test_partial_line_is_skipped_and_overwritten(tmp_path):
+    log = _log(tmp_path)
+    a = log.add(["a"], 1)
+    with open(log.path, "ab") as f:
+        f.write(b'{"id":"roto","user_')
+
+    reopened = _log(tmp_path)
+    assert [r["id"] for r in reopened.list()] == [a["id"]]
+    b = reopened.add(["b"], 2)
+    assert [r["id"] for r in _log(tmp_path).list()] == [b["id"], a["id"]]
+
+
+def test_import_legacy_json(tmp_path):
+    legacy = tmp_path / "history.json"
+    legacy.write_text(json.dumps([
+        {"id": "2", "input_symptoms": ["b"], "result": 2, "created_at": "x"},
+        {"id": "1", "input_symptoms": ["a"], "result": 1, "created_at": "x"},
+    ]))
+    log = _log(tmp_path)
+    assert log.import_legacy(str(legacy)) == 2
+    assert [r["id"] for r in log.list()] == ["2", "1"]
+    # Solo se migra una vez
+    assert log.import_legacy(str(legacy)) == 0
+
+
+def _add_many(path, worker, count):
+    log = HistoryLog(path)
+    for i in range(count):
+        log.add([f"w{worker}"], i, user_id=f"u{worker}")
+
+
+def test_concurrent_processes_do_not_interleave(tmp_path):
+    path = str(tmp_path / "history.jsonl")
+    procs = [multiprocessing.Process(target=_add_many, args=(path, w, 50)) for w in range(4)]
+    for p in procs:
+        p.start()
+    for p in procs:
+        p.join()
+
+    lines = open(path, "rb").read().splitlines()
+    assert len(lines) == 200
+    assert all(json.loads(line)["id"] for line in lines)
+    log = HistoryLog(path)
+    for w in range(4):
+        assert len(log.list(limit=100, user_id=f"u{w}")) == 50
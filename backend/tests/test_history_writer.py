@@ -0,0 +1,73 @@
+from datetime import datetime
+
+import pytest
+from sqlalchemy import func, select
+
+from app import models
+from app.services.history_writer import HistoryQueueFull, HistoryWriter
+
+
+def _row(user_id, n):
+    return {"user_id": user_id, "symptoms": f"s{n}", "diagnosis_result": "[]", "created_at": datetime.utcnow()}
+
+
+async def _count(sessions, user_id):
+    async with sessions() as db:
+        return await db.scalar(select(func.count()).select_from(models.History)
+                               .where(models.History.user_id == user_id))
+
+
+def test_rows_are_batched_readable_by_their_user_and_flushed_on_stop(run_db):
+    async def scenario(sessions):
+        writer = HistoryWriter(interval_ms=60_000, sessions=sessions)
+        writer.start()
+        await writer.enqueue([_row(1, n) for n in range(3)])
+        await writer.enqueue([_row(2, n) for n in range(2)])
+        before = await _count(sessions, 1)
+        # El intervalo no ha vencido: la lectura del usuario fuerza la escritura
+        await writer.wait_for_user(1)
+        after = await _count(sessions, 1)
+        await writer.enqueue([_row(2, 9)])
+        await writer.stop()
+        return before, after, await _count(sessions, 2), writer.stats()
+
+    before, after, user2, stats = run_db(scenario)
+    assert (before, after, user2) == (0, 3, 3)
+    assert (stats["flushes"], stats["flushed_rows"], stats["queue_depth"]) == (2, 6, 0)
+    assert stats["read_your_writes_waits"] == 1
+
+
+def test_full_queue_applies_backpressure(run_db):
+    async def scenario(sessions):
+        # Sin arrancar la tarea nada vacía la cola
+        writer = HistoryWriter(queue_max=2, enqueue_timeout=0.05, sessions=sessions)
+        await writer.enqueue([_row(1, 0), _row(1, 1)])
+        with pytest.raises(HistoryQueueFull):
+            await writer.enqueue([_row(1, 2)])
+        writer.start()
+        await writer.wait_for_user(1)
+        await writer.stop()
+        return await _count(sessions, 1), writer.stats()
+
+    rows, stats = run_db(scenario)
+    assert rows == 2
+    assert (stats["rejected"], stats["queue_depth_max"]) == (1, 2)
+
+
+def test_rows_of_a_rejected_call_are_not_queued(run_db):
+    async def scenario(sessions):
+        writer = HistoryWriter(queue_max=3, enqueue_timeout=0.05, sessions=sessions)
+        await writer.enqueue([_row(1, 0), _row(1, 1)])
+        # Solo cabe una de las dos filas: no se encola ninguna
+        with pytest.raises(HistoryQueueFull):
+            await writer.enqueue([_row(2, 0), _row(2, 1)])
+        writer.start()
+        await writer.wait_for_user(1)
+        await writer.wait_for_user(2)
+        await writer.enqueue([_row(2, 2), _row(2, 3)])
+        await writer.stop()
+        return await _count(sessions, 1), await _count(sessions, 2), writer.stats()
+
+    user1, user2, stats = run_db(scenario)
+    assert (user1, user2) == (2, 2)
+    assert (stats["rejected"], stats["enqueued"]) == (1, 4)
@@ -0,0 +1,94 @@
+import asyncio
+import json
+import time
+
+from app.services import ai_stub, coalescer, inference
+from app.services.inference import EngineOverloaded, EngineTimeout, InferenceEngine
+from app.services.kb_artifacts import KB_SOURCE, load_source
+
+
+def _conditions(diagnoses):
+    return [(d.condition, d.confidence) for d in diagnoses]
+
+
+def test_inprocess_engine_matches_direct_call():
+    engine = InferenceEngine(mode="inprocess")
+    result = asyncio.run(engine.diagnose(["fiebre", "tos"]))
+    assert _conditions(result) == _conditions(ai_stub.suggest_diagnoses(["fiebre", "tos"]))
+    assert engine.stats()["completed"] == 1
+
+
+def test_inprocess_engine_coalesces_without_holding_threads(monkeypatch):
+    monkeypatch.setattr(coalescer, "COALESCE_ENABLED", True)
+
+    def no_threadpool(*args, **kwargs):
+        raise AssertionError("las peticiones sueltas no deberían ocupar el threadpool")
+
+    monkeypatch.setattr(inference, "run_in_threadpool", no_threadpool)
+    engine = InferenceEngine(mode="inprocess", coalesce=True)
+
+    async def run():
+        return await asyncio.gather(*(engine.diagnose(["fiebre", "tos"]) for _ in range(8)))
+
+    try:
+        results = asyncio.run(run())
+        stats = coalescer.get_coalescer().stats()
+    finally:
+        coalescer.shutdown_coalescer()
+    expected = _conditions(ai_stub.suggest_diagnoses(["fiebre", "tos"]))
+    assert all(_conditions(r) == expected for r in results)
+    assert stats["items"] == 8 and 1 <= stats["batches"] < 8
+
+
+def test_engine_rejects_when_full_and_times_out(monkeypatch):
+    def slow_batch(symptom_lists):
+        time.sleep(0.3)
+        return [ai_stub.DiagnosisResult([], []) for _ in symptom_lists]
+
+    monkeypatch.setattr(ai_stub, "analyze_batch", slow_batch)
+    engine = InferenceEngine(mode="inprocess", max_pending=1, timeout=0.1)
+
+    async def run():
+        return await asyncio.gather(engine.diagnose_batch([["a"], ["b"]]), engine.diagnose_batch([["c"], ["d"]]),
+                                    return_exceptions=True)
+
+    results = asyncio.run(run())
+    assert {type(r) for r in results} == {EngineOverloaded, EngineTimeout}
+    stats = engine.stats()
+    assert (stats["rejected"], stats["timeouts"], stats["pending"]) == (1, 1, 0)
+
+
+def test_process_engine_follows_kb_reloads(tmp_path):
+    engine = InferenceEngine(mode="process", workers=1, timeout=30)
+    engine.start()
+    try:
+        result = asyncio.run(engine.diagnose(["fiebre", "tos"]))
+        assert _conditions(result) == _conditions(ai_stub.suggest_diagnoses(["fiebre", "tos"]))
+
+        source = load_source(KB_SOURCE)
+        source.kb["Fiebre Aislada"] = {"fiebre": 1.0}
+        path = tmp_path / "kb.json"
+        path.write_text(json.dumps(source._asdict(), ensure_ascii=False), encoding="utf-8")
+        ai_stub.reload_index(str(path), artifact_dir=str(tmp_path / "artifacts"))
+        result = asyncio.run(engine.diagnose(["fiebre"]))
+        assert result[0].condition == "Fiebre Aislada"
+    finally:
+        engine.stop()
+        ai_stub.reload_index()
+
+
+def test_process_engine_coalesces_single_requests():
+    engine = InferenceEngine(mode="process", workers=1, timeout=30, coalesce=True)
+    engine.start()
+    try:
+        async def run():
+            return await asyncio.gather(*(engine.diagnose(["fiebre", "tos"]) for _ in range(8)))
+
+        results = asyncio.run(run())
+        stats = engine.coalescer.stats()
+    finally:
+        engine.stop()
+    expected = _conditions(ai_stub.suggest_diagnoses(["fiebre", "tos"]))
+    assert all(_conditions(r) == expected for r in results)
+    assert stats["items"] == 8 and 1 <= stats["batches"] < 8
+    assert engine.coalescer is None
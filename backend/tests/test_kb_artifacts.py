@@ -0,0 +1,86 @@
+import json
+import os
+import threading
+
+import numpy as np
+import pytest
+
+from app.services import ai_stub
+from app.services.kb_artifacts import (KB_SOURCE, SourceWatcher, ensure_artifact, load_source, parse_source,
+                                       touch_source)
+
+
+def test_artifact_is_keyed_by_content_and_memory_mapped(tmp_path):
+    source = load_source(KB_SOURCE)
+    path = ensure_artifact(source, ai_stub._compile_arrays, str(tmp_path))
+    assert path.endswith(ai_stub.get_index().version)
+
+    def fail(source):
+        raise AssertionError("no debería recompilar")
+
+    assert ensure_artifact(source, fail, str(tmp_path)) == path
+
+    index = ai_stub.KnowledgeIndex.from_artifact(path)
+    assert _is_mapped(index.scorer.weights.data)
+    assert _is_mapped(index.matcher.index.postings.indices)
+
+
+def _is_mapped(array):
+    while array is not None and not isinstance(array, np.memmap):
+        array = getattr(array, "base", None)
+    return array is not None
+
+
+def test_artifact_index_matches_in_memory_index(tmp_path):
+    source = load_source(KB_SOURCE)
+    in_memory = ai_stub.KnowledgeIndex.from_source(source)
+    mapped = ai_stub.KnowledgeIndex.from_artifact(ensure_artifact(source, ai_stub._compile_arrays, str(tmp_path)))
+    assert mapped.version == in_memory.version
+    fragments = ["dolor de cabeza", "tos seca", "fievre", "xyz"]
+    assert mapped.matcher.match_fragments(fragments) == in_memory.matcher.match_fragments(fragments)
+    texts = ["fievre, dolr de cabesa", "calentrua"]
+    assert mapped.normalizer.fragments(texts) == in_memory.normalizer.fragments(texts)
+    detected = ["fiebre", "tos", "dolor muscular"]
+    assert mapped.scorer.top_k(detected) == in_memory.scorer.top_k(detected)
+
+
+def test_concurrent_workers_compile_once(tmp_path):
+    source = load_source(KB_SOURCE)
+    calls = []
+
+    def build(source):
+        calls.append(1)
+        return ai_stub._compile_arrays(source)
+
+    paths = []
+    threads = [threading.Thread(target=lambda: paths.append(ensure_artifact(source, build, str(tmp_path))))
+               for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert len(calls) == 1
+    assert len(set(paths)) == 1
+
+
+def test_invalid_source_is_rejected(tmp_path):
+    with pytest.raises(ValueError):
+        parse_source({"kb": {}})
+    path = tmp_path / "kb.json"
+    path.write_text(json.dumps({"kb": {"A": 1}, "recs": {}, "synonyms": {}, "stopwords": []}))
+    with pytest.raises(ValueError):
+        load_source(str(path))
+
+
+def test_touching_the_source_wakes_every_watcher(tmp_path):
+    path = tmp_path / "kb.json"
+    path.write_text("{}")
+    os.utime(path, (1_000_000, 1_000_000))
+    calls = []
+    # Un watcher por worker; ninguno ve cambios hasta que el fichero se toca
+    watchers = [SourceWatcher(str(path), lambda n=n: calls.append(n)) for n in range(3)]
+    assert not any(w.check() for w in watchers)
+    assert touch_source(str(path))
+    assert all(w.check() for w in watchers)
+    assert calls == [0, 1, 2]
+    assert not touch_source(str(tmp_path / "missing.json"))
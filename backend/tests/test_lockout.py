@@ -0,0 +1,44 @@
+import asyncio
+from datetime import datetime
+
+from sqlalchemy import event
+
+from app import auth, models
+
+
+USER_ID = 1
+
+
+def test_parallel_failures_are_all_counted(run_db):
+    async def scenario(sessions):
+        async def attempt():
+            async with sessions() as db:
+                return await auth.record_failed_login(db, USER_ID)
+
+        results = await asyncio.gather(*(attempt() for _ in range(20)))
+        async with sessions() as db:
+            user = await db.get(models.User, USER_ID)
+        return results, user
+
+    results, user = run_db(scenario)
+    # Cada intento ve un contador distinto: ninguno se pierde
+    assert sorted(attempts for attempts, _ in results) == list(range(1, 21))
+    assert user.failed_login_attempts == 20
+    assert user.locked_until > datetime.utcnow()
+    assert all((locked is None) == (attempts < auth.MAX_FAILED_LOGINS) for attempts, locked in results)
+
+
+def test_failed_attempt_is_a_single_write(run_db):
+    async def scenario(sessions):
+        statements = []
+        event.listen(sessions.kw["bind"].sync_engine, "before_cursor_execute",
+                     lambda conn, cursor, sql, *args: statements.append(sql.split()[0].upper()))
+        async with sessions() as db:
+            await auth.record_failed_login(db, USER_ID)
+            await auth.reset_login_state(db, USER_ID)
+            user = await db.get(models.User, USER_ID)
+        return statements, user
+
+    statements, user = run_db(scenario)
+    assert statements[:2] == ["UPDATE", "UPDATE"]
+    assert (user.failed_login_attempts, user.locked_until) == (0, None)
@@ -0,0 +1,18 @@
+import sys
+
+import pytest
+
+from app.services import memory_report
+
+
+@pytest.mark.skipif(not sys.platform.startswith("linux"), reason="smaps_rollup solo existe en Linux")
+def test_process_memory_reports_rss_and_pss():
+    report = memory_report.process_memory()
+    assert report["rss_mb"] > 0
+    assert 0 < report["pss_mb"] <= report["rss_mb"] + 0.01
+
+
+def test_memory_stats_keeps_snapshots():
+    memory_report.snapshot("test")
+    stats = memory_report.memory_stats()
+    assert {"test", "current"} <= set(stats)
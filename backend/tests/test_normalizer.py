@@ -0,0 +1,26 @@
+from app.services.ai_stub import STOPWORDS, SYNONYMS
+from app.services.normalizer import Normalizer
+
+normalizer = Normalizer(SYNONYMS, STOPWORDS)
+
+
+def test_single_word_synonyms_and_stopwords():
+    assert normalizer.fragments(["tengo mucha calentura"]) == ["fiebre"]
+    assert normalizer.normalize("me duele la panza") == "duele dolor abdominal"
+
+
+def test_splits_on_punctuation_and_connectors_only():
+    assert normalizer.fragments(["tos, fiebre y mareo. ademas nauseas"]) == ["tos", "fiebre", "mareo", "nauseas"]
+    # La 'y' dentro de una palabra no corta el fragmento
+    assert normalizer.fragments(["muy mayor"]) == ["mayor"]
+
+
+def test_negated_fragments_are_dropped():
+    assert normalizer.fragments(["no tengo fiebre, tos"]) == ["tos"]
+    assert normalizer.fragments(["sin tos"]) == []
+
+
+def test_multi_word_synonyms():
+    assert normalizer.fragments(["estoy sin fuerzas"]) == ["estoy fatiga extrema"]
+    # Empieza por "sin" pero es un sinónimo, no una negación
+    assert normalizer.fragments(["sin fuerzas"]) == ["fatiga extrema"]
@@ -0,0 +1,36 @@
+import asyncio
+import threading
+
+import pytest
+from passlib.context import CryptContext
+
+from app import auth
+from app.services.password_hasher import HasherOverloaded, PasswordHasher
+
+
+def test_full_queue_is_rejected():
+    hasher = PasswordHasher(workers=1, max_pending=1)
+    release = threading.Event()
+
+    async def run():
+        first = asyncio.ensure_future(hasher.run(release.wait))
+        await asyncio.sleep(0)
+        with pytest.raises(HasherOverloaded):
+            await hasher.run(lambda: None)
+        release.set()
+        return await first
+
+    assert asyncio.run(run()) is True
+    stats = hasher.stats()
+    assert (stats["completed"], stats["rejected"], stats["pending"]) == (1, 1, 0)
+    hasher.stop()
+
+
+def test_login_rehashes_with_configured_cost(monkeypatch):
+    old_hash = CryptContext(schemes=["bcrypt"], bcrypt__rounds=4).hash("secreta")
+    monkeypatch.setattr(auth, "pwd_context", CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=5))
+
+    assert auth.verify_and_rehash("otra", old_hash) == (False, None)
+    valid, new_hash = auth.verify_and_rehash("secreta", old_hash)
+    assert valid and new_hash.startswith("$2b$05$")
+    assert auth.verify_and_rehash("secreta", new_hash) == (True, None)
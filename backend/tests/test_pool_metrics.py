@@ -0,0 +1,42 @@
+import asyncio
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+
+from app.database import make_engine
+from app.services.pool_metrics import get_monitor
+
+
+def test_pool_reports_in_use_waits_and_timeouts(tmp_path):
+    engine = make_engine(f"sqlite:///{tmp_path / 'pool.db'}", name="test-timeouts",
+                         pool_size=1, max_overflow=0, pool_timeout=0.05)
+    held = engine.connect()
+    with pytest.raises(PoolTimeoutError):
+        engine.connect()
+    held.close()
+    with engine.connect() as conn:
+        conn.execute(text("SELECT 1"))
+    stats = get_monitor("test-timeouts").stats()
+    assert (stats["timeouts"], stats["in_use"], stats["in_use_max"], stats["checkouts"]) == (1, 0, 1, 2)
+    assert stats["wait_max_ms"] >= 50
+    assert (stats["size"], stats["max_overflow"], stats["open"]) == (1, 0, 1)
+    engine.dispose()
+
+
+def test_sqlite_engines_use_wal(tmp_path):
+    engine = make_engine(f"sqlite:///{tmp_path / 'wal.db'}", name="test-wal")
+    with engine.connect() as conn:
+        assert conn.execute(text("PRAGMA journal_mode")).scalar() == "wal"
+    engine.dispose()
+
+    async def run():
+        async_engine = make_engine(f"sqlite+aiosqlite:///{tmp_path / 'wal-async.db'}", asynchronous=True,
+                                   name="test-wal-async")
+        async with async_engine.connect() as conn:
+            mode = (await conn.execute(text("PRAGMA journal_mode"))).scalar()
+        await async_engine.dispose()
+        return mode
+
+    assert asyncio.run(run()) == "wal"
+    assert get_monitor("test-wal-async").stats()["pool"] == "InstrumentedAsyncAdaptedQueuePool"
@@ -0,0 +1,73 @@
+import json
+
+import numpy as np
+import pytest
+
+from app.services import ai_stub, question_tree
+from app.services.kb_artifacts import KB_SOURCE, load_source
+from app.services.question_tree import QuestionTree
+
+
+def _naive_gains(tree, posterior):
+    """Ganancia de información síntoma a síntoma, recorriendo todas las condiciones."""
+    def entropy(p):
+        return -sum(x * np.log(x) for x in p if x > 0)
+
+    gains = []
+    for col in range(len(tree.symptoms)):
+        gain = entropy(posterior)
+        for present in (True, False):
+            joint = posterior * tree._likelihood(col, present)
+            gain -= joint.sum() * entropy(joint / joint.sum())
+        gains.append(gain)
+    return np.array(gains)
+
+
+def test_sparse_gains_match_naive_computation():
+    tree = QuestionTree(ai_stub.get_index())
+    for answers in ({}, {0: True}, {0: True, 3: False, 10: True}):
+        posterior = tree.posterior(answers)
+        assert np.allclose(tree.gains(posterior), _naive_gains(tree, posterior))
+
+
+def test_tree_walk_matches_on_demand_choice():
+    tree = QuestionTree(ai_stub.get_index(), max_depth=4)
+    answers = {}
+    for present in (True, False, True, False):
+        walked = tree.next_question(answers)
+        assert walked.source == "tree"
+        computed = tree._compute(answers)
+        assert walked.symptom == computed.symptom
+        assert walked.information_gain == pytest.approx(computed.information_gain)
+        answers[tree.symptom_index[walked.symptom]] = present
+    # Más allá de la profundidad precalculada se calcula al pedirlo
+    assert tree.next_question(answers).source == "computed"
+
+
+def test_off_path_answers_are_computed_and_cached():
+    tree = QuestionTree(ai_stub.get_index())
+    root = tree.next_question({})
+    other = next(col for col, s in enumerate(tree.symptoms) if s != root.symptom)
+    first = tree.next_question({other: True})
+    assert first.source == "computed" and first.symptom != tree.symptoms[other]
+    assert tree.next_question({other: True}) is first
+
+
+def test_unknown_symptoms_are_rejected():
+    with pytest.raises(ValueError):
+        question_tree.next_question(["no es un sintoma"], [])
+
+
+def test_tree_is_rebuilt_when_kb_changes(tmp_path):
+    before = question_tree.get_question_tree()
+    source = load_source(KB_SOURCE)
+    source.kb["Fiebre Aislada"] = {"fiebre": 1.0}
+    path = tmp_path / "kb.json"
+    path.write_text(json.dumps(source._asdict(), ensure_ascii=False), encoding="utf-8")
+    try:
+        ai_stub.reload_index(str(path), artifact_dir=str(tmp_path / "artifacts"))
+        after = question_tree.get_question_tree()
+        assert after is not before and after.version == ai_stub.get_index().version
+        assert "Fiebre Aislada" in after.conditions
+    finally:
+        ai_stub.reload_index()
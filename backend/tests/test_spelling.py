@@ -0,0 +1,34 @@
+from app.services import ai_stub
+from app.services.spelling import SpellingIndex
+
+
+def test_corrects_within_edit_distance():
+    speller = SpellingIndex(["calentura", "cabeza", "dolor"], max_distance=2)
+    assert speller.correct("calentrua") == "calentura"  # transposición
+    assert speller.correct("cabesa") == "cabeza"
+    assert speller.correct("dolr") == "dolor"
+    assert speller.correct("xyzzy") == "xyzzy"
+
+
+def test_short_and_known_words_are_not_corrected():
+    speller = SpellingIndex(["tos", "sed"], max_distance=2, known=["sin"])
+    assert speller.correct("toz") == "toz"
+    assert speller.correct("sin") == "sin"
+    assert SpellingIndex(["calentura"], max_distance=0).correct("calentrua") == "calentrua"
+
+
+def test_misspelled_inputs_match_like_correct_ones():
+    typo = ai_stub.suggest_diagnoses(["dolr de cabesa", "calentrua"])
+    correct = ai_stub.suggest_diagnoses(["dolor de cabeza", "calentura"])
+    assert [(d.condition, d.confidence) for d in typo] == [(d.condition, d.confidence) for d in correct]
+
+
+def test_exact_fragments_skip_tfidf(monkeypatch):
+    matcher = ai_stub.get_index().matcher
+    expected = matcher.exact["fiebre"]
+
+    def fail(*args, **kwargs):
+        raise AssertionError("no debería vectorizar")
+
+    monkeypatch.setattr(matcher.index, "search", fail)
+    assert matcher.match_fragments(["fiebre"]) == [expected]
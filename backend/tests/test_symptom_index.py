@@ -0,0 +1,34 @@
+import random
+
+from app.services import symptom_index
+from app.services.symptom_index import NgramIndex
+
+
+def _terms(n, seed=5):
+    rnd = random.Random(seed)
+    syllables = [c + v for c in "bcdfglmnprst" for v in "aeiou"]
+    words = {"".join(rnd.choice(syllables) for _ in range(rnd.randint(2, 4))) for _ in range(n)}
+    return sorted(words)
+
+
+def test_search_respects_threshold_and_top_k():
+    index = NgramIndex(["fiebre", "tos", "dolor de cabeza", "dolor de espalda"])
+    hits = index.search(["dolor de cabesa", "xyz"], top_k=2, threshold=0.15)
+    assert [index.terms[i] for i, _ in hits[0]] == ["dolor de cabeza", "dolor de espalda"]
+    assert hits[0][0][1] >= hits[0][1][1] >= 0.15
+    assert hits[1] == []
+
+
+def test_pruned_search_is_exact(monkeypatch):
+    terms = _terms(3000)
+    index = NgramIndex(terms)
+    queries = [t[:-1] + "x" for t in terms[::97]] + [t[1:] for t in terms[::131]] + ["zzz", "dolor de cabeza"]
+
+    monkeypatch.setattr(symptom_index, "PRUNE_MIN_TERMS", 10 ** 9)
+    full = index.search(queries)
+    monkeypatch.setattr(symptom_index, "PRUNE_MIN_TERMS", 0)
+    pruned = index.search(queries)
+
+    for a, b in zip(full, pruned):
+        assert [i for i, _ in a] == [i for i, _ in b]
+        assert all(abs(x - y) < 1e-9 for (_, x), (_, y) in zip(a, b))
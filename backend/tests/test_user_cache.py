@@ -0,0 +1,58 @@
+import asyncio
+import time
+from datetime import timedelta
+
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from app import auth, models
+from app.database import Base
+from app.services.user_cache import CachedUser, UserCache, get_user_cache
+
+ANA = CachedUser(1, "ana@example.com", "Ana", None)
+
+
+def test_entries_expire_with_ttl_or_token_exp():
+    cache = UserCache(ttl=60, maxsize=10)
+    cache.put("t1", ANA)
+    cache.put("t2", ANA, token_exp=time.time() - 1)
+    assert cache.get("t1") == ANA
+    assert cache.get("t2") is None
+    assert cache.stats()["expired"] == 1
+
+
+def test_invalidate_user_drops_all_tokens_and_stale_puts():
+    cache = UserCache(ttl=60, maxsize=2)
+    cache.put("t1", ANA)
+    cache.put("t2", ANA)
+    cache.put("t3", CachedUser(2, "bea@example.com", "Bea", None))
+    assert cache.get("t1") is None and cache.stats()["evictions"] == 1
+
+    generation = cache.generation
+    cache.invalidate_user(1)
+    assert cache.get("t2") is None and cache.get("t3") is not None
+    # Identidad leída antes de la invalidación: no se guarda
+    cache.put("t2", ANA, generation=generation)
+    assert cache.get("t2") is None
+
+
+def test_cached_token_skips_database(tmp_path):
+    async def run():
+        engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'test.db'}")
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        sessions = async_sessionmaker(engine, expire_on_commit=False)
+        async with sessions() as db:
+            user = models.User(email="ana@example.com", password_hash="x", full_name="Ana")
+            db.add(user)
+            await db.commit()
+            token = auth.create_access_token({"sub": user.email, "uid": user.id}, timedelta(minutes=5))
+            first = await auth.get_current_user(token=token, db=db)
+        await engine.dispose()
+        # Sin base: la segunda petición sale de la caché
+        second = await auth.get_current_user(token=token, db=None)
+        get_user_cache().invalidate_user(first.id)
+        return first, second
+
+    first, second = asyncio.run(run())
+    assert first == second
+    assert (first.id, first.email, first.full_name) == (1, "ana@example.com", "Ana")
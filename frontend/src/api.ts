@@ -9,6 +9,19 @@ export type DiagnoseResponse = {
   diagnoses: Diagnosis[]
 }
 
+export type DiagnosisSession = {
+  session_id: string
+  symptoms: string[]
+  detected: string[]
+  diagnoses: Diagnosis[]
+}
+
+export type NextQuestion = {
+  symptom: string | null
+  information_gain: number
+  candidates: { condition: string, probability: number }[]
+}
+
 export type User = {
   id: number
   email: string
@@ -23,6 +36,11 @@ export type HistoryItem = {
   diagnoses: Diagnosis[]
 }
 
+export type HistoryPage = {
+  items: HistoryItem[]
+  next_cursor: string | null
+}
+
 const base = import.meta.env.VITE_API_BASE_URL || 'http://localhost:8000'
 
 function getAuthHeader(): Record<string, string> {
@@ -107,8 +125,66 @@ export async function diagnose(symptoms: string[]): Promise<DiagnoseResponse> {
   return res.json()
 }
 
-export async function getHistory(): Promise<HistoryItem[]> {
-  const res = await fetch(`${base}/history`, {
+// El backend elige el síntoma que más separa las condiciones candidatas
+export async function getNextQuestion(yes: string[], no: string[]): Promise<NextQuestion> {
+  const res = await fetch(`${base}/diagnose/next-question`, {
+    method: 'POST',
+    headers: {
+      'Content-Type': 'application/json',
+      ...getAuthHeader()
+    },
+    body: JSON.stringify({ yes, no }),
+  })
+  if (!res.ok) throw new Error('Error al obtener la siguiente pregunta')
+  return res.json()
+}
+
+// Sesión de diagnóstico incremental: el servidor guarda el estado y solo procesa cada cambio
+export async function createDiagnosisSession(): Promise<DiagnosisSession> {
+  const res = await fetch(`${base}/diagnose/sessions`, {
+    method: 'POST',
+    headers: { ...getAuthHeader() }
+  })
+  if (!res.ok) throw new Error('Error al iniciar el diagnóstico')
+  return res.json()
+}
+
+export async function addSessionSymptom(sessionId: string, symptom: string): Promise<DiagnosisSession> {
+  const res = await fetch(`${base}/diagnose/sessions/${sessionId}/symptoms`, {
+    method: 'POST',
+    headers: {
+      'Content-Type': 'application/json',
+      ...getAuthHeader()
+    },
+    body: JSON.stringify({ symptom }),
+  })
+  if (!res.ok) throw new Error('Error al actualizar el diagnóstico')
+  return res.json()
+}
+
+export async function removeSessionSymptom(sessionId: string, symptom: string): Promise<DiagnosisSession> {
+  const res = await fetch(`${base}/diagnose/sessions/${sessionId}/symptoms/${encodeURIComponent(symptom)}`, {
+    method: 'DELETE',
+    headers: { ...getAuthHeader() }
+  })
+  if (!res.ok) throw new Error('Error al actualizar el diagnóstico')
+  return res.json()
+}
+
+export async function finalizeDiagnosisSession(sessionId: string): Promise<DiagnoseResponse> {
+  const res = await fetch(`${base}/diagnose/sessions/${sessionId}/finalize`, {
+    method: 'POST',
+    headers: { ...getAuthHeader() }
+  })
+  if (!res.ok) throw new Error('Error al obtener diagnóstico')
+  return res.json()
+}
+
+// Una página del historial; `before` es el next_cursor de la página anterior
+export async function getHistory(before?: string | null, limit = 20): Promise<HistoryPage> {
+  const params = new URLSearchParams({ limit: String(limit) })
+  if (before) params.set('before', before)
+  const res = await fetch(`${base}/history?${params}`, {
     headers: { ...getAuthHeader() }
   })
   if (!res.ok) throw new Error('Error al obtener historial')
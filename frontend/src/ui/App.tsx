@@ -3,7 +3,7 @@ import { SymptomForm } from './SymptomForm'
 import { Results } from './Results'
 import { History } from './History'
 import { GuidedQuestions } from './GuidedQuestions'
-import { diagnose, DiagnoseResponse } from '../api'
+import { diagnose, DiagnoseResponse, createDiagnosisSession, addSessionSymptom, removeSessionSymptom, finalizeDiagnosisSession } from '../api'
 import { AccessibilityMenu } from './AccessibilityMenu'
 import { LoginPage } from './LoginPage'
 import { RegisterPage } from './RegisterPage'
@@ -60,6 +60,10 @@ export function App() {
   const [redFlags, setRedFlags] = useState<string[]>([])
   const [ackRedFlags, setAckRedFlags] = useState(false)
   const alertRef = useRef<HTMLDivElement | null>(null)
+  // Sesión de diagnóstico en el servidor: cada respuesta envía solo el cambio
+  const sessionIdRef = useRef<string | null>(null)
+  const sessionSymptomsRef = useRef<string[]>([])
+  const sessionQueueRef = useRef<Promise<void>>(Promise.resolve())
 
   const L = {
     es: {
@@ -146,11 +150,36 @@ export function App() {
     }
   }, [redFlags.length])
 
+  const resetSession = useCallback(() => {
+    sessionIdRef.current = null
+    sessionSymptomsRef.current = []
+  }, [])
+
+  // Los cambios se aplican en orden; si algo falla, se descarta la sesión
+  // y el diagnóstico final se pide con la lista completa
+  const syncSession = useCallback((target: string[]) => {
+    const run = async () => {
+      if (!sessionIdRef.current) {
+        if (target.length === 0) return
+        sessionIdRef.current = (await createDiagnosisSession()).session_id
+      }
+      const id = sessionIdRef.current
+      const current = sessionSymptomsRef.current
+      for (const s of current.filter((s) => !target.includes(s))) await removeSessionSymptom(id, s)
+      for (const s of target.filter((s) => !current.includes(s))) await addSessionSymptom(id, s)
+      sessionSymptomsRef.current = target
+    }
+    const next = sessionQueueRef.current.then(run).catch(resetSession)
+    sessionQueueRef.current = next
+    return next
+  }, [resetSession])
+
   const onGuidedChange = useCallback((symptoms: string[], red: string[]) => {
     setGuidedSymptoms(symptoms)
     setRedFlags(red)
     setAckRedFlags(false)
-  }, [])
+    void syncSession(symptoms)
+  }, [syncSession])
 
   function handleSearch(query: string) {
     const q = query.toLowerCase()
@@ -169,7 +198,16 @@ export function App() {
     setLoading(true)
     try {
       const combined = Array.from(new Set([...guidedSymptoms, ...symptoms]))
-      const res = await diagnose(combined)
+      // Solo se usa la sesión si el cuestionario ya abrió una: un envío de texto
+      // libre sin respuestas guiadas es un único /diagnose, sin crear sesión
+      await sessionQueueRef.current
+      if (sessionIdRef.current) await syncSession(combined)
+      const sessionId = sessionIdRef.current
+      resetSession()
+      // Solo el resultado final se guarda en el historial
+      // finalize cierra la sesión en el servidor; la siguiente respuesta del
+      // cuestionario abre otra (syncSession la crea al necesitarla)
+      const res = sessionId ? await finalizeDiagnosisSession(sessionId) : await diagnose(combined)
       setData(res)
     } catch (e: unknown) {
       setError(e instanceof Error ? e.message : 'Error desconocido')
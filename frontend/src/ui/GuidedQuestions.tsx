@@ -1,8 +1,12 @@
 import React, { useId, useState, useEffect } from 'react'
 import { Check, X, RotateCcw, AlertTriangle, HelpCircle } from 'lucide-react'
+import { getNextQuestion } from '../api'
 
 type Answer = 'yes' | 'no' | 'unknown'
 
+// Síntoma de la KB de la pregunta "¿Dificultad para respirar?" (señal de alerta en el backend)
+const BREATH = 'dificultad para respirar'
+
 type Props = Readonly<{
   disabled?: boolean
   onChange: (selectedSymptoms: string[], redFlags: string[]) => void
@@ -16,72 +20,106 @@ export function GuidedQuestions({ disabled, onChange, lang = 'es' }: Props) {
       desc: 'Responde estas preguntas rápidas para orientar el diagnóstico.',
       rfTitle: 'Señales de Alerta',
       rfDesc: 'Por favor, responde con especial atención.',
-      qFever: '¿Tiene fiebre?',
-      qCough: '¿Tiene tos persistente?',
-      qHeadache: '¿Dolor de cabeza intenso?',
       qBreath: '¿Dificultad para respirar?',
       qChest: '¿Dolor o presión en el pecho?',
       qConfusion: '¿Confusión repentina?',
       yes: 'Sí',
       no: 'No',
       reset: 'Reiniciar cuestionario',
+      suggested: 'Preguntas sugeridas',
+      qSymptom: '¿Tiene {symptom}?',
     },
     en: {
       title: 'Initial Questionnaire',
       desc: 'Answer these quick questions to guide the diagnosis.',
       rfTitle: 'Red Flags',
       rfDesc: 'Please answer with special attention.',
-      qFever: 'Do you have a fever?',
-      qCough: 'Do you have a persistent cough?',
-      qHeadache: 'Severe headache?',
       qBreath: 'Difficulty breathing?',
       qChest: 'Chest pain or pressure?',
       qConfusion: 'Sudden confusion?',
       yes: 'Yes',
       no: 'No',
       reset: 'Reset questionnaire',
+      suggested: 'Suggested questions',
+      qSymptom: 'Do you have: {symptom}?',
     },
   } as const
 
-  // Preguntas base
-  const [fiebre, setFiebre] = useState<Answer>('unknown')
-  const [tos, setTos] = useState<Answer>('unknown')
-  const [dolorCabeza, setDolorCabeza] = useState<Answer>('unknown')
+  // Red flags (fijas: el árbol de preguntas podría no llegar a hacerlas nunca)
   const [dificultadRespirar, setDificultadRespirar] = useState<Answer>('unknown')
-
-  // Red flags
   const [dolorPecho, setDolorPecho] = useState<Answer>('unknown')
   const [confusion, setConfusion] = useState<Answer>('unknown')
 
+  // Preguntas elegidas por el backend, en el orden en que se hicieron (síntoma de la KB, respuesta).
+  // Todas salen del árbol precalculado: si las respuestas siguen su orden, cada paso es O(profundidad)
+  const [asked, setAsked] = useState<Array<[string, Answer]>>([])
+  const [nextSymptom, setNextSymptom] = useState<string | null>(null)
+
   useEffect(() => {
-    const positives: string[] = []
-    if (fiebre === 'yes') positives.push('fiebre')
-    if (tos === 'yes') positives.push('tos')
-    if (dolorCabeza === 'yes') positives.push('dolor de cabeza')
-    if (dificultadRespirar === 'yes') positives.push('dificultad para respirar')
+    const yes = asked.filter(([, a]) => a === 'yes').map(([s]) => s)
+    const no = asked.filter(([, a]) => a === 'no').map(([s]) => s)
+    let cancelled = false
+    getNextQuestion(yes, no)
+      .then((q) => {
+        if (cancelled) return
+        const symptom = q.symptom && !asked.some(([s]) => s === q.symptom) ? q.symptom : null
+        if (symptom === BREATH) {
+          // Es la señal de alerta fija: no se repite como sugerida. Si ya tiene
+          // respuesta, entra en el recorrido del árbol en el punto en que la pide
+          if (dificultadRespirar !== 'unknown') setAsked((prev) => [...prev, [BREATH, dificultadRespirar]])
+          setNextSymptom(null)
+        } else {
+          setNextSymptom(symptom)
+        }
+      })
+      .catch(() => { if (!cancelled) setNextSymptom(null) })
+    return () => { cancelled = true }
+  }, [asked, dificultadRespirar])
+
+  // Cambiar una respuesta descarta las posteriores: el árbol pregunta otra cosa por esa rama
+  const answer = (index: number, symptom: string, a: Answer) => {
+    setAsked((prev) => [...prev.slice(0, index), [symptom, a]])
+  }
+
+  const answerBreath = (a: Answer) => {
+    setDificultadRespirar(a)
+    const index = asked.findIndex(([s]) => s === BREATH)
+    if (index >= 0) answer(index, BREATH, a)
+  }
+
+  useEffect(() => {
+    const positives = asked.filter(([, a]) => a === 'yes').map(([s]) => s)
 
     const red: string[] = []
+    if (dificultadRespirar === 'yes') red.push(BREATH)
     if (dolorPecho === 'yes') red.push('dolor en el pecho')
     if (confusion === 'yes') red.push('confusión')
 
-    const all = [...positives, ...red]
+    const all = Array.from(new Set([...positives, ...red]))
     onChange(all, red)
-  }, [fiebre, tos, dolorCabeza, dificultadRespirar, dolorPecho, confusion, onChange])
+  }, [dificultadRespirar, dolorPecho, confusion, asked, onChange])
 
   const reset = () => {
-    setFiebre('unknown'); setTos('unknown'); setDolorCabeza('unknown'); 
     setDificultadRespirar('unknown'); setDolorPecho('unknown'); setConfusion('unknown')
+    setAsked([])
   }
 
   return (
     <section className="space-y-8" aria-labelledby="guided-title">
       
-      <div className="grid gap-4">
-        <QuestionCard label={L[lang].qFever} value={fiebre} onChange={setFiebre} disabled={disabled} lang={lang} />
-        <QuestionCard label={L[lang].qCough} value={tos} onChange={setTos} disabled={disabled} lang={lang} />
-        <QuestionCard label={L[lang].qHeadache} value={dolorCabeza} onChange={setDolorCabeza} disabled={disabled} lang={lang} />
-        <QuestionCard label={L[lang].qBreath} value={dificultadRespirar} onChange={setDificultadRespirar} disabled={disabled} lang={lang} />
-      </div>
+      {(asked.some(([s]) => s !== BREATH) || nextSymptom) && (
+        <div className="grid gap-4" aria-live="polite">
+          <h3 className="font-semibold text-slate-700">{L[lang].suggested}</h3>
+          {asked.map(([symptom, value], index) => symptom === BREATH ? null : (
+            <QuestionCard key={symptom} label={L[lang].qSymptom.replace('{symptom}', symptom)} value={value}
+              onChange={(a: Answer) => answer(index, symptom, a)} disabled={disabled} lang={lang} />
+          ))}
+          {nextSymptom && (
+            <QuestionCard key={nextSymptom} label={L[lang].qSymptom.replace('{symptom}', nextSymptom)} value="unknown"
+              onChange={(a: Answer) => answer(asked.length, nextSymptom, a)} disabled={disabled} lang={lang} />
+          )}
+        </div>
+      )}
 
       <div className="bg-red-50 rounded-2xl p-6 border border-red-100">
         <div className="flex items-center gap-3 mb-4 text-red-800">
@@ -92,6 +130,7 @@ export function GuidedQuestions({ disabled, onChange, lang = 'es' }: Props) {
           </div>
         </div>
         <div className="grid gap-4">
+          <QuestionCard label={L[lang].qBreath} value={dificultadRespirar} onChange={answerBreath} disabled={disabled} lang={lang} isRedFlag />
           <QuestionCard label={L[lang].qChest} value={dolorPecho} onChange={setDolorPecho} disabled={disabled} lang={lang} isRedFlag />
           <QuestionCard label={L[lang].qConfusion} value={confusion} onChange={setConfusion} disabled={disabled} lang={lang} isRedFlag />
         </div>
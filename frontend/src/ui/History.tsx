@@ -1,4 +1,4 @@
-import React, { useEffect, useState } from 'react'
+import React, { useEffect, useRef, useState } from 'react'
 import { getHistory, deleteHistory, HistoryItem } from '../api'
 import { Trash2, Clock, Calendar, Activity, AlertCircle, RefreshCw } from 'lucide-react'
 
@@ -6,12 +6,17 @@ export function History({ lang = 'es' }: Readonly<{ lang?: 'es' | 'en' }>) {
   const [items, setItems] = useState<HistoryItem[]>([])
   const [error, setError] = useState<string | null>(null)
   const [loading, setLoading] = useState(false)
+  const [nextCursor, setNextCursor] = useState<string | null>(null)
+  const sentinelRef = useRef<HTMLDivElement | null>(null)
+  // Evita pedir la misma página dos veces mientras llega la respuesta
+  const loadingRef = useRef(false)
   
   const L = {
     es: { 
       title: 'Historial de Diagnósticos', 
       refresh: 'Actualizar', 
       loading: 'Cargando historial...', 
+      more: 'Cargar más',
       none: 'No hay registros guardados.', 
       symptoms: 'Síntomas reportados', 
       probable: 'Diagnóstico probable', 
@@ -23,6 +28,7 @@ export function History({ lang = 'es' }: Readonly<{ lang?: 'es' | 'en' }>) {
       title: 'Diagnosis History', 
       refresh: 'Refresh', 
       loading: 'Loading history...', 
+      more: 'Load more',
       none: 'No saved records.', 
       symptoms: 'Reported symptoms', 
       probable: 'Likely diagnosis', 
@@ -38,15 +44,20 @@ export function History({ lang = 'es' }: Readonly<{ lang?: 'es' | 'en' }>) {
     if (ok) setItems((prev) => prev.filter((x) => x.id !== id))
   }
 
-  async function load() {
+  // cursor null: primera página (reemplaza la lista); si no, añade la siguiente
+  async function load(cursor: string | null = null) {
+    if (loadingRef.current) return
+    loadingRef.current = true
     setLoading(true)
     setError(null)
     try {
-      const data = await getHistory()
-      setItems(data)
+      const page = await getHistory(cursor)
+      setItems((prev) => (cursor ? [...prev, ...page.items] : page.items))
+      setNextCursor(page.next_cursor)
     } catch (e: unknown) {
       setError(e instanceof Error ? e.message : 'Error desconocido')
     } finally {
+      loadingRef.current = false
       setLoading(false)
     }
   }
@@ -55,6 +66,17 @@ export function History({ lang = 'es' }: Readonly<{ lang?: 'es' | 'en' }>) {
     load()
   }, [])
 
+  // Scroll infinito: al asomar el final de la lista se pide la página siguiente
+  useEffect(() => {
+    const sentinel = sentinelRef.current
+    if (!sentinel || !nextCursor) return
+    const observer = new IntersectionObserver((entries) => {
+      if (entries.some((entry) => entry.isIntersecting)) load(nextCursor)
+    }, { rootMargin: '200px' })
+    observer.observe(sentinel)
+    return () => observer.disconnect()
+  }, [nextCursor])
+
   return (
     <section className="max-w-4xl mx-auto space-y-6 animate-slide-up" aria-labelledby="history-title">
       <div className="flex items-center justify-between bg-white p-6 rounded-2xl shadow-sm border border-slate-100">
@@ -63,7 +85,7 @@ export function History({ lang = 'es' }: Readonly<{ lang?: 'es' | 'en' }>) {
           {L[lang].title}
         </h2>
         <button 
-          onClick={load} 
+          onClick={() => load()} 
           className="p-2 text-slate-500 hover:text-teal-600 hover:bg-slate-50 rounded-full transition-all"
           title={L[lang].refresh}
         >
@@ -141,6 +163,18 @@ export function History({ lang = 'es' }: Readonly<{ lang?: 'es' | 'en' }>) {
           </div>
         ))}
 
+        {nextCursor && (
+          <div ref={sentinelRef} className="flex justify-center py-4">
+            <button
+              onClick={() => load(nextCursor)}
+              disabled={loading}
+              className="px-4 py-2 text-sm font-medium text-teal-700 hover:bg-teal-50 rounded-lg transition-colors disabled:opacity-50"
+            >
+              {loading ? L[lang].loading : L[lang].more}
+            </button>
+          </div>
+        )}
+
         {items.length === 0 && !loading && !error && (
           <div className="text-center py-12 bg-white rounded-2xl border border-slate-200 border-dashed">
             <div className="w-16 h-16 bg-slate-50 rounded-full flex items-center justify-center mx-auto mb-4 text-slate-300">